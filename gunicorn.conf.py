@@ -0,0 +1,30 @@
+import gc
+import os
+
+# Address to listen on (Cloud Run sets PORT)
+bind = f":{os.environ.get('PORT', 8080)}"
+
+# Number of worker processes (defaults to the number of CPUs), and of threads
+# per worker
+workers = int(os.environ.get("PARIS_BIKES_WORKERS", os.cpu_count() or 1))
+threads = int(os.environ.get("PARIS_BIKES_THREADS", 8))
+
+# Disable the timeouts of the workers, to let Cloud Run handle instance scaling
+timeout = 0
+
+# Import the application, and load the serving snapshot, once in the master
+# process. The workers are forked from it: the float columns of the serving
+# table are a read-only memory map of the snapshot file, whose pages stay
+# shared (see paris_bikes.import_check). The other objects (maps, geometry,
+# small columns) are on the heap of the master process, and a page of them is
+# copied as soon as a worker writes to it, e.g. to update a reference count.
+preload_app = True
+
+
+def pre_fork(server, worker):
+    """Exclude the objects loaded by the master process from garbage collection.
+
+    Otherwise, collections in the workers write to the objects they inspect, and
+    copy the memory pages they share with the master process.
+    """
+    gc.freeze()
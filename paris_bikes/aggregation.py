@@ -0,0 +1,286 @@
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Tuple, Union
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from paris_bikes.hexgrid import (
+    HEX_SIZES,
+    get_area_weights,
+    locate_cells,
+    redistribute,
+)
+from paris_bikes.spatial import IrisLocator, as_iris_locator
+
+
+class LayerSpec(NamedTuple):
+    """Declaration of a dataset aggregated per IRIS.
+
+    Attributes:
+        name (str): Name of the aggregated dataset.
+        source (str): Name of the source dataset.
+        values (Dict[str, Union[str, Callable]]): Aggregated columns, each one
+            either a column of the source or a function of the (filtered)
+            source returning a series.
+        filters (Tuple[Callable], optional): Functions of the source returning
+            the boolean mask of the rows to keep. Defaults to ().
+        columns (Tuple[str], optional): Columns of the source needed by the
+            values, the geometry and the key. If empty, all columns are kept.
+            Defaults to ().
+        geometry (Callable, optional): Function of the (filtered) source
+            returning the location of each row. Defaults to the geometry of
+            the source.
+        key_column (str, optional): Column of the source with the IRIS code of
+            each row. Rows are then joined to the IRIS of their code, and only
+            the rows whose code is missing or unknown are located spatially.
+            Defaults to None.
+        agg (str, optional): Aggregation function. Defaults to "sum".
+        dtype (str, optional): If set, aggregated values are rounded and
+            converted to this type. Defaults to None.
+        filter_columns (Tuple[str], optional): Columns of the source needed by
+            the filters only, so that readers can skip all other columns.
+            Defaults to ().
+    """
+
+    name: str
+    source: str
+    values: Dict[str, Union[str, Callable]]
+    filters: Tuple[Callable, ...] = ()
+    columns: Tuple[str, ...] = ()
+    geometry: Optional[Callable] = None
+    key_column: Optional[str] = None
+    agg: str = "sum"
+    dtype: Optional[str] = None
+    filter_columns: Tuple[str, ...] = ()
+
+
+class PreparedLayer(NamedTuple):
+    """Rows of a layer, filtered from its source.
+
+    Attributes:
+        values (pd.DataFrame): Aggregated columns of the rows.
+        geometry (gpd.GeoSeries): Location of the rows.
+        keys (pd.Series, optional): IRIS code of the rows, if the layer has a
+            key column.
+    """
+
+    values: pd.DataFrame
+    geometry: gpd.GeoSeries
+    keys: Optional[pd.Series] = None
+
+
+def _prepare_layer(layer: LayerSpec, df_source: pd.DataFrame) -> PreparedLayer:
+    """Filter a source and compute the values and locations of a layer.
+
+    Args:
+        layer (LayerSpec): Declaration of the layer.
+        df_source (pd.DataFrame): Source dataset.
+
+    Returns:
+        PreparedLayer: Values, location and IRIS code of the rows.
+    """
+    # Filter rows (and select columns) before any geometry work, in a single
+    # indexing step
+    mask = np.ones(len(df_source), dtype=bool)
+    for layer_filter in layer.filters:
+        mask &= np.asarray(layer_filter(df_source), dtype=bool)
+    df = df_source.loc[mask, list(layer.columns) or slice(None)]
+
+    df_values = pd.DataFrame(
+        {
+            column: df[value] if isinstance(value, str) else value(df)
+            for column, value in layer.values.items()
+        },
+        index=df.index,
+    )
+
+    geometry = layer.geometry(df) if layer.geometry is not None else df.geometry
+    keys = df[layer.key_column] if layer.key_column is not None else None
+
+    return PreparedLayer(df_values, geometry, keys)
+
+
+def prepare_layers(
+    layers: Iterable[LayerSpec], sources: Dict[str, pd.DataFrame]
+) -> Dict[str, PreparedLayer]:
+    """Filter the sources and compute the values and locations of layers.
+
+    The result can be passed to both aggregate_per_iris and aggregate_per_cell,
+    so that the rows of a layer (e.g. stations to geocode) are only prepared
+    once.
+
+    Args:
+        layers (Iterable[LayerSpec]): Declaration of the aggregated datasets.
+        sources (Dict[str, pd.DataFrame]): Source datasets, by name.
+
+    Returns:
+        Dict[str, PreparedLayer]: Rows of each layer, by name.
+    """
+    return {
+        layer.name: _prepare_layer(layer, sources[layer.source]) for layer in layers
+    }
+
+
+def aggregate_per_iris(
+    layers: Iterable[LayerSpec],
+    sources: Dict[str, pd.DataFrame],
+    df_iris: Union[gpd.GeoDataFrame, IrisLocator],
+    prepared: Optional[Dict[str, PreparedLayer]] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Aggregate several datasets per IRIS, in one pass.
+
+    Rows with the code of an IRIS (see LayerSpec.key_column) are joined to it
+    by code, and the other rows of all layers are located in one bulk spatial
+    query.
+
+    Args:
+        layers (Iterable[LayerSpec]): Declaration of the aggregated datasets.
+        sources (Dict[str, pd.DataFrame]): Source datasets, by name.
+        df_iris (Union[gpd.GeoDataFrame, IrisLocator]): Location of all IRIS
+            within the city, or an IrisLocator built from it.
+        prepared (Dict[str, PreparedLayer], optional): Rows of the layers,
+            from prepare_layers. Defaults to None (prepared from the sources).
+
+    Returns:
+        Dict[str, pd.DataFrame]: Aggregated dataset of each layer, indexed by
+            IRIS (only IRIS with at least one row are included).
+    """
+    layers = list(layers)
+    if not layers:
+        return {}
+    locator = as_iris_locator(df_iris)
+    if prepared is None:
+        prepared = prepare_layers(layers, sources)
+
+    # Join the rows to the IRIS of their code, and only locate the others
+    iris_per_layer, geometries = {}, {}
+    for layer in layers:
+        rows = prepared[layer.name]
+        if rows.keys is None:
+            geometries[layer.name] = rows.geometry
+            continue
+        iris = pd.Series(
+            locator.locate_codes(rows.keys), index=rows.keys.index, name="iris"
+        )
+        iris_per_layer[layer.name] = iris
+        geometries[layer.name] = rows.geometry.loc[iris.isna().to_numpy()]
+    located = locator.locate_many(geometries)
+    for name, iris in iris_per_layer.items():
+        iris.loc[located[name].index] = located[name]
+        located[name] = iris
+
+    aggregated = {}
+    for layer in layers:
+        df_values = prepared[layer.name].values
+        df_aggregated = df_values.groupby(located[layer.name]).agg(layer.agg)
+        if layer.dtype is not None:
+            df_aggregated = df_aggregated.round(0).astype(layer.dtype)
+        aggregated[layer.name] = df_aggregated
+
+    return aggregated
+
+
+def aggregate_per_cell(
+    layers: Iterable[LayerSpec],
+    sources: Dict[str, pd.DataFrame],
+    prepared: Optional[Dict[str, PreparedLayer]] = None,
+    resolution: int = len(HEX_SIZES) - 1,
+) -> Dict[str, pd.DataFrame]:
+    """Aggregate several datasets per cell of the hexagonal grid.
+
+    Each row is binned into the cell computed from its coordinates (see
+    locate_cells), without any spatial join, so the layers do not depend on
+    the IRIS. The cells on the border of the city also count the rows just
+    outside of it.
+
+    Args:
+        layers (Iterable[LayerSpec]): Declaration of the aggregated datasets.
+        sources (Dict[str, pd.DataFrame]): Source datasets, by name.
+        prepared (Dict[str, PreparedLayer], optional): Rows of the layers,
+            from prepare_layers. Defaults to None (prepared from the sources).
+        resolution (int, optional): Resolution of the cells (position in
+            HEX_SIZES). Defaults to the finest one.
+
+    Returns:
+        Dict[str, pd.DataFrame]: Aggregated dataset of each layer, indexed by
+            cell ("cell", only cells with at least one row are included).
+    """
+    layers = list(layers)
+    if prepared is None:
+        prepared = prepare_layers(layers, sources)
+
+    aggregated = {}
+    for layer in layers:
+        df_values, geometry, _ = prepared[layer.name]
+        if geometry.crs is not None:
+            geometry = geometry.to_crs("EPSG:4326")
+        located = (~(geometry.isna() | geometry.is_empty)).to_numpy()
+        points = geometry.loc[located].representative_point()
+        cell = locate_cells(points.x.to_numpy(), points.y.to_numpy(), resolution)
+
+        df_aggregated = (
+            df_values.loc[located].groupby(pd.Index(cell, name="cell")).agg(layer.agg)
+        )
+        if layer.dtype is not None:
+            df_aggregated = df_aggregated.round(0).astype(layer.dtype)
+        aggregated[layer.name] = df_aggregated
+
+    return aggregated
+
+
+def get_population_per_cell(
+    df_iris: gpd.GeoDataFrame, resolution: int = len(HEX_SIZES) - 1
+) -> pd.DataFrame:
+    """Spread the population of the IRIS over the cells of the hexagonal grid.
+
+    The population of each IRIS is split by the share of its area in each cell
+    (see get_area_weights).
+
+    Args:
+        df_iris (gpd.GeoDataFrame): Location and population ("nb_pop") of all
+            IRIS within the city.
+        resolution (int, optional): Resolution of the cells (position in
+            HEX_SIZES). Defaults to the finest one.
+
+    Returns:
+        pd.DataFrame: Population ("nb_pop") of each cell overlapping an IRIS,
+            indexed by cell ("cell").
+    """
+    weights = get_area_weights(df_iris.geometry, resolution)
+    cells = pd.Index(np.unique(weights["cell"]), name="cell")
+    nb_pop = redistribute(df_iris["nb_pop"], weights).rename("nb_pop")
+    return nb_pop.reindex(cells, fill_value=0).to_frame()
+
+
+def merge_cells(
+    df_population: pd.DataFrame,
+    cell_datasets: Iterable[pd.DataFrame],
+    layers: Iterable[LayerSpec],
+) -> pd.DataFrame:
+    """Merge the datasets aggregated per cell into the grid table.
+
+    Args:
+        df_population (pd.DataFrame): Population of each cell, from
+            get_population_per_cell.
+        cell_datasets (Iterable[pd.DataFrame]): Datasets aggregated per cell,
+            from aggregate_per_cell.
+        layers (Iterable[LayerSpec]): Declaration of these datasets.
+
+    Returns:
+        pd.DataFrame: Grid table, indexed by cell ("cell"), with the
+            population and the aggregated values of each layer. Only the cells
+            overlapping an IRIS are included (with 0 if they have no rows).
+    """
+    dtypes = {
+        column: layer.dtype
+        for layer in layers
+        if layer.dtype is not None
+        for column in layer.values
+    }
+    df_grid = (
+        pd.concat([df_population, *cell_datasets], axis=1)
+        .reindex(df_population.index)
+        .astype(float)
+        .fillna(0)
+    )
+    return df_grid.round({column: 0 for column in dtypes}).astype(dtypes)
@@ -0,0 +1,376 @@
+import math
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from flask import Blueprint, jsonify, request
+
+from paris_bikes.ranking import TOP_N, RankIndex
+from paris_bikes.serving import FEATURE_FILEPATH, METRIC_COLUMNS
+from paris_bikes.storage import read_dataset
+
+# shapely is only imported to locate the first points, so that the serving
+# process can import this module without it
+if TYPE_CHECKING:
+    from paris_bikes.spatial import IrisLocator
+
+# Maximum number of points of a batch request
+API_MAX_POINTS = int(os.environ.get("PARIS_BIKES_API_MAX_POINTS", 1000000))
+
+
+class MetricsStore:
+    """Metrics of each IRIS, stored by column.
+
+    Args:
+        df (pd.DataFrame): Serving table, indexed by IRIS.
+        columns (List[str], optional): Columns to store. Defaults to
+            METRIC_COLUMNS.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: List[str] = METRIC_COLUMNS):
+        self.iris = df.index
+        self.columns = {col: df[col].to_numpy(dtype=float) for col in columns}
+
+    def get_rows(self, iris: Iterable[Optional[str]]) -> np.ndarray:
+        """Get the position of IRIS in the store.
+
+        Args:
+            iris (Iterable[Optional[str]]): IRIS (or None).
+
+        Returns:
+            np.ndarray: Position of each IRIS, -1 if it is not in the store.
+        """
+        return self.iris.get_indexer(pd.Index(iris, dtype=object))
+
+    def get_metrics(self, row: int, columns: List[str]) -> Dict[str, Optional[float]]:
+        """Get the metrics of an IRIS.
+
+        Args:
+            row (int): Position of the IRIS in the store.
+            columns (List[str]): Columns to get.
+
+        Returns:
+            Dict[str, Optional[float]]: Metrics (None if not finite), by column.
+        """
+        metrics = {}
+        for col in columns:
+            value = float(self.columns[col][row])
+            metrics[col] = value if math.isfinite(value) else None
+        return metrics
+
+
+class IrisLookup:
+    """Find the IRIS of points and their metrics.
+
+    The spatial index of the IRIS is only built on the first lookup.
+
+    Args:
+        df (pd.DataFrame): Serving table, indexed by IRIS.
+        feature_filepath (Path, optional): Location of the feature table, whose
+            geometry is used to locate points. Defaults to FEATURE_FILEPATH.
+    """
+
+    def __init__(self, df: pd.DataFrame, feature_filepath: Path = FEATURE_FILEPATH):
+        self.metrics = MetricsStore(df)
+        self.feature_filepath = feature_filepath
+        self._locator = None
+        self._lock = threading.Lock()
+
+    @property
+    def locator(self) -> "IrisLocator":
+        """Locator of the IRIS, built on first use."""
+        if self._locator is None:
+            with self._lock:
+                if self._locator is None:
+                    from paris_bikes.spatial import IrisLocator
+
+                    df_iris = read_dataset(self.feature_filepath, columns=["geometry"])
+                    self._locator = IrisLocator(df_iris)
+        return self._locator
+
+    def lookup(
+        self, x: np.ndarray, y: np.ndarray, columns: List[str] = METRIC_COLUMNS
+    ) -> dict:
+        """Find the IRIS of points and their metrics.
+
+        Args:
+            x (np.ndarray): Longitudes of the points.
+            y (np.ndarray): Latitudes of the points.
+            columns (List[str], optional): Metrics to get. Defaults to
+                METRIC_COLUMNS.
+
+        Returns:
+            dict: IRIS of each point ("iris", None if not in any IRIS), and the
+                metrics of each IRIS found ("metrics"), by IRIS.
+        """
+        iris = self.locator.locate_xy(x, y)
+        # Metrics of each IRIS found, once per IRIS
+        found = pd.unique(iris[pd.notna(iris)])
+        rows = self.metrics.get_rows(found)
+        return {
+            "iris": iris.tolist(),
+            "metrics": {
+                name: self.metrics.get_metrics(row, columns)
+                for name, row in zip(found.tolist(), rows.tolist())
+                if row >= 0
+            },
+        }
+
+
+def get_coordinates(values: object, name: str) -> np.ndarray:
+    """Parse coordinates of a request body.
+
+    Args:
+        values (object): Coordinates, as parsed from JSON.
+        name (str): Name of the coordinates, for the error message.
+
+    Raises:
+        ValueError: If the values are not finite numbers.
+
+    Returns:
+        np.ndarray: Coordinates.
+    """
+    try:
+        values = np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must only contain numbers.")
+    if not np.isfinite(values).all():
+        raise ValueError(f"{name} must only contain finite numbers.")
+    return values
+
+
+def get_columns(columns: Optional[List[str]]) -> List[str]:
+    """Validate the metrics requested.
+
+    Args:
+        columns (List[str], optional): Metrics requested. If None, all of
+            METRIC_COLUMNS.
+
+    Raises:
+        ValueError: If columns is not a list of strings, or a metric is not in
+            METRIC_COLUMNS.
+
+    Returns:
+        List[str]: Metrics.
+    """
+    if columns is None:
+        return METRIC_COLUMNS
+    if not isinstance(columns, list) or not all(
+        isinstance(col, str) for col in columns
+    ):
+        raise ValueError("columns must be a list of metric names.")
+    unknown = [col for col in columns if col not in METRIC_COLUMNS]
+    if unknown:
+        raise ValueError(f"Metrics {unknown} are not recognized.")
+    return columns
+
+
+def get_flag(name: str, default: bool = False) -> bool:
+    """Parse a boolean query parameter.
+
+    Args:
+        name (str): Name of the parameter.
+        default (bool, optional): Value if the parameter is missing. Defaults to
+            False.
+
+    Raises:
+        ValueError: If the parameter is not "1", "true", "0" or "false".
+
+    Returns:
+        bool: Value of the parameter.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return default
+    if value.lower() in ("1", "true"):
+        return True
+    if value.lower() in ("0", "false"):
+        return False
+    raise ValueError(f"Parameter {name} must be true or false.")
+
+
+def get_number(name: str) -> Optional[float]:
+    """Parse a numeric query parameter.
+
+    Args:
+        name (str): Name of the parameter.
+
+    Raises:
+        ValueError: If the parameter is not a finite number.
+
+    Returns:
+        Optional[float]: Value of the parameter, None if it is missing.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"Parameter {name} must be a number.")
+    if not math.isfinite(number):
+        raise ValueError(f"Parameter {name} must be a finite number.")
+    return number
+
+
+def get_integer(name: str, default: int) -> int:
+    """Parse an integer query parameter.
+
+    Args:
+        name (str): Name of the parameter.
+        default (int): Value if the parameter is missing.
+
+    Raises:
+        ValueError: If the parameter is not an integer.
+
+    Returns:
+        int: Value of the parameter.
+    """
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Parameter {name} must be an integer.")
+
+
+def get_arrondissements(value: Optional[str]) -> Optional[List[int]]:
+    """Parse the arrondissements of a query (comma-separated).
+
+    Args:
+        value (str, optional): Value of the parameter.
+
+    Raises:
+        ValueError: If the value is not a list of integers between 1 and 20.
+
+    Returns:
+        Optional[List[int]]: Arrondissements, None if the parameter is missing.
+    """
+    if value is None:
+        return None
+    try:
+        arrondissements = [int(item) for item in value.split(",")]
+    except ValueError:
+        raise ValueError("arrondissement must be a list of integers.")
+    invalid = [item for item in arrondissements if not 1 <= item <= 20]
+    if invalid:
+        raise ValueError(f"Arrondissements {invalid} are not between 1 and 20.")
+    return arrondissements
+
+
+def create_api(lookup: IrisLookup, ranking: RankIndex) -> Blueprint:
+    """Create the JSON API to find the IRIS of points and rank the IRIS.
+
+    Endpoints:
+        GET /api/iris?lon=<lon>&lat=<lat>[&columns=<col>,<col>]
+            IRIS of a point ("iris", None if not in any IRIS) and its
+            metrics ("metrics").
+        POST /api/iris/batch
+            Body {"points": [[lon, lat], ...]} or {"lon": [...], "lat":
+            [...]}, and optionally {"columns": [...]}. IRIS of each point
+            ("iris"), and metrics of each IRIS found ("metrics", by IRIS).
+        GET /api/top?column=<col>[&n=<n>][&arrondissement=<a>,<a>]
+                [&min_pop=<pop>][&min=<value>][&max=<value>]
+                [&percentile=<pct>][&ascending=true][&columns=<col>,<col>]
+            IRIS with the highest (or lowest) values of a column, see
+            RankIndex.top ("iris", each with its "rank", "arrondissement" and
+            "metrics"), and number of IRIS matching the filters ("count").
+
+    Args:
+        lookup (IrisLookup): Lookup of the IRIS.
+        ranking (RankIndex): Ranking of the IRIS.
+
+    Returns:
+        Blueprint: API, to register on the Flask server.
+    """
+    api = Blueprint("api", __name__, url_prefix="/api")
+
+    @api.errorhandler(ValueError)
+    def handle_value_error(error):
+        return jsonify({"error": str(error)}), 400
+
+    @api.get("/iris")
+    def get_iris():
+        lon, lat = get_number("lon"), get_number("lat")
+        if lon is None or lat is None:
+            raise ValueError("Parameters lon and lat are required.")
+        columns = request.args.get("columns")
+        columns = get_columns(None if columns is None else columns.split(","))
+
+        result = lookup.lookup(np.array([lon]), np.array([lat]), columns)
+        iris = result["iris"][0]
+        return jsonify({"iris": iris, "metrics": result["metrics"].get(iris)})
+
+    @api.post("/iris/batch")
+    def get_iris_batch():
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            raise ValueError("The body must be a JSON object.")
+        if "points" in body:
+            points = get_coordinates(body["points"], "points")
+            if points.size == 0:
+                points = points.reshape(0, 2)
+            if points.ndim != 2 or points.shape[1] != 2:
+                raise ValueError("points must be a list of [lon, lat] pairs.")
+            x, y = points[:, 0], points[:, 1]
+        elif "lon" in body and "lat" in body:
+            x = get_coordinates(body["lon"], "lon")
+            y = get_coordinates(body["lat"], "lat")
+            if x.shape != y.shape or x.ndim != 1:
+                raise ValueError("lon and lat must be lists of the same length.")
+        else:
+            raise ValueError('The body must have "points", or "lon" and "lat".')
+        if len(x) > API_MAX_POINTS:
+            return (
+                jsonify({"error": f"Batches are limited to {API_MAX_POINTS} points."}),
+                413,
+            )
+
+        return jsonify(lookup.lookup(x, y, get_columns(body.get("columns"))))
+
+    @api.get("/top")
+    def get_top():
+        col = request.args.get("column")
+        if col is None:
+            raise ValueError("Parameter column is required.")
+        arrondissement = get_arrondissements(request.args.get("arrondissement"))
+        columns = request.args.get("columns")
+        columns = get_columns(None if columns is None else columns.split(","))
+
+        result = ranking.top(
+            col,
+            n=get_integer("n", TOP_N),
+            arrondissement=arrondissement,
+            min_population=get_number("min_pop"),
+            min_value=get_number("min"),
+            max_value=get_number("max"),
+            percentile=get_number("percentile"),
+            ascending=get_flag("ascending"),
+        )
+        rows = lookup.metrics.get_rows(result.top.index)
+        return jsonify(
+            {
+                "column": col,
+                "count": result.count,
+                "iris": [
+                    {
+                        "iris": iris,
+                        "rank": rank,
+                        "arrondissement": arrondissement,
+                        "metrics": lookup.metrics.get_metrics(row, columns),
+                    }
+                    for iris, rank, arrondissement, row in zip(
+                        result.top.index.tolist(),
+                        result.top["rank"].tolist(),
+                        result.top["arrondissement"].tolist(),
+                        rows.tolist(),
+                    )
+                ],
+            }
+        )
+
+    return api
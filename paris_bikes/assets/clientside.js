@@ -0,0 +1,78 @@
+// Clientside versions of the callbacks of dash_application.py, used when the
+// PARIS_BIKES_CLIENTSIDE environment variable is set to 1.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    paris_bikes: {
+        // Update the map according to the selected item on the RadioItems, the
+        // weights of the demand index and the level of the map
+        update_map: function (
+            demand_input_value,
+            supply_input_value,
+            index_input_value,
+            normalize,
+            weights,
+            level,
+            map_data,
+            figure
+        ) {
+            // Plot from supply RadioItems or demand RadioItems?
+            let col;
+            if (demand_input_value) {
+                col = demand_input_value;
+                // Normalize or not?
+                if (normalize && normalize.length) {
+                    col += "_normalized";
+                }
+            } else if (supply_input_value) {
+                col = supply_input_value;
+            } else if (index_input_value) {
+                col = index_input_value;
+            }
+
+            const level_data = map_data[level];
+            const column_data = level_data.columns[col];
+            let z = column_data.z;
+            // Recompute the columns that depend on the weights of the demand index
+            if (col === "demand_index" || col === "demand_supply_index") {
+                const demand_index = level_data.demand_index;
+                z = demand_index.matrix.map(function (row, i) {
+                    let value = row.reduce((sum, x, j) => sum + x * weights[j], 0);
+                    if (col === "demand_supply_index") {
+                        value /= demand_index.supply[i];
+                    }
+                    return Number.isFinite(value) ? value : null;
+                });
+            }
+            const trace = Object.assign({}, level_data.figure.data[0], {
+                z: z,
+                customdata: column_data.customdata,
+                hovertemplate: column_data.hovertemplate,
+            });
+            const layout = Object.assign({}, level_data.figure.layout, {
+                coloraxis: column_data.coloraxis,
+            });
+            // Keep the view of the map (e.g. after drilling down into an area)
+            if (figure && figure.layout) {
+                layout.mapbox = figure.layout.mapbox;
+            }
+            return { data: [trace], layout: layout };
+        },
+
+        // Guarantee only one RadioItems has a value selected
+        update_supply_demand_radioitems: function (
+            demand_input_value,
+            supply_input_value,
+            index_input_value
+        ) {
+            const triggered_id =
+                dash_clientside.callback_context.triggered[0].prop_id.split(".")[0];
+            if (triggered_id === "demand-column-selector") {
+                return [demand_input_value, null, null];
+            } else if (triggered_id === "supply-column-selector") {
+                return [null, supply_input_value, null];
+            } else if (triggered_id === "demand-index-column-selector") {
+                return [null, null, index_input_value];
+            }
+            return window.dash_clientside.no_update;
+        },
+    },
+});
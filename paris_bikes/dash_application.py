@@ -1,49 +1,188 @@
 import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
 
 os.environ["USE_PYGEOS"] = "0"
 import dash_bootstrap_components as dbc
-import geopandas as gpd
-from dash import Dash, Input, Output, State, callback_context, dcc, html
+from dash import (
+    ALL,
+    ClientsideFunction,
+    Dash,
+    Input,
+    Output,
+    Patch,
+    State,
+    callback_context,
+    dcc,
+    html,
+    no_update,
+)
 
-from paris_bikes.mapping import create_map
-from paris_bikes.pipelines import create_parking_index
+from paris_bikes.api import IrisLookup, create_api
+from paris_bikes.hexgrid import HEX_LEVEL_OPTIONS, HEX_LEVELS, roll_up_grid
+from paris_bikes.hierarchy import LEVEL_OPTIONS, LEVELS, Hierarchy, get_area_views
+from paris_bikes.index import DemandIndex
+from paris_bikes.placement import PLACEMENT_STEP, place_parking
+from paris_bikes.ranking import TOP_N, RankIndex
+from paris_bikes.scenario import ScenarioBase
+from paris_bikes.serving import (
+    DEMAND_OPTIONS,
+    INDEX_OPTIONS,
+    MAP_TRACE_PROPS,
+    SUPPLY_OPTIONS,
+    WEIGHTED_COLUMNS,
+    compute_weighted_column,
+    get_map_figure,
+    load_snapshot,
+    select_column,
+)
 from paris_bikes.utils import get_data_root
 
-# Load data and metadata
-df = gpd.read_file(get_data_root() / "feature" / "feature.geojson").set_index(
-    "iris", drop=False
+# Maximum number of figures kept in the figure cache
+FIGURE_CACHE_SIZE = 64
+
+# Maximum number of rankings by the index of custom weights kept in the cache
+RANKING_CACHE_SIZE = 16
+
+# If True, the map is updated in the browser: the data of all columns is sent
+# once with the page, and selecting a column does not call the server
+CLIENTSIDE_CALLBACKS = os.environ.get("PARIS_BIKES_CLIENTSIDE", "0") == "1"
+
+# If True, the app is only served from the serving snapshot, which must have
+# been built beforehand, and the geospatial stack is never imported
+FAST_BOOT = os.environ.get("PARIS_BIKES_FAST_BOOT", "0") == "1"
+
+# Range and step of the sliders of the weights of the demand index
+WEIGHT_MAX = 3
+WEIGHT_STEP = 0.5
+
+# Default number of new parking spots to place, and number of IRIS listed
+PLACEMENT_BUDGET = 500
+# Maximum number of new parking spots (the placement runs once per step)
+PLACEMENT_MAX_BUDGET = 10000
+PLACEMENT_ROWS = 10
+
+# Load the serving snapshot (built from the feature table if it is missing or
+# outdated, unless in fast-boot mode) and metadata
+df, geometry_levels, map_figures, dataset_version, grid = load_snapshot(
+    fast_boot=FAST_BOOT
 )
 with open(get_data_root() / "metadata.md", "r") as file:
     data_sources = file.read()
-# Aggregate nb of parking spots into a single series
-df["nb_parking_spots"] += df["nb_parking_spots_idfm"].fillna(0)
-# Drop the parking spots columns
-df.drop(columns=["nb_parking_spots_idfm"], inplace=True)
-# Impute missing values with 0
-df.fillna(0, inplace=True)
-# Create normalized columns
-# Note: adding +1 to the denominator to avoid dividing by 0
-df = df.assign(
-    **{
-        (col + "_normalized"): (df.loc[:, col] / (df["nb_parking_spots"] + 1))
-        for col in df.columns.drop(["geometry", "iris"])
-    }
-)
-# Create scaled columns
-df = df.join(
-    create_parking_index(df)
-    .loc[:, ["parking_index", "parking_normalized"]]
-    .rename(
-        columns={"parking_index": "demand_index", "parking_normalized": "supply_index"}
+
+# Aggregate the IRIS into quartiers and arrondissements once, and the cells of
+# the hexagonal grid into coarser cells if the pipelines built the grid
+level_tables = Hierarchy(df).roll_up(df)
+level_options = LEVEL_OPTIONS
+if grid is not None:
+    level_tables.update(roll_up_grid(grid))
+    level_options = LEVEL_OPTIONS + HEX_LEVEL_OPTIONS
+
+# Next finer level of each level, to drill down into its areas
+finer_levels = {
+    coarse: fine
+    for levels in (LEVELS, HEX_LEVELS)
+    for fine, coarse in zip(levels, levels[1:])
+    if coarse in level_tables
+}
+
+# Scale the variables of the demand index once per level, to recompute it for
+# any weights
+demand_indexes = {level: DemandIndex(table) for level, table in level_tables.items()}
+demand_index = demand_indexes["iris"]
+
+# View of the map that shows each area, to drill down into it
+area_views = {
+    level: get_area_views(geometry) for level, geometry in geometry_levels.items()
+}
+
+# Sort the IRIS by each metric once, to list the most underserved ones
+ranking = RankIndex(df)
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def get_figure(col, level, dataset_version):
+    """Get the map of a column at a level, from the maps pre-rendered in the
+    snapshot.
+
+    The returned figure is shared between callbacks, and must not be modified.
+    """
+    return get_map_figure(map_figures[level], col)
+
+
+@lru_cache(maxsize=RANKING_CACHE_SIZE)
+def get_weighted_ranking(weights, dataset_version):
+    """Get the ranking of the IRIS with the demand index of some weights.
+
+    The ranking is copied from the one of equal weights and only updated once
+    per weights, so that a callback does not sort the IRIS again. The returned
+    ranking is shared between callbacks, and must not be modified.
+    """
+    demand = demand_index.matrix @ np.array(weights)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        demand_supply = demand / demand_index.supply
+    rank_index = ranking.copy()
+    rank_index.update(
+        pd.DataFrame(
+            {"demand_index": demand, "demand_supply_index": demand_supply},
+            index=demand_index.iris,
+        )
     )
-    .assign(demand_supply_index=lambda x: x["demand_index"] / x["supply_index"])
-)
+    return rank_index
+
+
+def get_map_data():
+    """Get the data needed to update the map in the browser.
+
+    Returns:
+        dict: For each level, the base figure (incl. geometry), the trace
+            properties and color axis of each column that can be selected, and
+            the scaled variables and supply of the demand index.
+    """
+    return {
+        level: {
+            **map_figures[level],
+            "demand_index": {
+                "matrix": demand_indexes[level].matrix.tolist(),
+                "supply": demand_indexes[level].supply.tolist(),
+            },
+        }
+        for level in level_tables
+    }
+
+
+def create_weight_sliders():
+    """Create a slider for the weight of each variable of the demand index"""
+    labels = {option["value"]: option["label"] for option in DEMAND_OPTIONS}
+    return [
+        html.Div(
+            [
+                dbc.Label(labels[var], className="small mb-0"),
+                # Only update the map when the slider is released
+                dcc.Slider(
+                    min=0,
+                    max=WEIGHT_MAX,
+                    step=WEIGHT_STEP,
+                    value=1,
+                    marks={weight: str(weight) for weight in range(WEIGHT_MAX + 1)},
+                    updatemode="mouseup",
+                    id={"type": "index-weight", "index": var},
+                ),
+            ]
+        )
+        for var in demand_index.index_vars
+    ]
+
 
 # Initialize the dash app
 application = Dash(
     __name__, external_stylesheets=[dbc.themes.BOOTSTRAP, dbc.icons.BOOTSTRAP]
 )
 server = application.server
+# Serve the JSON API to find the IRIS of points, their metrics and rankings
+server.register_blueprint(create_api(IrisLookup(df), ranking))
 
 # Define the dash app layout
 application.layout = dbc.Container(
@@ -90,25 +229,32 @@ application.layout = dbc.Container(
                                             ],
                                         ),
                                         dbc.RadioItems(
-                                            options=[
-                                                {
-                                                    "label": "Demand index",
-                                                    "value": "demand_index",
-                                                },
-                                                {
-                                                    "label": "Supply index",
-                                                    "value": "supply_index",
-                                                },
-                                                {
-                                                    "label": "Demand/Supply Index",
-                                                    "value": "demand_supply_index",
-                                                },
-                                            ],
+                                            options=INDEX_OPTIONS,
                                             value=None,
                                             id="demand-index-column-selector",
                                         ),
                                     ]
                                 ),
+                                dbc.CardFooter(
+                                    [
+                                        html.Div(
+                                            [
+                                                "Demand index weights ",
+                                                html.I(
+                                                    className="bi bi-info",
+                                                    id="weights-tooltip",
+                                                ),
+                                                dbc.Tooltip(
+                                                    "Weight of each demand metric in the demand index "
+                                                    "(and in the demand/supply index).",
+                                                    target="weights-tooltip",
+                                                ),
+                                            ],
+                                            className="mb-2",
+                                        ),
+                                        *create_weight_sliders(),
+                                    ]
+                                ),
                             ],
                         ),
                         html.Br(),
@@ -133,32 +279,7 @@ application.layout = dbc.Container(
                                             ],
                                         ),
                                         dbc.RadioItems(
-                                            options=[
-                                                {
-                                                    "label": "Population",
-                                                    "value": "nb_pop",
-                                                },
-                                                {
-                                                    "label": "Museum visitors",
-                                                    "value": "visitors",
-                                                },
-                                                {
-                                                    "label": "Metro passengers",
-                                                    "value": "nb_metro_rer_passengers",
-                                                },
-                                                {
-                                                    "label": "Train passengers",
-                                                    "value": "nb_train_passengers",
-                                                },
-                                                {
-                                                    "label": "Number of shops",
-                                                    "value": "shops_weighted",
-                                                },
-                                                {
-                                                    "label": "School capacity",
-                                                    "value": "school_capacity",
-                                                },
-                                            ],
+                                            options=DEMAND_OPTIONS,
                                             value="nb_pop",
                                             id="demand-column-selector",
                                         ),
@@ -201,12 +322,7 @@ application.layout = dbc.Container(
                                             ],
                                         ),
                                         dbc.RadioItems(
-                                            options=[
-                                                {
-                                                    "label": "Parking spots",
-                                                    "value": "nb_parking_spots",
-                                                }
-                                            ],
+                                            options=SUPPLY_OPTIONS,
                                             value=None,
                                             id="supply-column-selector",
                                         ),
@@ -214,11 +330,215 @@ application.layout = dbc.Container(
                                 ),
                             ],
                         ),
+                        html.Br(),
+                        dbc.Card(
+                            [
+                                dbc.CardBody(
+                                    [
+                                        html.H4(
+                                            [
+                                                html.I(className="bi bi-geo-alt me-2"),
+                                                "New parking spots ",
+                                                html.I(
+                                                    className="bi bi-info",
+                                                    id="placement-tooltip",
+                                                ),
+                                                dbc.Tooltip(
+                                                    "Where to build new parking spots to best cover the demand, "
+                                                    "given the weights of the demand index. Spots go first to "
+                                                    "IRIS with a high demand and few existing spots.",
+                                                    target="placement-tooltip",
+                                                ),
+                                            ],
+                                        ),
+                                        dbc.Label(
+                                            "Number of new spots",
+                                            className="small mb-0",
+                                        ),
+                                        dbc.Input(
+                                            type="number",
+                                            min=0,
+                                            max=PLACEMENT_MAX_BUDGET,
+                                            step=PLACEMENT_STEP,
+                                            value=PLACEMENT_BUDGET,
+                                            id="placement-budget",
+                                        ),
+                                        dbc.Label(
+                                            "Maximum per IRIS (optional)",
+                                            className="small mb-0 mt-2",
+                                        ),
+                                        dbc.Input(
+                                            type="number",
+                                            min=0,
+                                            step=PLACEMENT_STEP,
+                                            value=None,
+                                            id="placement-capacity",
+                                        ),
+                                        dbc.Button(
+                                            "Place",
+                                            id="placement-button",
+                                            color="primary",
+                                            className="mt-2",
+                                        ),
+                                        html.Div(
+                                            id="placement-result", className="mt-2"
+                                        ),
+                                    ]
+                                ),
+                            ],
+                        ),
                     ],
                     width=3,
                 ),
                 dbc.Col(
-                    dcc.Graph(id="map"),
+                    [
+                        html.Div(
+                            [
+                                dbc.RadioItems(
+                                    options=level_options,
+                                    value="iris",
+                                    inline=True,
+                                    id="level-selector",
+                                ),
+                                html.Span(
+                                    "Click on an area to show the smaller "
+                                    "areas inside it.",
+                                    className="small text-muted",
+                                ),
+                            ],
+                            className="d-flex justify-content-between",
+                        ),
+                        dcc.Graph(id="map"),
+                        dcc.Store(
+                            id="map-data",
+                            data=get_map_data() if CLIENTSIDE_CALLBACKS else None,
+                        ),
+                        dbc.Card(
+                            dbc.CardBody(
+                                [
+                                    html.H4(
+                                        [
+                                            html.I(className="bi bi-list-ol me-2"),
+                                            "Ranking of the IRIS",
+                                        ]
+                                    ),
+                                    dbc.Row(
+                                        [
+                                            dbc.Col(
+                                                [
+                                                    dbc.Label(
+                                                        "Rank by",
+                                                        className="small mb-0",
+                                                    ),
+                                                    dbc.Select(
+                                                        options=INDEX_OPTIONS
+                                                        + DEMAND_OPTIONS
+                                                        + SUPPLY_OPTIONS,
+                                                        value="demand_supply_index",
+                                                        id="ranking-column",
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Col(
+                                                [
+                                                    dbc.Label(
+                                                        "Arrondissements",
+                                                        className="small mb-0",
+                                                    ),
+                                                    dcc.Dropdown(
+                                                        options=list(range(1, 21)),
+                                                        multi=True,
+                                                        placeholder="All",
+                                                        id="ranking-arrondissement",
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Col(
+                                                [
+                                                    dbc.Label(
+                                                        "Minimum population",
+                                                        className="small mb-0",
+                                                    ),
+                                                    dbc.Input(
+                                                        type="number",
+                                                        min=0,
+                                                        value=None,
+                                                        debounce=True,
+                                                        id="ranking-population",
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Col(
+                                                [
+                                                    dbc.Label(
+                                                        "Number of IRIS",
+                                                        className="small mb-0",
+                                                    ),
+                                                    dbc.Input(
+                                                        type="number",
+                                                        min=1,
+                                                        value=TOP_N,
+                                                        debounce=True,
+                                                        id="ranking-size",
+                                                    ),
+                                                ]
+                                            ),
+                                        ]
+                                    ),
+                                    dbc.Row(
+                                        [
+                                            dbc.Col(
+                                                [
+                                                    dbc.Label(
+                                                        "Top percentage",
+                                                        className="small mb-0",
+                                                    ),
+                                                    dbc.Input(
+                                                        type="number",
+                                                        min=0,
+                                                        max=100,
+                                                        value=None,
+                                                        debounce=True,
+                                                        id="ranking-percentile",
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Col(
+                                                [
+                                                    dbc.Label(
+                                                        "Minimum value",
+                                                        className="small mb-0",
+                                                    ),
+                                                    dbc.Input(
+                                                        type="number",
+                                                        value=None,
+                                                        debounce=True,
+                                                        id="ranking-min",
+                                                    ),
+                                                ]
+                                            ),
+                                            dbc.Col(
+                                                [
+                                                    dbc.Label(
+                                                        "Maximum value",
+                                                        className="small mb-0",
+                                                    ),
+                                                    dbc.Input(
+                                                        type="number",
+                                                        value=None,
+                                                        debounce=True,
+                                                        id="ranking-max",
+                                                    ),
+                                                ]
+                                            ),
+                                        ],
+                                        className="mt-2",
+                                    ),
+                                    html.Div(id="ranking-result", className="mt-2"),
+                                ]
+                            ),
+                        ),
+                    ]
                 ),
             ]
         ),
@@ -263,59 +583,227 @@ application.layout = dbc.Container(
 )
 
 
-@application.callback(
+def update_map(
+    demand_input_value,
+    supply_input_value,
+    index_input_value,
+    normalize,
+    weights,
+    level,
+):
+    """Update the map according to the selected item on the RadioItems, the
+    weights of the demand index and the level of the map"""
+    col, _ = select_column(
+        demand_input_value, supply_input_value, index_input_value, normalize
+    )
+    weight_changed = isinstance(callback_context.triggered_id, dict)
+    if col not in WEIGHTED_COLUMNS:
+        # The map does not depend on the weights
+        if weight_changed:
+            return no_update
+        z = None
+    else:
+        z = compute_weighted_column(demand_indexes[level], col, weights)
+
+    # If only the weights changed, only send the new color values
+    if weight_changed:
+        patched_fig = Patch()
+        patched_fig["data"][0]["z"] = z
+        return patched_fig
+
+    fig = get_figure(col, level, dataset_version)
+    if z is not None:
+        fig = {**fig, "data": [{**fig["data"][0], "z": z}]}
+
+    # Send the whole figure (incl. geometry) only on the first render
+    if callback_context.triggered_id is None:
+        return fig
+
+    # Afterwards, only update what depends on the selected column (and the
+    # whole trace when the level changes), keeping the view of the map
+    patched_fig = Patch()
+    if callback_context.triggered_id == "level-selector":
+        patched_fig["data"][0] = fig["data"][0]
+    else:
+        for prop in MAP_TRACE_PROPS:
+            patched_fig["data"][0][prop] = fig["data"][0][prop]
+    patched_fig["layout"]["coloraxis"] = fig["layout"]["coloraxis"]
+    return patched_fig
+
+
+def update_supply_demand_radioitems(
+    demand_input_value, supply_input_value, index_input_value
+):
+    """Guarantee only one RadioItems has a value selected"""
+    if callback_context.triggered_id == "demand-column-selector":
+        return demand_input_value, None, None
+    elif callback_context.triggered_id == "supply-column-selector":
+        return None, supply_input_value, None
+    elif callback_context.triggered_id == "demand-index-column-selector":
+        return None, None, index_input_value
+
+
+update_map_dependencies = [
     Output(component_id="map", component_property="figure"),
     Input(component_id="demand-column-selector", component_property="value"),
     Input(component_id="supply-column-selector", component_property="value"),
     Input(component_id="demand-index-column-selector", component_property="value"),
     Input(component_id="normalize-button", component_property="value"),
-)
-def update_map(demand_input_value, supply_input_value, index_input_value, normalize):
-    """Update the map according to the selected item on the RadioItems"""
-    # Plot from supply RadioItems or demand RadioItems?
-    if demand_input_value:
-        col = demand_input_value
-        colorscale = "OrRd"
-        # Normalize or not?
-        if normalize:
-            col += "_normalized"
-    elif supply_input_value:
-        col = supply_input_value
-        colorscale = "Greens"
-    elif index_input_value:
-        col = index_input_value
-        if col == "demand_index":
-            colorscale = "OrRd"
-        elif col == "supply_index":
-            colorscale = "Greens"
-        else:
-            colorscale = "Blues"
-
-    fig = create_map(df, col, width=None, height=None, colorscale=colorscale)
-    # Remove legend title
-    fig.update_layout(coloraxis_colorbar={"title": ""})
-    return fig
-
-
-@application.callback(
+    Input(
+        component_id={"type": "index-weight", "index": ALL}, component_property="value"
+    ),
+    Input(component_id="level-selector", component_property="value"),
+]
+update_radioitems_dependencies = [
     Output(component_id="demand-column-selector", component_property="value"),
     Output(component_id="supply-column-selector", component_property="value"),
     Output(component_id="demand-index-column-selector", component_property="value"),
     Input(component_id="demand-column-selector", component_property="value"),
     Input(component_id="supply-column-selector", component_property="value"),
     Input(component_id="demand-index-column-selector", component_property="value"),
+]
+if CLIENTSIDE_CALLBACKS:
+    # Same callbacks, implemented in assets/clientside.js
+    application.clientside_callback(
+        ClientsideFunction(namespace="paris_bikes", function_name="update_map"),
+        *update_map_dependencies,
+        Input(component_id="map-data", component_property="data"),
+        State(component_id="map", component_property="figure"),
+    )
+    application.clientside_callback(
+        ClientsideFunction(
+            namespace="paris_bikes",
+            function_name="update_supply_demand_radioitems",
+        ),
+        *update_radioitems_dependencies,
+        prevent_initial_call=True,
+    )
+else:
+    application.callback(*update_map_dependencies)(update_map)
+    application.callback(*update_radioitems_dependencies, prevent_initial_call=True)(
+        update_supply_demand_radioitems
+    )
+
+
+@application.callback(
+    Output("level-selector", "value"),
+    Output("map", "figure", allow_duplicate=True),
+    Input("map", "clickData"),
+    State("level-selector", "value"),
     prevent_initial_call=True,
 )
-def update_supply_demand_radioitems(
-    demand_input_value, supply_input_value, index_input_value
+def drill_down(click_data, level):
+    """Show the areas of the next level inside the clicked area"""
+    if not click_data or level not in finer_levels:
+        return no_update, no_update
+    view = area_views[level][click_data["points"][0]["location"]]
+    patched_fig = Patch()
+    patched_fig["layout"]["mapbox"]["center"] = view["center"]
+    patched_fig["layout"]["mapbox"]["zoom"] = view["zoom"]
+    return finer_levels[level], patched_fig
+
+
+@application.callback(
+    Output("placement-result", "children"),
+    Input("placement-button", "n_clicks"),
+    State("placement-budget", "value"),
+    State("placement-capacity", "value"),
+    State({"type": "index-weight", "index": ALL}, "value"),
+    prevent_initial_call=True,
+)
+def update_placement(n_clicks, budget, capacity, weights):
+    """Place new parking spots for the demand index of the selected weights"""
+    if not budget:
+        return None
+    if budget < 0 or budget > PLACEMENT_MAX_BUDGET:
+        return html.Div(
+            f"The number of new spots must be between 0 and {PLACEMENT_MAX_BUDGET}.",
+            className="small text-danger",
+        )
+    if capacity is not None and capacity < 0:
+        return html.Div(
+            "The maximum per IRIS must be positive.", className="small text-danger"
+        )
+    base = ScenarioBase(
+        df, demand=demand_index.matrix @ demand_index.get_weights(weights)
+    )
+    placement = place_parking(base.create_scenario(), budget, capacity)
+    table = (
+        placement.spots.head(PLACEMENT_ROWS)
+        .reset_index()
+        .loc[:, ["iris", "added_spots", "demand_supply_index"]]
+        .rename(
+            columns={
+                "iris": "IRIS",
+                "added_spots": "New spots",
+                "demand_supply_index": "Demand/Supply",
+            }
+        )
+        .round(2)
+    )
+    return [
+        html.Div(
+            f"{placement.spots['added_spots'].sum():g} spots in "
+            f"{len(placement.spots)} IRIS.",
+            className="small",
+        ),
+        dbc.Table.from_dataframe(table, size="sm", striped=True, className="small"),
+    ]
+
+
+@application.callback(
+    Output("ranking-result", "children"),
+    Input("ranking-column", "value"),
+    Input("ranking-arrondissement", "value"),
+    Input("ranking-population", "value"),
+    Input("ranking-size", "value"),
+    Input("ranking-percentile", "value"),
+    Input("ranking-min", "value"),
+    Input("ranking-max", "value"),
+    Input({"type": "index-weight", "index": ALL}, "value"),
+)
+def update_ranking(
+    col, arrondissement, population, size, percentile, min_value, max_value, weights
 ):
-    """Guarantee only one RadioItems has a value selected"""
-    if callback_context.triggered_id == "demand-column-selector":
-        return demand_input_value, None, None
-    elif callback_context.triggered_id == "supply-column-selector":
-        return None, supply_input_value, None
-    elif callback_context.triggered_id == "demand-index-column-selector":
-        return None, None, index_input_value
+    """List the IRIS with the highest values of the selected column"""
+    rank_index = ranking
+    weights = demand_index.get_weights(weights)
+    if col in WEIGHTED_COLUMNS and not np.array_equal(
+        weights, demand_index.get_weights("equal")
+    ):
+        # Rank the IRIS by the index of the selected weights
+        rank_index = get_weighted_ranking(tuple(weights.tolist()), dataset_version)
+
+    result = rank_index.top(
+        col,
+        n=max(int(size or TOP_N), 1),
+        arrondissement=arrondissement or None,
+        min_population=population,
+        min_value=min_value,
+        max_value=max_value,
+        percentile=None if percentile is None else min(max(percentile, 0), 100),
+    )
+    labels = {
+        option["value"]: option["label"]
+        for option in INDEX_OPTIONS + DEMAND_OPTIONS + SUPPLY_OPTIONS
+    }
+    table = (
+        result.top.reset_index()
+        .loc[:, ["rank", "iris", "arrondissement", col]]
+        .rename(
+            columns={
+                "rank": "Rank",
+                "iris": "IRIS",
+                "arrondissement": "Arrondissement",
+                col: labels[col],
+            }
+        )
+        .round(2)
+    )
+    return [
+        html.Div(f"{result.count} IRIS match the filters.", className="small"),
+        dbc.Table.from_dataframe(table, size="sm", striped=True, className="small"),
+    ]
 
 
 @application.callback(
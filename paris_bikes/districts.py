@@ -0,0 +1,192 @@
+import re
+import unicodedata
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+import pandas as pd
+
+# The geospatial stack is only needed to locate the IRIS that are not named
+# after a quartier, so that the serving process can import this module
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+# The 80 administrative quartiers of Paris, in the order of their official
+# number (1 to 80), spelled as in the IRIS names. Each arrondissement has 4
+# consecutive quartiers.
+QUARTIERS = [
+    "Saint-Germain l'Auxerrois",
+    "Les Halles",
+    "Palais Royal",
+    "Place Vendôme",
+    "Gaillon",
+    "Vivienne",
+    "Mail",
+    "Bonne Nouvelle",
+    "Arts et Métiers",
+    "Enfants Rouges",
+    "Les Archives",
+    "Sainte-Avoye",
+    "Saint-Merri",
+    "Saint-Gervais",
+    "Arsenal",
+    "Notre-Dame",
+    "Saint-Victor",
+    "Jardin des Plantes",
+    "Val-de-Grâce",
+    "Sorbonne",
+    "Monnaie",
+    "Odéon",
+    "Notre-Dame des Champs",
+    "Saint-Germain des Prés",
+    "Saint-Thomas d'Aquin",
+    "Invalides",
+    "École Militaire",
+    "Gros Caillou",
+    "Champs Élysées",
+    "Faubourg du Roule",
+    "Madeleine",
+    "Europe",
+    "Saint-Georges",
+    "Chaussée d'Antin",
+    "Faubourg Montmartre",
+    "Rochechouart",
+    "Saint-Vincent de Paul",
+    "Porte Saint-Denis",
+    "Porte Saint-Martin",
+    "Hôpital Saint-Louis",
+    "Folie Méricourt",
+    "Saint-Ambroise",
+    "Roquette",
+    "Sainte-Marguerite",
+    "Bel Air",
+    "Picpus",
+    "Bercy",
+    "Quinze Vingts",
+    "Salpêtrière",
+    "Gare",
+    "Maison Blanche",
+    "Croulebarbe",
+    "Montparnasse",
+    "Parc de Montsouris",
+    "Petit Montrouge",
+    "Plaisance",
+    "Saint-Lambert",
+    "Necker",
+    "Grenelle",
+    "Javel",
+    "Auteuil",
+    "Muette",
+    "Porte Dauphine",
+    "Chaillot",
+    "Ternes",
+    "Plaine Monceau",
+    "Batignolles",
+    "Épinettes",
+    "Grandes Carrières",
+    "Clignancourt",
+    "Goutte d'Or",
+    "Chapelle",
+    "Villette",
+    "Pont de Flandre",
+    "Amérique",
+    "Combat",
+    "Belleville",
+    "Saint-Fargeau",
+    "Père Lachaise",
+    "Charonne",
+]
+
+# Number of quartiers per arrondissement
+QUARTIERS_PER_ARRONDISSEMENT = 4
+
+# Number added to the quartier name to name each of its IRIS (e.g. "Amérique 10")
+IRIS_NUMBER_PATTERN = re.compile(r"\s+\d+$")
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a place name, to match names spelled differently.
+
+    Accents, case, hyphens and apostrophes are ignored (e.g. "EcoLe Militaire"
+    and "École Militaire" match).
+
+    Args:
+        name (str): Place name.
+
+    Returns:
+        str: Normalized name.
+    """
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", name.casefold()).split())
+
+
+# Official number of each quartier, by normalized name
+QUARTIER_NUMBERS = {
+    normalize_name(name): number for number, name in enumerate(QUARTIERS, start=1)
+}
+
+
+def get_quartier(iris: str) -> Optional[int]:
+    """Get the quartier of an IRIS from its name.
+
+    Args:
+        iris (str): Name of the IRIS, e.g. "Amérique 10".
+
+    Returns:
+        Optional[int]: Official number of the quartier (1 to 80), or None if
+            the IRIS is not named after a quartier (e.g. "Bois de Boulogne").
+    """
+    return QUARTIER_NUMBERS.get(normalize_name(IRIS_NUMBER_PATTERN.sub("", iris)))
+
+
+def get_arrondissement(quartier: np.ndarray) -> np.ndarray:
+    """Get the arrondissement of quartiers.
+
+    Args:
+        quartier (np.ndarray): Official numbers of the quartiers.
+
+    Returns:
+        np.ndarray: Number of their arrondissement (1 to 20).
+    """
+    return (np.asarray(quartier) - 1) // QUARTIERS_PER_ARRONDISSEMENT + 1
+
+
+def locate_districts(geometry: "gpd.GeoSeries") -> pd.DataFrame:
+    """Find the quartier and arrondissement of each IRIS.
+
+    IRIS are matched to quartiers by name. IRIS that are not named after a
+    quartier (parks, canals, the Seine...) get the quartier of the closest
+    matched IRIS.
+
+    Args:
+        geometry (gpd.GeoSeries): Polygons of all IRIS, indexed by IRIS.
+
+    Raises:
+        ValueError: If no IRIS is named after a quartier.
+
+    Returns:
+        pd.DataFrame: Quartier ("quartier", 1 to 80) and arrondissement
+            ("arrondissement", 1 to 20) of each IRIS.
+    """
+    import shapely
+
+    quartier = pd.Series(
+        [get_quartier(iris) for iris in geometry.index],
+        index=geometry.index,
+        dtype=float,
+    )
+    matched = quartier.notna().to_numpy()
+    if not matched.any():
+        raise ValueError("No IRIS is named after a quartier of Paris.")
+
+    # Give the other IRIS the quartier of the closest matched IRIS
+    polygons = geometry.values.data
+    for row in np.flatnonzero(~matched):
+        point = shapely.point_on_surface(polygons[row])
+        distances = shapely.distance(polygons[matched], point)
+        quartier.iloc[row] = quartier[matched].iloc[int(np.argmin(distances))]
+
+    quartier = quartier.astype(int)
+    return pd.DataFrame(
+        {"quartier": quartier, "arrondissement": get_arrondissement(quartier)}
+    )
@@ -0,0 +1,326 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple, Union
+
+from paris_bikes.utils import get_data_root
+
+# Location of the persistent geocoding cache
+GEOCODING_CACHE_FILEPATH = get_data_root() / "cache" / "geocoding.sqlite"
+
+# Number of days after which a failed geocoding is retried
+FAILURE_EXPIRY_DAYS = 30
+
+# If True, locations are only geocoded from the cache, never from the network
+GEOCODING_OFFLINE = os.environ.get("PARIS_BIKES_GEOCODING_OFFLINE", "0") == "1"
+
+# If set, locations are geocoded from this fixture file instead of Nominatim
+GEOCODING_FIXTURE = os.environ.get("PARIS_BIKES_GEOCODING_FIXTURE")
+
+# Domain of the Nominatim server (e.g. "localhost:8080" for a local server)
+NOMINATIM_DOMAIN = os.environ.get(
+    "PARIS_BIKES_NOMINATIM_DOMAIN", "nominatim.openstreetmap.org"
+)
+
+# Maximum number of requests per second (the Nominatim usage policy allows 1)
+GEOCODING_RATE = 1.0
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query, so that equivalent queries share a cache entry.
+
+    Args:
+        query (str): Location name to geocode.
+
+    Returns:
+        str: Query in lowercase, in Unicode NFC form and without redundant
+            whitespace.
+    """
+    return " ".join(unicodedata.normalize("NFC", query).lower().split())
+
+
+class GeocodingCache:
+    """Persistent cache of geocoded locations, stored in a SQLite file.
+
+    Failed geocodings are stored as well (as negative entries), so that they
+    are not retried on every run, but they expire after failure_expiry_days.
+
+    Args:
+        filepath (Union[str, Path], optional): Location of the SQLite file.
+            Defaults to GEOCODING_CACHE_FILEPATH.
+        failure_expiry_days (float, optional): Number of days after which a
+            failed geocoding is retried. Defaults to FAILURE_EXPIRY_DAYS.
+    """
+
+    def __init__(
+        self,
+        filepath: Union[str, Path] = GEOCODING_CACHE_FILEPATH,
+        failure_expiry_days: float = FAILURE_EXPIRY_DAYS,
+    ):
+        Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+        self.failure_expiry = failure_expiry_days * 24 * 60 * 60
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(filepath, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS geocodes ("
+                "query TEXT PRIMARY KEY, longitude REAL, latitude REAL, "
+                "timestamp REAL NOT NULL)"
+            )
+
+    def get(self, query: str) -> Tuple[bool, Optional[Tuple[float, float]]]:
+        """Get a location from the cache.
+
+        Args:
+            query (str): Location name to geocode.
+
+        Returns:
+            Tuple[bool, Optional[Tuple[float, float]]]: Whether the query is
+                in the cache, and its (longitude, latitude), or None if the
+                geocoding failed.
+        """
+        with self._lock:
+            entry = self._connection.execute(
+                "SELECT longitude, latitude, timestamp FROM geocodes WHERE query = ?",
+                (normalize_query(query),),
+            ).fetchone()
+
+        if entry is None:
+            return False, None
+        longitude, latitude, timestamp = entry
+        if longitude is None:
+            # Negative entry: only valid until it expires
+            if time.time() - timestamp > self.failure_expiry:
+                return False, None
+            return True, None
+        return True, (longitude, latitude)
+
+    def set(self, query: str, location: Optional[Tuple[float, float]]):
+        """Store a location in the cache.
+
+        Args:
+            query (str): Location name to geocode.
+            location (Optional[Tuple[float, float]]): (longitude, latitude) of
+                the location, or None if the geocoding failed.
+        """
+        longitude, latitude = location if location is not None else (None, None)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?)",
+                (normalize_query(query), longitude, latitude, time.time()),
+            )
+
+    def close(self):
+        """Close the connection to the SQLite file."""
+        with self._lock:
+            self._connection.close()
+
+
+class GeocodingBackend(ABC):
+    """Interface of the services used to geocode location names."""
+
+    @abstractmethod
+    def geocode(self, query: str) -> Optional[Tuple[float, float]]:
+        """Geocode a location name.
+
+        Args:
+            query (str): Location name to geocode.
+
+        Raises:
+            Exception: If the service could not be reached (the query is then
+                retried).
+
+        Returns:
+            Optional[Tuple[float, float]]: (longitude, latitude) of the
+                location, or None if it was not found.
+        """
+
+
+class NominatimBackend(GeocodingBackend):
+    """Geocode location names with Nominatim (OpenStreetMap data).
+
+    Args:
+        domain (str, optional): Domain of the Nominatim server. Defaults to
+            NOMINATIM_DOMAIN.
+        scheme (str, optional): Either "https" or "http". Defaults to "https",
+            or "http" if the domain is a local server.
+        timeout (float, optional): Timeout of each request, in seconds.
+            Defaults to 10.
+    """
+
+    def __init__(
+        self,
+        domain: str = NOMINATIM_DOMAIN,
+        scheme: Optional[str] = None,
+        timeout: float = 10,
+    ):
+        from geopy.geocoders import Nominatim
+
+        if scheme is None:
+            scheme = "http" if domain.startswith("localhost") else "https"
+        self.geolocator = Nominatim(
+            user_agent="correlaid-paris-bikes",
+            domain=domain,
+            scheme=scheme,
+            timeout=timeout,
+        )
+
+    def geocode(self, query: str) -> Optional[Tuple[float, float]]:
+        location = self.geolocator.geocode(query)
+        if location is None:
+            return None
+        return location.longitude, location.latitude
+
+
+class FixtureBackend(GeocodingBackend):
+    """Geocode location names from a CSV file, e.g. for tests or CI.
+
+    Args:
+        filepath (Union[str, Path]): CSV file with columns query, longitude and
+            latitude. Queries not in the file are not found.
+    """
+
+    def __init__(self, filepath: Union[str, Path]):
+        with open(filepath, newline="", encoding="utf-8") as file:
+            self.locations = {
+                normalize_query(row["query"]): (
+                    float(row["longitude"]),
+                    float(row["latitude"]),
+                )
+                for row in csv.DictReader(file)
+            }
+
+    def geocode(self, query: str) -> Optional[Tuple[float, float]]:
+        return self.locations.get(normalize_query(query))
+
+
+def get_default_backend() -> GeocodingBackend:
+    """Get the fixture backend if PARIS_BIKES_GEOCODING_FIXTURE is set, or the
+    Nominatim backend otherwise."""
+    if GEOCODING_FIXTURE:
+        return FixtureBackend(GEOCODING_FIXTURE)
+    return NominatimBackend()
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter.
+
+    Args:
+        rate (float): Number of tokens added per second.
+        capacity (float, optional): Maximum number of tokens, i.e. of requests
+            that can be made at once. Defaults to 1.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._timestamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Wait until a token is available, and take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._timestamp) * self.rate
+                )
+                self._timestamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class GeocodingResult(NamedTuple):
+    """Result of the geocoding of a query.
+
+    status is one of "cached", "geocoded", "not_found" or "failed" (the
+    service could not be reached, or the query is not in the cache in offline
+    mode).
+    """
+
+    location: Optional[Tuple[float, float]]
+    status: str
+    error: Optional[str] = None
+
+
+def batch_geocode(
+    queries: Iterable[str],
+    backend: Optional[GeocodingBackend] = None,
+    cache: Optional[GeocodingCache] = None,
+    rate: float = GEOCODING_RATE,
+    max_workers: int = 4,
+    max_retries: int = 3,
+    backoff: float = 1.0,
+) -> Dict[str, GeocodingResult]:
+    """Geocode many location names concurrently.
+
+    Queries are deduplicated and looked up in the cache first. The remaining
+    ones are sent to the backend by a pool of workers, at most rate requests
+    per second. Queries that raise an error are retried with exponential
+    backoff.
+
+    Args:
+        queries (Iterable[str]): Location names to geocode.
+        backend (GeocodingBackend, optional): Service used to geocode the
+            queries. If None, only the cache is used (offline mode). Defaults
+            to None.
+        cache (GeocodingCache, optional): Geocoding cache. Defaults to None.
+        rate (float, optional): Maximum number of requests per second. Defaults
+            to GEOCODING_RATE.
+        max_workers (int, optional): Number of concurrent requests. Defaults to
+            4.
+        max_retries (int, optional): Number of retries of a failed request.
+            Defaults to 3.
+        backoff (float, optional): Waiting time before the first retry, in
+            seconds. It doubles on every retry. Defaults to 1.
+
+    Returns:
+        Dict[str, GeocodingResult]: Result of each (distinct) query. Queries
+            that are not strings (e.g. missing values) are skipped.
+    """
+    results = {}
+    to_geocode = []
+    for query in dict.fromkeys(queries):
+        if not isinstance(query, str):
+            continue
+        hit, location = cache.get(query) if cache is not None else (False, None)
+        if hit:
+            results[query] = GeocodingResult(location, "cached")
+        elif backend is None:
+            results[query] = GeocodingResult(None, "failed", "not in cache (offline)")
+        else:
+            to_geocode.append(query)
+
+    bucket = TokenBucket(rate)
+
+    def geocode(query: str) -> GeocodingResult:
+        for attempt in range(max_retries + 1):
+            bucket.acquire()
+            try:
+                location = backend.geocode(query)
+            except Exception as error:
+                if attempt == max_retries:
+                    return GeocodingResult(None, "failed", repr(error))
+                time.sleep(backoff * 2**attempt)
+            else:
+                if cache is not None:
+                    cache.set(query, location)
+                if location is None:
+                    return GeocodingResult(None, "not_found")
+                return GeocodingResult(location, "geocoded")
+
+    if to_geocode:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results.update(zip(to_geocode, executor.map(geocode, to_geocode)))
+
+    return results
@@ -0,0 +1,113 @@
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely.ops import linemerge
+
+# Simplification tolerance (in degrees) and number of decimals kept in the
+# coordinates. At Paris' latitude, 1e-5 degrees is roughly one meter, and a
+# pixel at zoom 11 (the initial zoom of the maps) covers about 50 meters
+GEOMETRY_TOLERANCE = 2.5e-4
+GEOMETRY_PRECISION = 4
+
+
+def _build_arcs(geometry: gpd.GeoSeries) -> np.ndarray:
+    """Split the IRIS boundaries into arcs shared by neighbouring IRIS.
+
+    Args:
+        geometry (gpd.GeoSeries): Polygons of all IRIS.
+
+    Returns:
+        np.ndarray: Array of LineStrings, each one either between two junctions
+            of the IRIS boundaries or a closed ring without junctions.
+    """
+    # Node all boundaries, so that a shared border becomes one single line
+    linework = shapely.union_all(shapely.boundary(geometry.values.data))
+    arcs = linemerge(linework)
+    return shapely.get_parts(arcs)
+
+
+def _simplify_level(
+    geometry: gpd.GeoSeries, arcs: np.ndarray, tolerance: float, precision: int
+) -> np.ndarray:
+    """Simplify the IRIS polygons by simplifying their shared arcs.
+
+    Each arc is simplified once, so neighbouring IRIS keep exactly the same
+    border and no gaps or slivers appear between them.
+
+    Args:
+        geometry (gpd.GeoSeries): Polygons of all IRIS.
+        arcs (np.ndarray): Arcs of the IRIS boundaries, from _build_arcs.
+        tolerance (float): Simplification tolerance, in degrees.
+        precision (int): Number of decimals kept in the coordinates.
+
+    Returns:
+        np.ndarray: Simplified polygons, in the same order as geometry.
+    """
+    polygons = geometry.values.data
+
+    # Simplify and quantize the arcs (the end points of an arc are always kept,
+    # so arcs still meet at the same junctions)
+    arcs = shapely.simplify(arcs, tolerance, preserve_topology=True)
+    arcs = shapely.transform(arcs, lambda coords: np.round(coords, precision))
+    arcs = arcs[shapely.length(arcs) > 0]
+
+    # Rebuild the faces delimited by the arcs and assign them to an IRIS
+    faces = shapely.get_parts(shapely.polygonize(arcs))
+    tree = shapely.STRtree(polygons)
+    face_idx, iris_idx = tree.query(shapely.point_on_surface(faces), predicate="within")
+    face_idx, first = np.unique(face_idx, return_index=True)
+    iris_idx = iris_idx[first]
+
+    simplified = np.empty(len(polygons), dtype=object)
+    for idx in np.unique(iris_idx):
+        simplified[idx] = shapely.union_all(faces[face_idx[iris_idx == idx]])
+
+    # IRIS that could not be rebuilt from the arcs (e.g. collapsed by the
+    # simplification) fall back to a simplification of their own geometry
+    missing = np.array([geom is None for geom in simplified])
+    if missing.any():
+        fallback = shapely.simplify(
+            polygons[missing], tolerance, preserve_topology=True
+        )
+        simplified[missing] = shapely.transform(
+            fallback, lambda coords: np.round(coords, precision)
+        )
+
+    return simplified
+
+
+def simplify_geometry(
+    geometry: gpd.GeoSeries,
+    tolerance: float = GEOMETRY_TOLERANCE,
+    precision: int = GEOMETRY_PRECISION,
+) -> dict:
+    """Build a simplified and quantized version of the IRIS geometry.
+
+    This is meant to be run once (e.g. at startup), and its output passed to
+    create_map, instead of serializing the full precision geometry on every
+    map update.
+
+    Args:
+        geometry (gpd.GeoSeries): Polygons of all IRIS, indexed by IRIS.
+        tolerance (float, optional): Simplification tolerance, in degrees.
+            Defaults to GEOMETRY_TOLERANCE.
+        precision (int, optional): Number of decimals kept in the coordinates.
+            Defaults to GEOMETRY_PRECISION.
+
+    Returns:
+        dict: GeoJSON feature collection, where the id of each feature is the
+            IRIS.
+    """
+    simplified = _simplify_level(geometry, _build_arcs(geometry), tolerance, precision)
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": iris,
+                "properties": {},
+                "geometry": geom.__geo_interface__,
+            }
+            for iris, geom in zip(geometry.index, simplified)
+        ],
+    }
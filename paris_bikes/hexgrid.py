@@ -0,0 +1,372 @@
+import math
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from paris_bikes.hierarchy import ROLL_UP_COLUMNS, Membership
+from paris_bikes.serving import derive_columns
+
+# The geospatial stack is only needed to spread the population of the IRIS
+# over the cells, so that the serving process can import this module
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+# Center of the plane the grid is drawn on (point zéro of Paris, as longitude
+# and latitude), and mean radius of the Earth (in meters)
+GRID_ORIGIN = (2.348796, 48.853402)
+EARTH_RADIUS = 6371008.8
+
+# Size of the hexagons of each resolution (distance from their center to their
+# corners, in meters), from the coarsest (resolution 0) to the finest. Each
+# size is half the previous one, so a cell has about 4 cells of the next
+# resolution.
+HEX_SIZES = [1000, 500, 250]
+
+# Number of bits of each axial coordinate in the cell ids (the resolution is
+# stored above them)
+AXIAL_BITS = 24
+
+# Levels of the map, from the finest to the coarsest (as LEVELS)
+HEX_LEVELS = [f"hex_{size}m" for size in reversed(HEX_SIZES)]
+
+# Options of the RadioItems used to select the level of the map
+HEX_LEVEL_OPTIONS = [
+    {"label": f"Hexagons {size} m", "value": level}
+    for size, level in zip(reversed(HEX_SIZES), HEX_LEVELS)
+]
+
+
+def project(lon: np.ndarray, lat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Project coordinates on the plane of the grid.
+
+    The projection is equirectangular around GRID_ORIGIN: at the scale of
+    Paris, distances are off by less than 0.1%.
+
+    Args:
+        lon (np.ndarray): Longitudes.
+        lat (np.ndarray): Latitudes.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Coordinates on the plane (in meters).
+    """
+    lon0, lat0 = GRID_ORIGIN
+    x = np.radians(np.asarray(lon, dtype=float) - lon0) * math.cos(math.radians(lat0))
+    y = np.radians(np.asarray(lat, dtype=float) - lat0)
+    return x * EARTH_RADIUS, y * EARTH_RADIUS
+
+
+def unproject(x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the longitude and latitude of coordinates on the plane of the grid.
+
+    Args:
+        x (np.ndarray): Coordinates on the plane (in meters).
+        y (np.ndarray): Coordinates on the plane (in meters).
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Longitudes and latitudes.
+    """
+    lon0, lat0 = GRID_ORIGIN
+    lon = np.degrees(x / EARTH_RADIUS / math.cos(math.radians(lat0))) + lon0
+    return lon, np.degrees(y / EARTH_RADIUS) + lat0
+
+
+def encode_cells(resolution: int, q: np.ndarray, r: np.ndarray) -> np.ndarray:
+    """Pack the axial coordinates of cells into integer ids.
+
+    Args:
+        resolution (int): Resolution of the cells (position in HEX_SIZES).
+        q (np.ndarray): First axial coordinates of the cells.
+        r (np.ndarray): Second axial coordinates of the cells.
+
+    Returns:
+        np.ndarray: Ids of the cells (int64).
+    """
+    offset = 1 << (AXIAL_BITS - 1)
+    q = np.asarray(q, dtype=np.int64) + offset
+    r = np.asarray(r, dtype=np.int64) + offset
+    return (np.int64(resolution) << (2 * AXIAL_BITS)) | (q << AXIAL_BITS) | r
+
+
+def decode_cells(cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Unpack the resolution and axial coordinates of cells from their ids.
+
+    Args:
+        cells (np.ndarray): Ids of the cells.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Resolution, and first and
+            second axial coordinates of each cell.
+    """
+    cells = np.asarray(cells, dtype=np.int64)
+    offset = 1 << (AXIAL_BITS - 1)
+    mask = (1 << AXIAL_BITS) - 1
+    resolution = cells >> (2 * AXIAL_BITS)
+    q = ((cells >> AXIAL_BITS) & mask) - offset
+    r = (cells & mask) - offset
+    return resolution, q, r
+
+
+def get_cells(x: np.ndarray, y: np.ndarray, resolution: int) -> np.ndarray:
+    """Find the cells containing points of the plane of the grid.
+
+    The hexagons are pointy-topped. The axial coordinates of the points are
+    computed for all points at once, and rounded to the closest hexagon in
+    cube coordinates (q + r + s = 0).
+
+    Args:
+        x (np.ndarray): Coordinates of the points on the plane (in meters).
+        y (np.ndarray): Coordinates of the points on the plane (in meters).
+        resolution (int): Resolution of the cells (position in HEX_SIZES).
+
+    Returns:
+        np.ndarray: Id of the cell of each point.
+    """
+    size = HEX_SIZES[resolution]
+    q = (math.sqrt(3) / 3 * np.asarray(x) - np.asarray(y) / 3) / size
+    r = 2 / 3 * np.asarray(y) / size
+    s = -q - r
+
+    # Round each coordinate, and fix the one with the largest rounding error
+    q_round, r_round, s_round = np.round(q), np.round(r), np.round(s)
+    q_diff, r_diff, s_diff = abs(q_round - q), abs(r_round - r), abs(s_round - s)
+    fix_q = (q_diff > r_diff) & (q_diff > s_diff)
+    fix_r = ~fix_q & (r_diff > s_diff)
+    q_round = np.where(fix_q, -r_round - s_round, q_round)
+    r_round = np.where(fix_r, -q_round - s_round, r_round)
+    return encode_cells(resolution, q_round, r_round)
+
+
+def locate_cells(lon: np.ndarray, lat: np.ndarray, resolution: int) -> np.ndarray:
+    """Find the cells containing points.
+
+    Args:
+        lon (np.ndarray): Longitudes of the points.
+        lat (np.ndarray): Latitudes of the points.
+        resolution (int): Resolution of the cells (position in HEX_SIZES).
+
+    Returns:
+        np.ndarray: Id of the cell of each point.
+    """
+    return get_cells(*project(lon, lat), resolution)
+
+
+def get_centers(cells: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Get the centers of cells on the plane of the grid.
+
+    Args:
+        cells (np.ndarray): Ids of the cells.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Coordinates of the centers (in meters).
+    """
+    resolution, q, r = decode_cells(cells)
+    size = np.asarray(HEX_SIZES, dtype=float)[resolution]
+    return size * math.sqrt(3) * (q + r / 2), size * 1.5 * r
+
+
+def get_parents(cells: np.ndarray, resolution: int) -> np.ndarray:
+    """Find the cells of a coarser resolution that cells belong to.
+
+    A cell belongs to the coarser cell containing its center. Hexagons cannot
+    be split exactly into smaller hexagons, so the cells of a coarse cell
+    cover it up to the edges of its border cells. With sizes halved at each
+    resolution, a coarse cell has 4 cells.
+
+    Args:
+        cells (np.ndarray): Ids of the cells.
+        resolution (int): Coarser resolution (position in HEX_SIZES).
+
+    Returns:
+        np.ndarray: Id of the coarser cell of each cell.
+    """
+    x, y = get_centers(cells)
+    # Some centers are on the edges of the coarser cells: move them slightly,
+    # so that they always fall on the same side
+    return get_cells(x + 1e-3, y + 7e-4, resolution)
+
+
+def get_corners(cells: np.ndarray) -> np.ndarray:
+    """Get the corners of cells on the plane of the grid.
+
+    Args:
+        cells (np.ndarray): Ids of the cells.
+
+    Returns:
+        np.ndarray: Coordinates of the 6 corners of each cell (in meters),
+            with shape (cells, 6, 2).
+    """
+    x, y = get_centers(cells)
+    resolution, _, _ = decode_cells(cells)
+    size = np.asarray(HEX_SIZES, dtype=float)[resolution]
+    angles = np.radians(30 + 60 * np.arange(6))
+    return np.stack(
+        [
+            x[:, None] + size[:, None] * np.cos(angles),
+            y[:, None] + size[:, None] * np.sin(angles),
+        ],
+        axis=-1,
+    )
+
+
+def get_cell_names(cells: np.ndarray) -> List[str]:
+    """Name cells, e.g. "Hexagon 250 m (12, -3)".
+
+    Args:
+        cells (np.ndarray): Ids of the cells.
+
+    Returns:
+        List[str]: Names of the cells, with their size and axial coordinates.
+    """
+    resolution, q, r = decode_cells(cells)
+    return [
+        f"Hexagon {HEX_SIZES[res]} m ({q_cell}, {r_cell})"
+        for res, q_cell, r_cell in zip(resolution.tolist(), q.tolist(), r.tolist())
+    ]
+
+
+def build_cell_geometry(cells: np.ndarray, names: Iterable[str]) -> dict:
+    """Build the GeoJSON of cells, in the format of simplify_geometry.
+
+    Hexagons only have 6 corners, so there is no need to simplify them.
+
+    Args:
+        cells (np.ndarray): Ids of the cells.
+        names (Iterable[str]): Id of the feature of each cell.
+
+    Returns:
+        dict: GeoJSON feature collection of the cells.
+    """
+    corners = get_corners(cells)
+    lon, lat = unproject(corners[..., 0], corners[..., 1])
+    rings = np.round(np.stack([lon, lat], axis=-1), 5)
+    # Close the rings
+    rings = np.concatenate([rings, rings[:, :1]], axis=1)
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "id": name,
+                "properties": {},
+                "geometry": {"type": "Polygon", "coordinates": [ring]},
+            }
+            for name, ring in zip(names, rings.tolist())
+        ],
+    }
+
+
+def get_area_weights(
+    geometry: "gpd.GeoSeries", resolution: int = len(HEX_SIZES) - 1
+) -> pd.DataFrame:
+    """Get the share of the area of each IRIS in each cell.
+
+    Args:
+        geometry (gpd.GeoSeries): Polygons of all IRIS, indexed by IRIS.
+        resolution (int, optional): Resolution of the cells (position in
+            HEX_SIZES). Defaults to the finest one.
+
+    Returns:
+        pd.DataFrame: IRIS ("iris"), cell ("cell") and share of the area of
+            the IRIS in the cell ("weight"), for each IRIS and cell that
+            overlap. The weights of each IRIS sum to 1.
+    """
+    import shapely
+
+    if geometry.crs is not None:
+        geometry = geometry.to_crs("EPSG:4326")
+    polygons = shapely.transform(
+        geometry.values.data,
+        lambda coords: np.column_stack(project(coords[:, 0], coords[:, 1])),
+    )
+
+    # Cells covering the bounds of the IRIS
+    size = HEX_SIZES[resolution]
+    x_min, y_min, x_max, y_max = shapely.total_bounds(polygons)
+    _, q_bounds, r_bounds = decode_cells(
+        get_cells(
+            np.array([x_min, x_max, x_min, x_max]),
+            np.array([y_min, y_min, y_max, y_max]),
+            resolution,
+        )
+    )
+    q, r = np.meshgrid(
+        np.arange(q_bounds.min() - 1, q_bounds.max() + 2),
+        np.arange(r_bounds.min() - 1, r_bounds.max() + 2),
+    )
+    cells = encode_cells(resolution, q.ravel(), r.ravel())
+    x, y = get_centers(cells)
+    inside = (
+        (x > x_min - size)
+        & (x < x_max + size)
+        & (y > y_min - size)
+        & (y < y_max + size)
+    )
+    cells = cells[inside]
+    hexagons = shapely.polygons(get_corners(cells))
+
+    # Intersect each IRIS with the cells it overlaps
+    iris_rows, cell_rows = shapely.STRtree(hexagons).query(
+        polygons, predicate="intersects"
+    )
+    areas = shapely.area(shapely.intersection(polygons[iris_rows], hexagons[cell_rows]))
+    weights = pd.DataFrame(
+        {
+            "iris": geometry.index[iris_rows],
+            "cell": cells[cell_rows],
+            "weight": areas / shapely.area(polygons)[iris_rows],
+        }
+    )
+    return weights.loc[areas > 0].reset_index(drop=True)
+
+
+def redistribute(values: pd.Series, weights: pd.DataFrame) -> pd.Series:
+    """Spread values of the IRIS (e.g. their population) over the cells.
+
+    Args:
+        values (pd.Series): Values of each IRIS.
+        weights (pd.DataFrame): Share of the area of each IRIS in each cell,
+            as returned by get_area_weights.
+
+    Returns:
+        pd.Series: Values of each cell, in proportion of the area of each IRIS
+            in the cell.
+    """
+    spread = values.reindex(weights["iris"]).to_numpy(dtype=float) * weights["weight"]
+    return spread.groupby(weights["cell"].to_numpy()).sum().rename_axis("cell")
+
+
+def roll_up_grid(grid: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Aggregate the grid table at each resolution.
+
+    The metrics of the cells are summed into their parent cells (see
+    get_parents), from the finest resolution to the coarsest, as
+    Hierarchy.roll_up does for the IRIS.
+
+    Args:
+        grid (pd.DataFrame): Grid table, indexed by cell at the finest
+            resolution, as built by merge_cells.
+
+    Returns:
+        Dict[str, pd.DataFrame]: Table of each level of HEX_LEVELS, indexed by
+            the name of its cells, with a column of the same name as the
+            level, and the id of each cell ("cell").
+    """
+    df = grid.copy()
+    # Aggregate nb of parking spots into a single series, as in the serving table
+    df["nb_parking_spots"] += df.pop("nb_parking_spots_idfm")
+    cells = df.index.to_numpy(dtype=np.int64)
+    values = df[ROLL_UP_COLUMNS].to_numpy(dtype=float)
+
+    tables = {}
+    for resolution, level in zip(reversed(range(len(HEX_SIZES))), HEX_LEVELS):
+        if level != HEX_LEVELS[0]:
+            membership = Membership(get_parents(cells, resolution))
+            values = membership.aggregate(values)
+            cells = membership.areas
+        names = pd.Index(get_cell_names(cells), name=level)
+        table = pd.DataFrame(values, index=names, columns=ROLL_UP_COLUMNS)
+        table.insert(0, level, names)
+        table.insert(1, "cell", cells)
+        tables[level] = derive_columns(table, ROLL_UP_COLUMNS)
+    return tables
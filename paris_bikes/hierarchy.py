@@ -0,0 +1,159 @@
+import math
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from paris_bikes.districts import QUARTIERS, get_arrondissement
+from paris_bikes.serving import DEMAND_OPTIONS, SUPPLY_OPTIONS, derive_columns
+
+# Levels of the map, from the finest to the coarsest
+LEVELS = ["iris", "quartier", "arrondissement"]
+
+# Options of the RadioItems used to select the level of the map
+LEVEL_OPTIONS = [
+    {"label": "IRIS", "value": "iris"},
+    {"label": "Quartiers", "value": "quartier"},
+    {"label": "Arrondissements", "value": "arrondissement"},
+]
+
+# Metrics summed from one level to the next (the other columns are derived
+# from them at each level)
+ROLL_UP_COLUMNS = [option["value"] for option in SUPPLY_OPTIONS + DEMAND_OPTIONS]
+
+# Size of the map (width and height, in pixels) the zoom of an area is
+# computed for, and margin around the area (as a share of its size)
+MAP_SIZE = (700, 450)
+ZOOM_MARGIN = 1.2
+
+
+class Membership:
+    """Membership of the areas of a level in the areas of the next level.
+
+    Each area belongs to exactly one area of the next level, so the sparse
+    membership matrix (areas x areas of the next level) has a single 1 per
+    row. It is stored as the areas sorted by the area they belong to, and the
+    start of each area of the next level: the product of the membership
+    matrix with a matrix of metrics is then one np.add.reduceat.
+
+    Args:
+        codes (Iterable[int]): Code of the area of the next level each area
+            belongs to.
+    """
+
+    def __init__(self, codes: Iterable[int]):
+        # Codes of the areas of the next level, and of the area of each area
+        self.areas, codes = np.unique(np.asarray(codes), return_inverse=True)
+        self.order = np.argsort(codes, kind="stable")
+        self.starts = np.searchsorted(codes[self.order], np.arange(len(self.areas)))
+
+    def aggregate(self, values: np.ndarray) -> np.ndarray:
+        """Sum values over the areas of the next level.
+
+        Args:
+            values (np.ndarray): Values of each area (rows), for one or more
+                metrics (columns).
+
+        Returns:
+            np.ndarray: Sum of the values of each area of the next level.
+        """
+        return np.add.reduceat(values[self.order], self.starts, axis=0)
+
+
+def get_area_names(level: str, codes: Iterable[int]) -> List[str]:
+    """Name areas from their official number.
+
+    Args:
+        level (str): Level of the areas ("quartier" or "arrondissement").
+        codes (Iterable[int]): Official numbers of the areas.
+
+    Returns:
+        List[str]: Names of the areas, e.g. "Amérique" or "19e arrondissement".
+    """
+    if level == "quartier":
+        return [QUARTIERS[code - 1] for code in codes]
+    return [f"{code}{'er' if code == 1 else 'e'} arrondissement" for code in codes]
+
+
+class Hierarchy:
+    """Aggregation of the IRIS into quartiers, and of quartiers into arrondissements.
+
+    The memberships are computed once, and the metrics are then rolled up
+    level by level with sums (see Membership). The normalized metrics and the
+    indices are derived again from the sums at each level, as for the IRIS.
+
+    Args:
+        df (pd.DataFrame): Serving table, indexed by IRIS, with the "quartier"
+            of each IRIS.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        quartier = Membership(df["quartier"].to_numpy(dtype=int))
+        arrondissement = Membership(get_arrondissement(quartier.areas))
+        self.memberships = {"quartier": quartier, "arrondissement": arrondissement}
+
+    def roll_up(self, df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """Aggregate the serving table at each level.
+
+        Args:
+            df (pd.DataFrame): Serving table, indexed by IRIS (in the order the
+                hierarchy was built with).
+
+        Returns:
+            Dict[str, pd.DataFrame]: Table of each level of LEVELS, indexed by
+                the name of its areas and with a column of the same name as
+                the level. The table of the IRIS is df itself.
+        """
+        tables = {"iris": df}
+        values = df[ROLL_UP_COLUMNS].to_numpy(dtype=float)
+        for level in LEVELS[1:]:
+            membership = self.memberships[level]
+            values = membership.aggregate(values)
+            names = pd.Index(get_area_names(level, membership.areas), name=level)
+            table = pd.DataFrame(values, index=names, columns=ROLL_UP_COLUMNS)
+            table.insert(0, level, names)
+            tables[level] = derive_columns(table, ROLL_UP_COLUMNS)
+        return tables
+
+
+def get_area_views(
+    geometry: dict, map_size: Tuple[int, int] = MAP_SIZE
+) -> Dict[str, dict]:
+    """Get the map view (center and zoom) that shows each area.
+
+    Args:
+        geometry (dict): GeoJSON feature collection of the areas (e.g. from
+            simplify_geometry).
+        map_size (Tuple[int, int], optional): Width and height of the map, in
+            pixels. Defaults to MAP_SIZE.
+
+    Returns:
+        Dict[str, dict]: Center ("center", with "lat" and "lon") and zoom
+            ("zoom") of each area, by id of its feature.
+    """
+    width, height = map_size
+    views = {}
+    for feature in geometry["features"]:
+        polygons = feature["geometry"]["coordinates"]
+        if feature["geometry"]["type"] == "Polygon":
+            polygons = [polygons]
+        coords = np.concatenate([ring for rings in polygons for ring in rings])
+        lon_min, lat_min = coords.min(axis=0)
+        lon_max, lat_max = coords.max(axis=0)
+        lat = (lat_min + lat_max) / 2
+        # At zoom z, the map shows 360 degrees of longitude in 512 * 2^z
+        # pixels, and a degree of latitude is 1 / cos(latitude) times longer
+        zoom = min(
+            math.log2(360 * width / (512 * ZOOM_MARGIN * (lon_max - lon_min))),
+            math.log2(
+                360
+                * height
+                * math.cos(math.radians(lat))
+                / (512 * ZOOM_MARGIN * (lat_max - lat_min))
+            ),
+        )
+        views[feature["id"]] = {
+            "center": {"lat": lat, "lon": (lon_min + lon_max) / 2},
+            "zoom": zoom,
+        }
+    return views
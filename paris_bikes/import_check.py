@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, NamedTuple
+
+# Module imported by the serving process
+SERVING_MODULE = "paris_bikes.dash_application"
+
+# Modules that the serving process must not import in fast-boot mode
+HEAVY_MODULES = (
+    "fiona",
+    "geopandas",
+    "geopy",
+    "pyproj",
+    "shapely",
+    "plotly.express",
+    "paris_bikes.geometry",
+    "paris_bikes.mapping",
+    "paris_bikes.pipelines",
+    "paris_bikes.preprocess_data",
+)
+
+# Maximum time (in seconds) to import the serving process, incl. loading the
+# serving snapshot
+IMPORT_TIME_BUDGET = float(os.environ.get("PARIS_BIKES_IMPORT_TIME_BUDGET", 3.0))
+
+# Script run in a fresh interpreter, printing the import time, the heavy
+# modules imported, and the float columns of the serving table of the module
+# ("df") that are not memory-mapped from the snapshot
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+from paris_bikes.serving import is_memory_mapped
+df = getattr(sys.modules[{module!r}], "df", None)
+copied = [] if df is None else [
+    col for col, dtype in df.dtypes.items()
+    if dtype == "float64" and not is_memory_mapped(df[col].to_numpy())
+]
+print(json.dumps({{"seconds": seconds, "heavy_modules": heavy, "copied_columns": copied}}))
+"""
+
+
+class ImportReport(NamedTuple):
+    """Result of importing a module in a fresh interpreter.
+
+    Attributes:
+        seconds (float): Time to import the module.
+        heavy_modules (List[str]): Heavy modules that were imported.
+        copied_columns (List[str]): Float columns of the serving table that
+            were copied to the memory of the process, instead of being
+            memory-mapped from the snapshot.
+        slowest_modules (Dict[str, float]): Cumulative import time (in
+            seconds) of the slowest modules imported.
+    """
+
+    seconds: float
+    heavy_modules: List[str]
+    copied_columns: List[str]
+    slowest_modules: Dict[str, float]
+
+
+def measure_import(
+    module: str = SERVING_MODULE, repeat: int = 3, n_slowest: int = 10
+) -> ImportReport:
+    """Measure the cold-start import time of a module in fast-boot mode.
+
+    The module is imported in a fresh interpreter, several times, and the
+    fastest run is kept to smooth out the noise of the machine.
+
+    Args:
+        module (str, optional): Module to import. Defaults to SERVING_MODULE.
+        repeat (int, optional): Number of runs. Defaults to 3.
+        n_slowest (int, optional): Number of slowest modules to report.
+            Defaults to 10.
+
+    Raises:
+        RuntimeError: If the module cannot be imported.
+
+    Returns:
+        ImportReport: Import time and modules of the fastest run.
+    """
+    env = {**os.environ, "PARIS_BIKES_FAST_BOOT": "1"}
+    script = IMPORT_SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+    report = None
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script],
+            capture_output=True,
+            text=True,
+            env=env,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+        run = json.loads(result.stdout.strip().splitlines()[-1])
+        if report is None or run["seconds"] < report.seconds:
+            # Lines of -X importtime are "import time: self | cumulative | name",
+            # in microseconds
+            cumulative = {}
+            for line in result.stderr.splitlines():
+                match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)", line)
+                if match:
+                    cumulative[match.group(2)] = int(match.group(1)) / 1e6
+            slowest = sorted(cumulative.items(), key=lambda x: x[1], reverse=True)
+            report = ImportReport(
+                run["seconds"],
+                run["heavy_modules"],
+                run["copied_columns"],
+                dict(slowest[:n_slowest]),
+            )
+    return report
+
+
+def check_import(
+    module: str = SERVING_MODULE, budget: float = IMPORT_TIME_BUDGET
+) -> bool:
+    """Check that the serving process imports fast and without heavy modules,
+    and that its serving table is memory-mapped from the snapshot.
+
+    Args:
+        module (str, optional): Module to import. Defaults to SERVING_MODULE.
+        budget (float, optional): Maximum import time, in seconds. Defaults to
+            IMPORT_TIME_BUDGET.
+
+    Returns:
+        bool: Whether the check passed. A report is printed either way.
+    """
+    report = measure_import(module)
+    print(f"Importing {module} took {report.seconds:.2f} s (budget {budget:.2f} s).")
+    print("Slowest imports:")
+    for name, seconds in report.slowest_modules.items():
+        print(f"  {seconds:6.3f} s  {name}")
+
+    passed = True
+    if report.heavy_modules:
+        print(f"Heavy modules imported: {', '.join(report.heavy_modules)}.")
+        passed = False
+    if report.copied_columns:
+        print(
+            "Columns of the serving table copied from the snapshot: "
+            f"{', '.join(report.copied_columns)}."
+        )
+        passed = False
+    if report.seconds > budget:
+        print("Import time is over budget.")
+        passed = False
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check the import time of the serving process in fast-boot mode."
+    )
+    parser.add_argument("--module", default=SERVING_MODULE, help="Module to import.")
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=IMPORT_TIME_BUDGET,
+        help="Maximum import time, in seconds.",
+    )
+    args = parser.parse_args()
+    sys.exit(0 if check_import(args.module, args.budget) else 1)
@@ -0,0 +1,204 @@
+from typing import List, Mapping, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from paris_bikes.storage import read_dataset
+from paris_bikes.utils import get_data_root
+
+# Variables aggregated to create the parking index
+INDEX_VARS = [
+    "nb_pop",
+    "visitors",
+    "nb_metro_rer_passengers",
+    "nb_train_passengers",
+    "shops_weighted",
+    "school_capacity",
+]
+
+# Named weightings of the index variables (variables not listed weigh 0)
+WEIGHT_PROFILES = {
+    "equal": {var: 1.0 for var in INDEX_VARS},
+    "residents": {"nb_pop": 1.0, "school_capacity": 1.0},
+    "transit": {"nb_metro_rer_passengers": 1.0, "nb_train_passengers": 1.0},
+    "commerce": {"visitors": 1.0, "shops_weighted": 1.0},
+}
+
+# A weighting: name of a profile, weights by variable, or one weight per variable
+Weights = Union[str, Mapping[str, float], Sequence[float], np.ndarray]
+
+
+def min_max_scale(values: np.ndarray) -> np.ndarray:
+    """Scale each column between 0 (its minimum) and 1 (its maximum).
+
+    Missing values stay missing, and constant columns are missing.
+
+    Args:
+        values (np.ndarray): Values, one variable per column.
+
+    Returns:
+        np.ndarray: Scaled values.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.shape[0] == 0:
+        return values
+    with np.errstate(invalid="ignore", divide="ignore"):
+        minimum = np.nanmin(values, axis=0)
+        scale = np.nanmax(values, axis=0) - minimum
+        return (values - minimum) / np.where(scale == 0, np.nan, scale)
+
+
+class DemandIndex:
+    """Parking demand index of each IRIS, for any weighting of the variables.
+
+    The variables are scaled between 0 and 1 once, and the index of a
+    weighting is the weighted sum of the scaled variables (missing values
+    count as 0). Many weightings are computed with a single matrix product.
+
+    Args:
+        feature_dataset (pd.DataFrame): Feature table, indexed by IRIS or with
+            an "iris" column.
+        index_vars (List[str], optional): Variables aggregated to create the
+            index. Defaults to INDEX_VARS.
+    """
+
+    def __init__(
+        self, feature_dataset: pd.DataFrame, index_vars: List[str] = INDEX_VARS
+    ):
+        if "iris" in feature_dataset.columns:
+            feature_dataset = feature_dataset.set_index("iris")
+        self.iris = feature_dataset.index
+        self.index_vars = list(index_vars)
+        # Scaled variables, one row per IRIS and one column per variable
+        self.matrix = np.nan_to_num(
+            min_max_scale(feature_dataset[self.index_vars].to_numpy(dtype=float))
+        )
+        # Scaled parking supply
+        self.supply = min_max_scale(
+            feature_dataset[["nb_parking_spots"]].to_numpy(dtype=float)
+        )[:, 0]
+
+    def get_weights(self, weights: Weights = "equal") -> np.ndarray:
+        """Get the weight vector of a weighting.
+
+        Args:
+            weights (Weights, optional): Name of a profile of WEIGHT_PROFILES,
+                weights by variable (variables not listed weigh 0), or one
+                weight per variable of index_vars. Defaults to "equal".
+
+        Raises:
+            ValueError: If the profile or a variable is unknown, or if the
+                number of weights does not match the number of variables.
+
+        Returns:
+            np.ndarray: One weight per variable of index_vars.
+        """
+        if isinstance(weights, str):
+            if weights not in WEIGHT_PROFILES:
+                raise ValueError(f"Weight profile {weights} is not recognized.")
+            weights = WEIGHT_PROFILES[weights]
+        if isinstance(weights, Mapping):
+            unknown = set(weights) - set(self.index_vars)
+            if unknown:
+                raise ValueError(
+                    f"Variables {sorted(unknown)} are not index variables."
+                )
+            return np.array([weights.get(var, 0.0) for var in self.index_vars])
+
+        weights = np.asarray(weights, dtype=float)
+        if weights.shape != (len(self.index_vars),):
+            raise ValueError(
+                f"Expected {len(self.index_vars)} weights, got shape {weights.shape}."
+            )
+        return weights
+
+    def get_weight_matrix(self, profiles: Mapping[str, Weights]) -> np.ndarray:
+        """Stack the weight vectors of several weightings.
+
+        Args:
+            profiles (Mapping[str, Weights]): Weightings, by name.
+
+        Returns:
+            np.ndarray: One row per variable and one column per weighting.
+        """
+        return np.column_stack([self.get_weights(w) for w in profiles.values()])
+
+    def compute(self, weights: Weights = "equal") -> pd.Series:
+        """Compute the index of a weighting.
+
+        Args:
+            weights (Weights, optional): Weighting, see get_weights. Defaults
+                to "equal".
+
+        Returns:
+            pd.Series: Index of each IRIS.
+        """
+        return pd.Series(
+            self.matrix @ self.get_weights(weights),
+            index=self.iris,
+            name="parking_index",
+        )
+
+    def compute_many(
+        self, profiles: Union[Sequence[str], Mapping[str, Weights]] = WEIGHT_PROFILES
+    ) -> pd.DataFrame:
+        """Compute the indices of several weightings at once.
+
+        Args:
+            profiles (Union[Sequence[str], Mapping[str, Weights]], optional):
+                Names of profiles of WEIGHT_PROFILES, or weightings by name.
+                Defaults to all the profiles of WEIGHT_PROFILES.
+
+        Returns:
+            pd.DataFrame: Index of each IRIS (rows) for each weighting
+                (columns).
+        """
+        if not isinstance(profiles, Mapping):
+            profiles = {name: name for name in profiles}
+        return pd.DataFrame(
+            self.matrix @ self.get_weight_matrix(profiles),
+            index=self.iris,
+            columns=list(profiles),
+        )
+
+
+def create_parking_index(
+    feature_dataset="",
+    index_vars=INDEX_VARS,
+    weights: Weights = "equal",
+) -> pd.DataFrame:
+    """Create parking index and add it to the feature table
+
+    The dataset is not saved, the caller is responsible for it.
+
+    Args:
+        feature_dataset: pd.DataFrame, optional:
+            Feature Dataframe. If not a DataFrame, the feature table is read
+            from the data root
+        index_vars: List[str], optional:
+            name of Variables that should be aggregated to create the parking index
+        weights: Weights, optional:
+            weighting of the variables, see DemandIndex.get_weights
+
+    Returns:
+        pd.DataFrame: Feature table, indexed by IRIS, with the parking index
+            ("parking_index") and the normalized parking supply
+            ("parking_normalized").
+
+    """
+    #  Load feature dataset if not passed as argument
+    if isinstance(feature_dataset, pd.DataFrame):
+        pass
+    else:
+        feature_dataset_filepath = get_data_root() / "feature/feature.parquet"
+        feature_dataset = read_dataset(feature_dataset_filepath).reset_index()
+
+    if "iris" in feature_dataset.columns:
+        feature_dataset = feature_dataset.set_index("iris")
+    demand_index = DemandIndex(feature_dataset, index_vars)
+
+    # add parking index and normalized parking supply to the feature table
+    return feature_dataset.assign(
+        parking_index=demand_index.compute(weights).to_numpy(),
+        parking_normalized=demand_index.supply,
+    )
@@ -0,0 +1,175 @@
+import hashlib
+import inspect
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Set, Tuple
+
+from paris_bikes.utils import get_data_root
+
+# Location of the manifest of the pipelines
+MANIFEST_FILEPATH = get_data_root() / "cache" / "manifest.json"
+
+
+class Node(NamedTuple):
+    """Output of the pipelines, with everything it is built from.
+
+    Attributes:
+        name (str): Name of the node.
+        output (Path): File built by the node.
+        inputs (Tuple[Path, ...], optional): Files read by the node, that are
+            not built by another node. Defaults to ().
+        upstream (Tuple[str, ...], optional): Names of the nodes whose output
+            is used by the node. Defaults to ().
+        params (Dict[str, Any], optional): Parameters changing the output
+            (JSON serializable). Defaults to {}.
+        code (Tuple[Any, ...], optional): Modules or functions whose source
+            code changes the output. Defaults to ().
+    """
+
+    name: str
+    output: Path
+    inputs: Tuple[Path, ...] = ()
+    upstream: Tuple[str, ...] = ()
+    params: Dict[str, Any] = {}
+    code: Tuple[Any, ...] = ()
+
+
+def get_code_version(code: Iterable[Any]) -> str:
+    """Hash the source code of modules or functions.
+
+    Args:
+        code (Iterable[Any]): Modules or functions.
+
+    Returns:
+        str: Hash of their source code.
+    """
+    sha1 = hashlib.sha1()
+    for obj in code:
+        sha1.update(inspect.getsource(obj).encode())
+    return sha1.hexdigest()
+
+
+class Manifest:
+    """Hashes of the inputs, parameters and code used to build each output.
+
+    An output is stale if any of them changed since it was built. Hashes of
+    files are only recomputed when their size or modification time changed.
+
+    Args:
+        filepath (Path, optional): Location of the manifest. Defaults to
+            MANIFEST_FILEPATH.
+    """
+
+    def __init__(self, filepath: Path = MANIFEST_FILEPATH):
+        self.filepath = Path(filepath)
+        self.root = get_data_root()
+        if self.filepath.exists():
+            content = json.loads(self.filepath.read_text())
+        else:
+            content = {}
+        self.files = content.get("files", {})
+        self.outputs = content.get("outputs", {})
+
+    def _key(self, filepath: Path) -> str:
+        """Get the key of a file, relative to the data root if possible."""
+        filepath = Path(filepath).resolve()
+        try:
+            return filepath.relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            return filepath.as_posix()
+
+    def hash_file(self, filepath: Path) -> str:
+        """Hash the content of a file.
+
+        Args:
+            filepath (Path): Location of the file.
+
+        Returns:
+            str: Hash of the file, or "" if it does not exist.
+        """
+        filepath = Path(filepath)
+        if not filepath.exists():
+            return ""
+
+        key = self._key(filepath)
+        stat = filepath.stat()
+        cached = self.files.get(key)
+        if (
+            cached is not None
+            and cached["size"] == stat.st_size
+            and cached["mtime_ns"] == stat.st_mtime_ns
+        ):
+            return cached["sha1"]
+
+        sha1 = hashlib.sha1()
+        with open(filepath, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha1.update(block)
+        self.files[key] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha1": sha1.hexdigest(),
+        }
+        return sha1.hexdigest()
+
+    def get_signature(self, node: Node, nodes: Dict[str, Node]) -> Dict[str, Any]:
+        """Get the current signature of a node.
+
+        Args:
+            node (Node): Node.
+            nodes (Dict[str, Node]): All nodes, by name.
+
+        Returns:
+            Dict[str, Any]: Hashes of the inputs, parameters and code of the
+                node.
+        """
+        inputs = [*node.inputs, *(nodes[name].output for name in node.upstream)]
+        return {
+            "inputs": {
+                self._key(filepath): self.hash_file(filepath) for filepath in inputs
+            },
+            "params": json.loads(json.dumps(node.params, sort_keys=True, default=str)),
+            "code": get_code_version(node.code),
+        }
+
+    def get_stale(self, nodes: Dict[str, Node]) -> Set[str]:
+        """Find the nodes to rebuild.
+
+        A node is stale if its output is missing, if its signature changed
+        since it was built, or if one of its upstream nodes is stale.
+
+        Args:
+            nodes (Dict[str, Node]): All nodes, by name, upstream nodes first.
+
+        Returns:
+            Set[str]: Names of the stale nodes.
+        """
+        stale = set()
+        for name, node in nodes.items():
+            if (
+                any(upstream in stale for upstream in node.upstream)
+                or not node.output.exists()
+                or self.outputs.get(self._key(node.output))
+                != self.get_signature(node, nodes)
+            ):
+                stale.add(name)
+        return stale
+
+    def record(self, names: List[str], nodes: Dict[str, Node]):
+        """Record the signature of rebuilt nodes, and save the manifest.
+
+        Args:
+            names (List[str]): Names of the rebuilt nodes.
+            nodes (Dict[str, Node]): All nodes, by name.
+        """
+        for name in names:
+            node = nodes[name]
+            self.outputs[self._key(node.output)] = self.get_signature(node, nodes)
+        self.save()
+
+    def save(self):
+        """Save the manifest."""
+        self.filepath.parent.mkdir(parents=True, exist_ok=True)
+        self.filepath.write_text(
+            json.dumps({"files": self.files, "outputs": self.outputs}, indent=2)
+        )
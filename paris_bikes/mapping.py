@@ -10,6 +10,8 @@ def create_map(
     height=400,
     tooltip_no_normalized=True,
     colorscale="OrRd",
+    geojson=None,
+    location_col="iris",
 ):
     """Compute number of bike parking spots per IRIS.
 
@@ -20,25 +22,34 @@ def create_map(
         height (int): Figure height
         tooltip_no_normalized (bool): If True and var is normalized, show the
             non-normalized version of var on the tooltip
+        colorscale (str): Name of the color scale
+        geojson (dict, optional): Simplified geometry, as returned by
+            simplify_geometry. If None, the full precision geometry of df is
+            used.
+        location_col (str): Column with the id of each area in the geometry
 
     Returns:
         plotly map
     """
     if ("_normalized" in var) and tooltip_no_normalized:
         hover_data = {
-            "iris": False,
+            location_col: False,
             "nb_parking_spots": True,
             var: True,
             var.replace("_normalized", ""): True,
         }
     else:
-        hover_data = {"iris": False, "nb_parking_spots": True, var: True}
+        hover_data = {location_col: False, "nb_parking_spots": True, var: True}
+
+    # Use the simplified geometry, if available
+    if geojson is None:
+        geojson = df.geometry
 
     # Create basemap
     fig = px.choropleth_mapbox(
         df,
-        geojson=df.geometry,
-        locations="iris",
+        geojson=geojson,
+        locations=location_col,
         # projection="mercator",
         color=var,
         width=width,
@@ -48,7 +59,7 @@ def create_map(
         center={"lat": 48.86, "lon": 2.34},
         zoom=11,
         mapbox_style="carto-positron",
-        hover_name="iris",
+        hover_name=location_col,
         hover_data=hover_data,
     )
 
@@ -1,123 +1,438 @@
-from functools import reduce
+import argparse
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial, reduce
 from pathlib import Path
-from typing import Dict, Union
+from typing import Any, Callable, Dict, List, Optional, Type, Union
 
 import geopandas as gpd
 import pandas as pd
 
-from paris_bikes.preprocess_data import *
+import paris_bikes.aggregation
+import paris_bikes.districts
+import paris_bikes.geocoding
+import paris_bikes.geometry
+import paris_bikes.hexgrid
+import paris_bikes.hierarchy
+import paris_bikes.index
+import paris_bikes.mapping
+import paris_bikes.preprocess_data
+import paris_bikes.readers
+import paris_bikes.serving
+import paris_bikes.spatial
+import paris_bikes.stations
+from paris_bikes.aggregation import (
+    LayerSpec,
+    aggregate_per_cell,
+    aggregate_per_iris,
+    get_population_per_cell,
+    merge_cells,
+    prepare_layers,
+)
+from paris_bikes.index import create_parking_index
+from paris_bikes.manifest import Manifest, Node
+from paris_bikes.preprocess_data import (
+    clean_museum_data,
+    get_layers,
+    get_population_per_iris,
+)
+from paris_bikes.readers import PARIS_BBOX, read_layer_source
+from paris_bikes.serving import (
+    ServingSnapshot,
+    build_snapshot,
+    read_snapshot,
+    write_snapshot,
+)
+from paris_bikes.spatial import IRIS_CODE_COLUMN
+from paris_bikes.stations import StationResolver
+from paris_bikes.storage import export_geojson, read_dataset, write_dataset
 from paris_bikes.utils import get_data_root
 
+# Number of parallel jobs of the pipelines (defaults to the number of CPUs)
+PIPELINE_JOBS = int(os.environ.get("PARIS_BIKES_JOBS", os.cpu_count() or 1))
 
-def primary_pipeline() -> Dict[str, Union[pd.DataFrame, gpd.GeoDataFrame]]:
-    """Generate and save the primary datasets from the raw datasets.
+# Datasets whose locations may be geocoded
+GEOCODED_LAYERS = ("metro", "train")
+
+# Code changing the datasets aggregated per IRIS
+LAYER_CODE = (
+    paris_bikes.aggregation,
+    paris_bikes.geocoding,
+    paris_bikes.preprocess_data,
+    paris_bikes.readers,
+    paris_bikes.spatial,
+    paris_bikes.stations,
+)
+
+# Code changing the datasets aggregated per cell of the hexagonal grid
+CELL_CODE = LAYER_CODE + (paris_bikes.hexgrid,)
+
+# Code changing the serving snapshot
+SNAPSHOT_CODE = (
+    paris_bikes.districts,
+    paris_bikes.geometry,
+    paris_bikes.hexgrid,
+    paris_bikes.hierarchy,
+    paris_bikes.index,
+    paris_bikes.mapping,
+    paris_bikes.serving,
+)
+
+
+def run_tasks(
+    tasks: Dict[str, Callable[[], Any]],
+    jobs: int = PIPELINE_JOBS,
+    executor: Type[Executor] = ThreadPoolExecutor,
+) -> Dict[str, Any]:
+    """Run independent tasks in parallel.
+
+    Args:
+        tasks (Dict[str, Callable[[], Any]]): Functions without arguments, by
+            name. They must be picklable (e.g. functools.partial of module
+            level functions) to run in a process pool.
+        jobs (int, optional): Maximum number of tasks running at the same
+            time. If 1, tasks run one after the other in the current process.
+            Defaults to PIPELINE_JOBS.
+        executor (Type[Executor], optional): Pool running the tasks, threads
+            for I/O bound tasks or processes for CPU bound tasks. Defaults to
+            ThreadPoolExecutor.
 
     Returns:
-        Dict[str, Union[pd.DataFrame, gpd.GeoDataFrame]]: Dictionary with
-            primary datasets.
+        Dict[str, Any]: Result of each task, by name.
+    """
+    if jobs <= 1 or len(tasks) <= 1:
+        return {name: task() for name, task in tasks.items()}
+
+    with executor(max_workers=min(jobs, len(tasks))) as pool:
+        futures = {name: pool.submit(task) for name, task in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def aggregate_layers(
+    names: List[str],
+    cell_names: List[str],
+    sources: Dict[str, pd.DataFrame],
+    df_iris: gpd.GeoDataFrame,
+    resolver: Optional[StationResolver] = None,
+) -> Dict[str, pd.DataFrame]:
+    """Aggregate some of the datasets per IRIS and per cell of the grid.
+
+    The rows of each dataset are only prepared (and its stations located)
+    once, even if it is aggregated both per IRIS and per cell.
+
+    Args:
+        names (List[str]): Names of the datasets to aggregate per IRIS, in
+            get_layers.
+        cell_names (List[str]): Names of the datasets to aggregate per cell,
+            in get_layers.
+        sources (Dict[str, pd.DataFrame]): Source datasets of these datasets,
+            by name.
+        df_iris (gpd.GeoDataFrame): Location of all IRIS within the city.
+        resolver (StationResolver, optional): Resolver used to locate the
+            metro and train stations. If None, stations are geocoded.
+
+    Returns:
+        Dict[str, pd.DataFrame]: Aggregated datasets, by name of their node
+            (e.g. "shops" per IRIS and "shops_cells" per cell).
+    """
+    layers = get_layers(resolver)
+    prepared = prepare_layers(
+        [layers[name] for name in dict.fromkeys([*names, *cell_names])], sources
+    )
+    aggregated = aggregate_per_iris(
+        [layers[name] for name in names], sources, df_iris, prepared
+    )
+    cells = aggregate_per_cell([layers[name] for name in cell_names], sources, prepared)
+    aggregated.update({f"{name}_cells": df for name, df in cells.items()})
+    return aggregated
+
+
+def get_raw_filepaths() -> Dict[str, Path]:
+    """Get the location of the raw data.
+
+    Returns:
+        Dict[str, Path]: Location of each raw file, by source name.
     """
-    # Define location of the raw data
     raw_root_filepath = get_data_root() / "raw"
-    raw_census_filepath = raw_root_filepath / "RECENSEMENT_IRIS_POPULATION.geojson"
-    raw_parking_filepath = (
-        raw_root_filepath / "stationnement-voie-publique-emplacements.geojson"
+    return {
+        "census": raw_root_filepath / "RECENSEMENT_IRIS_POPULATION.geojson",
+        "parking": raw_root_filepath
+        / "stationnement-voie-publique-emplacements.geojson",
+        "parking_idfm": raw_root_filepath / "parking-velos-ile-de-france-mobilites.csv",
+        "museum": raw_root_filepath / "frequentation-des-musees-de-france.csv",
+        "train": raw_root_filepath / "frequentation-gares.csv",
+        "metro": raw_root_filepath
+        / "trafic-annuel-entrant-par-station-du-reseau-ferre-2021.csv",
+        "shops": raw_root_filepath / "BDCOM_2020.geojson",
+        "schools": raw_root_filepath
+        / "EQUIPEMENT_PONCTUEL_ENSEIGNEMENT_EDUCATION.geojson",
+        "stops": raw_root_filepath / "stops.txt",
+    }
+
+
+def get_pipeline_nodes(
+    layers: Optional[Dict[str, LayerSpec]] = None
+) -> Dict[str, Node]:
+    """Get the dependency graph of the pipelines.
+
+    Args:
+        layers (Dict[str, LayerSpec], optional): Declaration of the datasets
+            aggregated per IRIS. Defaults to get_layers().
+
+    Returns:
+        Dict[str, Node]: Nodes of the primary datasets (per IRIS and per cell
+            of the grid), of the feature table, of the grid table and of the
+            serving snapshot, upstream nodes first.
+    """
+    if layers is None:
+        layers = get_layers()
+    raw_filepaths = get_raw_filepaths()
+    primary_root_filepath = get_data_root() / "primary"
+    feature_root_filepath = get_data_root() / "feature"
+
+    # Stations are located from a GTFS feed if available, or else from the IDFM
+    # parking data
+    if raw_filepaths["stops"].exists():
+        station_filepaths = (raw_filepaths["stops"],)
+    else:
+        station_filepaths = (raw_filepaths["parking_idfm"],)
+
+    nodes = {
+        "iris": Node(
+            "iris",
+            primary_root_filepath / "iris.parquet",
+            inputs=(raw_filepaths["census"],),
+            code=(get_population_per_iris,),
+        )
+    }
+    for name, layer in layers.items():
+        inputs = (raw_filepaths[layer.source],)
+        if name in GEOCODED_LAYERS:
+            inputs += station_filepaths
+        nodes[name] = Node(
+            name,
+            primary_root_filepath / f"{name}.parquet",
+            inputs=inputs,
+            upstream=("iris",),
+            params={"bbox": PARIS_BBOX},
+            code=LAYER_CODE,
+        )
+    # Each dataset is also aggregated per cell of the hexagonal grid, from its
+    # own source only, so that a changed source only rebuilds its cells
+    nodes["population_cells"] = Node(
+        "population_cells",
+        primary_root_filepath / "population_cells.parquet",
+        upstream=("iris",),
+        code=(get_population_per_cell, paris_bikes.hexgrid),
     )
-    raw_parking_idfm_filepath = (
-        raw_root_filepath / "parking-velos-ile-de-france-mobilites.csv"
+    for name in layers:
+        nodes[f"{name}_cells"] = nodes[name]._replace(
+            name=f"{name}_cells",
+            output=primary_root_filepath / f"{name}_cells.parquet",
+            upstream=(),
+            code=CELL_CODE,
+        )
+    nodes["feature"] = Node(
+        "feature",
+        feature_root_filepath / "feature.parquet",
+        upstream=("iris", *layers),
+        code=(feature_pipeline,),
     )
-    raw_museum_filepath = raw_root_filepath / "frequentation-des-musees-de-france.csv"
-    raw_train_filepath = raw_root_filepath / "frequentation-gares.csv"
-    raw_metro_filepath = (
-        raw_root_filepath / "trafic-annuel-entrant-par-station-du-reseau-ferre-2021.csv"
+    nodes["grid"] = Node(
+        "grid",
+        feature_root_filepath / "grid.parquet",
+        upstream=("population_cells", *(f"{name}_cells" for name in layers)),
+        code=(grid_pipeline, merge_cells),
     )
-    raw_shops_filepath = raw_root_filepath / "BDCOM_2020.geojson"
-    raw_schools_filepath = (
-        raw_root_filepath / "EQUIPEMENT_PONCTUEL_ENSEIGNEMENT_EDUCATION.geojson"
+    nodes["snapshot"] = Node(
+        "snapshot",
+        feature_root_filepath / "serving.snapshot",
+        upstream=("feature", "grid"),
+        code=SNAPSHOT_CODE,
     )
+    return nodes
 
-    # Read the raw data
-    print("Reading raw data.")
-    df_raw_census = gpd.read_file(raw_census_filepath)
-    df_raw_parking = gpd.read_file(raw_parking_filepath)
-    df_raw_parking_idfm = pd.read_csv(raw_parking_idfm_filepath, delimiter=";")
-    df_raw_museum = pd.read_csv(raw_museum_filepath, delimiter=";")
-    df_raw_train = pd.read_csv(raw_train_filepath, delimiter=";")
-    df_raw_metro = pd.read_csv(raw_metro_filepath, delimiter=";")
-    df_raw_shops = gpd.read_file(raw_shops_filepath)
-    df_raw_schools = gpd.read_file(raw_schools_filepath)
 
-    # Transform raw data into primary data
-    print("Transforming raw data into primary data.")
-    df_iris = get_population_per_iris(df_raw_census)
-    df_parking = get_parkings_per_iris(df_raw_parking, df_iris)
-    df_parking_idfm = get_idfm_parkings_per_iris(df_raw_parking_idfm, df_iris)
-    df_museum_clean = clean_museum_data(df_raw_museum)
-    df_museum = get_museum_visitors_per_iris(df_museum_clean, df_iris)
-    df_metro = get_metro_rer_passengers_per_iris(df_raw_metro, df_iris)
-    df_train = get_train_passengers_per_iris(df_raw_train, df_iris)
-    df_shops = get_shops_per_iris(df_raw_shops, df_iris)
-    df_schools = get_school_capacity_per_iris(df_raw_schools, df_iris)
-
-    # Save primary data
-    print("Saving primary data.")
-    primary_root_filepath = get_data_root() / "primary"
-    primary_datasets = {
-        "iris": df_iris,
-        "parking": df_parking,
-        "parking_idfm": df_parking_idfm,
-        "museum": df_museum,
-        "metro": df_metro,
-        "train": df_train,
-        "shops": df_shops,
-        "schools": df_schools,
+def primary_pipeline(
+    jobs: int = PIPELINE_JOBS, force: bool = False
+) -> Dict[str, Union[pd.DataFrame, gpd.GeoDataFrame]]:
+    """Generate and save the primary datasets from the raw datasets.
+
+    Only the stale datasets (see Manifest) are rebuilt, the others are read
+    from their saved file. Raw files are read in a thread pool, then the
+    datasets are aggregated per IRIS in a process pool. The datasets
+    aggregated per cell of the hexagonal grid (merged by grid_pipeline) are
+    also rebuilt here if they are stale, in the same process as the dataset
+    per IRIS of the same source.
+
+    Args:
+        jobs (int, optional): Number of parallel jobs. If 1, everything runs
+            in the current process. Defaults to PIPELINE_JOBS.
+        force (bool, optional): Rebuild all datasets. Defaults to False.
+
+    Returns:
+        Dict[str, Union[pd.DataFrame, gpd.GeoDataFrame]]: Dictionary with
+            primary datasets.
+    """
+    layers = get_layers()
+    nodes = get_pipeline_nodes(layers)
+    manifest = Manifest()
+    stale = set(nodes) if force else manifest.get_stale(nodes)
+    stale_layers = [name for name in layers if name in stale]
+    stale_cells = [name for name in layers if f"{name}_cells" in stale]
+    rebuild_iris = "iris" in stale
+    rebuild_population_cells = "population_cells" in stale
+
+    # Read the raw data needed by the stale datasets concurrently (reading
+    # files and GDAL release the GIL). The large files are streamed, keeping
+    # only the rows and columns used by their layer (the filters do not depend
+    # on the station resolver). Museums are geocoded while reading, before any
+    # other geocoding starts.
+    raw_filepaths = get_raw_filepaths()
+    raw_readers = {
+        "census": partial(gpd.read_file, raw_filepaths["census"]),
+        "parking": partial(
+            read_layer_source, raw_filepaths["parking"], layers["parking"]
+        ),
+        "parking_idfm": partial(
+            pd.read_csv, raw_filepaths["parking_idfm"], delimiter=";"
+        ),
+        "museum": lambda: clean_museum_data(
+            pd.read_csv(raw_filepaths["museum"], delimiter=";")
+        ),
+        "train": partial(pd.read_csv, raw_filepaths["train"], delimiter=";"),
+        "metro": partial(pd.read_csv, raw_filepaths["metro"], delimiter=";"),
+        "shops": partial(read_layer_source, raw_filepaths["shops"], layers["shops"]),
+        "schools": partial(
+            read_layer_source, raw_filepaths["schools"], layers["schools"]
+        ),
     }
-    for df_name, df in primary_datasets.items():
-        if isinstance(df, gpd.GeoDataFrame):
-            df.to_file(primary_root_filepath / f"{df_name}.geojson", driver="GeoJSON")
-        elif isinstance(df, pd.DataFrame):
-            df.to_csv(primary_root_filepath / f"{df_name}.csv")
+    resolve_stations = any(
+        name in GEOCODED_LAYERS for name in [*stale_layers, *stale_cells]
+    )
+    needed_sources = {layers[name].source for name in [*stale_layers, *stale_cells]}
+    if rebuild_iris:
+        needed_sources.add("census")
+    if resolve_stations and not raw_filepaths["stops"].exists():
+        needed_sources.add("parking_idfm")
+    if needed_sources:
+        print("Reading raw data.")
+    raw_datasets = run_tasks(
+        {name: raw_readers[name] for name in raw_readers if name in needed_sources},
+        jobs,
+    )
+
+    # Locate stations from a GTFS feed if available, or else from the IDFM
+    # parking data
+    station_resolver = None
+    if resolve_stations:
+        if raw_filepaths["stops"].exists():
+            station_resolver = StationResolver.from_gtfs_stops(raw_filepaths["stops"])
         else:
-            raise ValueError(
-                f"Datatype {type(df)} of {df_name} dataset is not recognized."
+            station_resolver = StationResolver.from_idfm_parking(
+                raw_datasets["parking_idfm"]
             )
 
-    print("Don't forget to push your changes to dvc with `dvc push`.")
+    # Transform raw data into primary data
+    primary_datasets = {}
+    if rebuild_iris or rebuild_population_cells or stale_layers or stale_cells:
+        print("Transforming raw data into primary data.")
+    if rebuild_iris:
+        primary_datasets["iris"] = get_population_per_iris(raw_datasets["census"])
+    else:
+        primary_datasets["iris"] = read_dataset(nodes["iris"].output)
+    if rebuild_population_cells:
+        primary_datasets["population_cells"] = get_population_per_cell(
+            primary_datasets["iris"]
+        )
+    # Aggregate the stale datasets per IRIS and per cell in parallel, each
+    # process only getting the sources it needs. Stations may be geocoded, so
+    # metro and train stations are aggregated in the same process to respect
+    # the rate limit of the geocoder.
+    stale_names = [name for name in layers if name in stale_layers + stale_cells]
+    layer_groups = [[name] for name in stale_names if name not in GEOCODED_LAYERS]
+    geocoded_layers = [name for name in stale_names if name in GEOCODED_LAYERS]
+    if geocoded_layers:
+        layer_groups.append(geocoded_layers)
+    df_aggregated = run_tasks(
+        {
+            names[0]: partial(
+                aggregate_layers,
+                [name for name in names if name in stale_layers],
+                [name for name in names if name in stale_cells],
+                {
+                    layers[name].source: raw_datasets[layers[name].source]
+                    for name in names
+                },
+                primary_datasets["iris"],
+                station_resolver,
+            )
+            for names in layer_groups
+        },
+        jobs,
+        ProcessPoolExecutor,
+    )
+    for df_group in df_aggregated.values():
+        primary_datasets.update(df_group)
 
-    return primary_datasets
+    # Save the rebuilt primary data
+    rebuilt = [
+        name
+        for name in ["iris", *layers, "population_cells"]
+        + [f"{name}_cells" for name in layers]
+        if name in stale
+    ]
+    if rebuilt:
+        print("Saving primary data.")
+    for df_name in rebuilt:
+        write_dataset(primary_datasets[df_name], nodes[df_name].output)
+    manifest.record(rebuilt, nodes)
+
+    if rebuilt:
+        print("Don't forget to push your changes to dvc with `dvc push`.")
+    else:
+        print("Primary data is up to date.")
+
+    # Read the other primary data, keeping the order of the layers
+    return {
+        name: primary_datasets[name]
+        if name in primary_datasets
+        else read_dataset(nodes[name].output)
+        for name in ["iris", *layers]
+    }
 
 
 def feature_pipeline(
-    primary_datasets: Dict[str, Union[pd.DataFrame, gpd.GeoDataFrame]] = {}
+    primary_datasets: Dict[str, Union[pd.DataFrame, gpd.GeoDataFrame]] = {},
+    force: bool = False,
 ) -> gpd.GeoDataFrame:
     """Create and save the feature table from the primary datasets.
 
     The feature table is a merge between all the primary datasets, and it
-    includes the geometry of each IRIS.
+    includes the geometry of each IRIS. It is only rebuilt if it is stale (see
+    Manifest), otherwise it is read from its saved file.
 
     Args:
         primary_datasets
         (Dict[str, Union[pd.DataFrame, gpd.GeoDataFrame]], optional):
             Dictionary of primary datasets.
             It is the output of primary_pipeline. Defaults to {}.
+        force (bool, optional): Rebuild the feature table. Defaults to False.
 
     Returns:
         gpd.GeoDataFrame: Feature table.
     """
+    nodes = get_pipeline_nodes()
+    manifest = Manifest()
+    if not force and "feature" not in manifest.get_stale(nodes):
+        print("Feature table is up to date.")
+        return read_dataset(nodes["feature"].output)
+
     # Load primary datasets if not passed as argument
     if primary_datasets == {}:
-        primary_root_filepath = get_data_root() / "primary"
         primary_datasets = [
-            gpd.read_file(primary_root_filepath / "iris.geojson"),
-            pd.read_csv(primary_root_filepath / "parking.csv"),
-            pd.read_csv(primary_root_filepath / "parking_idfm.csv"),
-            pd.read_csv(primary_root_filepath / "museums.csv"),
-            pd.read_csv(primary_root_filepath / "metro_rer.csv"),
-            pd.read_csv(primary_root_filepath / "trains.csv"),
-            pd.read_csv(primary_root_filepath / "shops.csv"),
-            pd.read_csv(primary_root_filepath / "schools.csv"),
+            read_dataset(nodes[name].output) for name in nodes["feature"].upstream
         ]
-        for idx, _ in enumerate(primary_datasets):
-            primary_datasets[idx] = primary_datasets[idx].set_index("iris")
     else:
         primary_datasets = primary_datasets.values()
 
@@ -125,66 +440,99 @@ def feature_pipeline(
         lambda x, y: x.merge(y, how="outer", left_index=True, right_index=True),
         primary_datasets,
     )
+    # The IRIS code is only used to join the datasets to the IRIS
+    df_feature = df_feature.drop(columns=IRIS_CODE_COLUMN, errors="ignore")
 
-    feature_root_filepath = get_data_root() / "feature"
-    df_feature.to_file(feature_root_filepath / "feature.geojson", driver="GeoJSON")
+    write_dataset(df_feature, nodes["feature"].output)
+    # Also export the feature table to GeoJSON, to use it outside the pipelines
+    export_geojson(df_feature, nodes["feature"].output.with_suffix(".geojson"))
+    manifest.record(["feature"], nodes)
 
     return df_feature
 
 
-def create_parking_index(
-    feature_dataset="",
-    index_vars=[
-        "nb_pop",
-        "visitors",
-        "nb_metro_rer_passengers",
-        "nb_train_passengers",
-        "shops_weighted",
-        "school_capacity",
-    ],
-) -> gpd.GeoDataFrame:
+def grid_pipeline(force: bool = False) -> pd.DataFrame:
+    """Create and save the grid table from the datasets aggregated per cell.
 
-    """Create parking index and save the dataset incl. the index
+    The grid table is a merge of the population and of all the datasets
+    aggregated per cell of the hexagonal grid by primary_pipeline. It is only
+    rebuilt if it is stale (see Manifest), otherwise it is read from its saved
+    file.
 
     Args:
-        feature_dataset: gpd.GeoDataFrame:
-            Feature Dataframe
-        index_vars: List[str], optional:
-            name of Variables that should be aggregated to create the parking index
+        force (bool, optional): Rebuild the grid table. Defaults to False.
 
     Returns:
-        gpd.GeoDataFrame: Feature table incl. index.
-
+        pd.DataFrame: Grid table.
     """
-    #  Load feature dataset if not passed as argument
-    if isinstance(feature_dataset, gpd.GeoDataFrame):
-        pass
-    else:
-        feature_dataset_filepath = get_data_root() / "feature/feature.geojson"
-        feature_dataset = gpd.read_file(feature_dataset_filepath)
+    layers = get_layers()
+    nodes = get_pipeline_nodes(layers)
+    manifest = Manifest()
+    if not force and "grid" not in manifest.get_stale(nodes):
+        print("Grid table is up to date.")
+        return read_dataset(nodes["grid"].output)
 
-    feature_dataset = feature_dataset.set_index("iris")
-    df_aggr = feature_dataset[index_vars].copy()
+    df_population, *cell_datasets = [
+        read_dataset(nodes[name].output) for name in nodes["grid"].upstream
+    ]
+    df_grid = merge_cells(df_population, cell_datasets, layers.values())
 
-    # normalize each variable
-    for var in df_aggr.columns:
-        df_aggr[var] = (df_aggr[var] - df_aggr[var].min()) / (
-            df_aggr[var].max() - df_aggr[var].min()
-        )
+    write_dataset(df_grid, nodes["grid"].output)
+    manifest.record(["grid"], nodes)
+
+    return df_grid
 
-    # aggregate normalized variables to parking index
-    df_aggr["parking_index"] = df_aggr.sum(axis=1)
 
-    # add parking index to original geodataframe
-    df_parking_index = feature_dataset.join(df_aggr[["parking_index"]])
+def snapshot_pipeline(force: bool = False) -> ServingSnapshot:
+    """Create and save the serving snapshot of the dash application.
 
-    # normalize parking supply
-    df_parking_index["parking_normalized"] = (
-        df_parking_index["nb_parking_spots"]
-        - df_parking_index["nb_parking_spots"].min()
-    ) / (
-        df_parking_index["nb_parking_spots"].max()
-        - df_parking_index["nb_parking_spots"].min()
+    The snapshot is only rebuilt if it is stale (see Manifest), otherwise it is
+    read from its saved file.
+
+    Args:
+        force (bool, optional): Rebuild the snapshot. Defaults to False.
+
+    Returns:
+        ServingSnapshot: Serving snapshot.
+    """
+    nodes = get_pipeline_nodes()
+    manifest = Manifest()
+    if not force and "snapshot" not in manifest.get_stale(nodes):
+        print("Serving snapshot is up to date.")
+        return read_snapshot(nodes["snapshot"].output)
+
+    snapshot = build_snapshot(nodes["feature"].output, nodes["grid"].output)
+    write_snapshot(snapshot, nodes["snapshot"].output)
+    manifest.record(["snapshot"], nodes)
+
+    return snapshot
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the primary, feature, grid and snapshot pipelines."
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=PIPELINE_JOBS,
+        help="Number of parallel jobs (defaults to the number of CPUs).",
     )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild all datasets, even if they are up to date.",
+    )
+    args = parser.parse_args()
 
-    return df_parking_index
+    # Only run the pipelines if something changed
+    manifest = Manifest()
+    if args.force or manifest.get_stale(get_pipeline_nodes()):
+        feature_pipeline(primary_pipeline(jobs=args.jobs, force=args.force), args.force)
+        grid_pipeline(args.force)
+        snapshot_pipeline(args.force)
+    else:
+        # Keep the hashes of files whose modification time changed
+        manifest.save()
+        print("Everything is up to date.")
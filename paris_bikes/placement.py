@@ -0,0 +1,134 @@
+import heapq
+import math
+from typing import NamedTuple, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from paris_bikes.scenario import Scenario
+
+# Number of parking spots allocated at once (e.g. the size of a rack)
+PLACEMENT_STEP = 1
+
+
+class Placement(NamedTuple):
+    """New parking spots allocated to the IRIS.
+
+    Attributes:
+        spots (pd.DataFrame): Parking spots added to each IRIS that gets some
+            ("added_spots"), with the resulting number of parking spots,
+            supply index and demand/supply index. Sorted by added spots.
+        scenario (Scenario): Scenario with the new parking spots.
+        coverage_gain (float): Increase of the demand coverage (see
+            get_coverage).
+    """
+
+    spots: pd.DataFrame
+    scenario: Scenario
+    coverage_gain: float
+
+
+def get_coverage(demand: np.ndarray, spots: np.ndarray) -> float:
+    """Get the demand coverage of parking spots.
+
+    Each IRIS contributes its demand index times log(1 + its number of
+    parking spots): spots count more where demand is high, and less where
+    there are already many spots.
+
+    Args:
+        demand (np.ndarray): Demand index of each IRIS.
+        spots (np.ndarray): Number of parking spots of each IRIS.
+
+    Returns:
+        float: Demand coverage.
+    """
+    return float(np.nansum(demand * np.log1p(spots)))
+
+
+def place_parking(
+    scenario: Scenario,
+    budget: float,
+    capacity: Optional[Union[float, pd.Series]] = None,
+    step: float = PLACEMENT_STEP,
+) -> Placement:
+    """Allocate new parking spots to the IRIS to maximize the demand coverage.
+
+    Spots are allocated greedily, step by step, to the IRIS where they
+    increase the coverage the most. The gains of the IRIS are kept in a
+    priority heap, and only the gain of the IRIS that got the spots is
+    updated. As the coverage of each IRIS is concave in its number of spots,
+    this allocation is optimal (for allocations by steps). The budget and the
+    capacities are rounded down to a multiple of the step, so that only whole
+    steps are allocated.
+
+    Args:
+        scenario (Scenario): Situation to add the spots to (e.g. the current
+            one, from ScenarioBase.create_scenario).
+        budget (float): Number of parking spots to allocate.
+        capacity (Union[float, pd.Series], optional): Maximum number of
+            parking spots added to each IRIS, for all of them or by IRIS (IRIS
+            not listed have no limit). Defaults to None (no limit).
+        step (float, optional): Number of parking spots allocated at once.
+            Defaults to PLACEMENT_STEP.
+
+    Raises:
+        ValueError: If the budget is negative or the step is not positive.
+
+    Returns:
+        Placement: Allocated parking spots.
+    """
+    if budget < 0 or step <= 0:
+        raise ValueError(f"Invalid budget {budget} or step {step}.")
+
+    base = scenario.base
+    demand = np.nan_to_num(base.demand)
+    spots = scenario.get_spots()
+    demand_list, spots_list = demand.tolist(), spots.tolist()
+    if capacity is None:
+        capacity = np.full(len(spots), np.inf)
+    elif isinstance(capacity, pd.Series):
+        capacity = capacity.reindex(base.iris).fillna(np.inf).to_numpy(dtype=float)
+    else:
+        capacity = np.full(len(spots), float(capacity))
+    # Only allocate whole steps
+    capacity = np.floor(capacity / step) * step
+
+    def get_gain(row: int, added: float) -> float:
+        """Gain of coverage of the next step of an IRIS"""
+        current = spots_list[row] + added
+        return demand_list[row] * (math.log1p(current + step) - math.log1p(current))
+
+    # Heap of the (negated) gain of the next step of each IRIS
+    heap = [
+        (-get_gain(row, 0.0), row)
+        for row in np.flatnonzero((demand > 0) & (capacity > 0)).tolist()
+    ]
+    heapq.heapify(heap)
+
+    added = [0.0] * len(spots)
+    capacity = capacity.tolist()
+    # Number of steps left to allocate
+    remaining = math.floor(budget / step)
+    while remaining > 0 and heap:
+        _, row = heapq.heappop(heap)
+        added[row] += step
+        remaining -= 1
+        if added[row] < capacity[row]:
+            heapq.heappush(heap, (-get_gain(row, added[row]), row))
+    added = np.array(added)
+
+    rows = np.flatnonzero(added)
+    placed = scenario.fork()
+    placed.change_rows(rows, added[rows])
+
+    df = pd.DataFrame(
+        {
+            "added_spots": added[rows],
+            "nb_parking_spots": placed.get_spots(rows),
+            "supply_index": placed.get_supply_index(rows),
+            "demand_supply_index": placed.get_demand_supply_index(rows),
+        },
+        index=base.iris[rows],
+    ).sort_values("added_spots", ascending=False)
+    coverage_gain = get_coverage(demand, spots + added) - get_coverage(demand, spots)
+    return Placement(df, placed, coverage_gain)
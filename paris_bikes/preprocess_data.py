@@ -1,41 +1,39 @@
+from typing import Dict, Union
+
 import geopandas as gpd
 import pandas as pd
-from geopy.geocoders import Nominatim
+
+from paris_bikes.aggregation import LayerSpec, aggregate_per_iris
+from paris_bikes.geocoding import (
+    GEOCODING_OFFLINE,
+    GeocodingCache,
+    GeocodingResult,
+    batch_geocode,
+    get_default_backend,
+)
+from paris_bikes.spatial import IRIS_CODE_COLUMN, IrisLocator
+from paris_bikes.stations import locate_stations
 
 
 def get_parkings_per_iris(
-    df_parking_raw: gpd.GeoDataFrame, df_iris: gpd.GeoDataFrame
+    df_parking_raw: gpd.GeoDataFrame, df_iris: Union[gpd.GeoDataFrame, IrisLocator]
 ) -> pd.DataFrame:
     """Compute number of bike parking spots per IRIS.
 
     Args:
         df_parking_raw (gpd.GeoDataFrame): Raw data with location of all
             parking spots within the city.
-        df_iris (gpd.GeoDataFrame): Raw data with location of all IRIS within
-            the city.
+        df_iris (Union[gpd.GeoDataFrame, IrisLocator]): Raw data with location
+            of all IRIS within the city, or an IrisLocator built from it.
 
     Returns:
         pd.DataFrame: Number of bike parking spots per IRIS.
     """
-    # Include only bike parking spots
-    df_bike_parking = (
-        df_parking_raw.loc[df_parking_raw.regpar.isin(["Vélos", "Box à vélos"])]
-        .copy()
-        .rename(columns={"plarel": "nb_parking_spots"})
-    )
+    return aggregate_layer("parking", df_parking_raw, df_iris)
 
-    # Identify the IRIS of each parking spot
-    df_parks_with_iris = df_bike_parking.sjoin(
-        df_iris.loc[:, ["nb_pop", "geometry"]], how="inner"
-    )
-
-    # Get the total parking spots per IRIS
-    df_parks_per_iris = df_parks_with_iris.groupby("index_right")[
-        "nb_parking_spots"
-    ].sum()
-    df_parks_per_iris.index.rename("iris", inplace=True)
 
-    return pd.DataFrame(df_parks_per_iris)
+# Column of the raw census data with the INSEE code of each IRIS
+CENSUS_IRIS_CODE_COLUMN = "c_ir"
 
 
 def get_population_per_iris(df_iris_raw: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
@@ -46,15 +44,18 @@ def get_population_per_iris(df_iris_raw: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
             within the city, as well as the population.
 
     Returns:
-        gpd.GeoDataFrame: Population per IRIS.
+        gpd.GeoDataFrame: Population per IRIS, with the INSEE code of each
+            IRIS (IRIS_CODE_COLUMN) if the raw data has it.
     """
-    # Include only IRIS inside the city of Paris
+    # Include only IRIS inside the city of Paris, and keep their code to join
+    # datasets that already have it
+    columns = ["l_ir", "nb_pop", "geometry"]
+    if CENSUS_IRIS_CODE_COLUMN in df_iris_raw.columns:
+        columns.append(CENSUS_IRIS_CODE_COLUMN)
     df_iris = (
-        df_iris_raw.loc[
-            df_iris_raw.l_epci == "T1 Paris", ["l_ir", "nb_pop", "geometry"]
-        ]
+        df_iris_raw.loc[df_iris_raw.l_epci == "T1 Paris", columns]
         .copy()
-        .rename(columns={"l_ir": "iris"})
+        .rename(columns={"l_ir": "iris", CENSUS_IRIS_CODE_COLUMN: IRIS_CODE_COLUMN})
         .set_index("iris")
     )
 
@@ -68,99 +69,37 @@ def get_population_per_iris(df_iris_raw: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
 
 
 def get_school_capacity_per_iris(
-    df_schools_raw: gpd.GeoDataFrame, df_iris: gpd.GeoDataFrame
+    df_schools_raw: gpd.GeoDataFrame, df_iris: Union[gpd.GeoDataFrame, IrisLocator]
 ) -> pd.DataFrame:
     """Compute school capacity per IRIS.
 
     Args:
         df_schools_raw (gpd.GeoDataFrame): Raw data with location and capacity
             of Paris schools.
-        df_iris (gpd.GeoDataFrame): Raw data with location of all IRIS within
-            the city.
+        df_iris (Union[gpd.GeoDataFrame, IrisLocator]): Raw data with location
+            of all IRIS within the city, or an IrisLocator built from it.
 
     Returns:
         pd.DataFrame: School capacity per IRIS.
     """
-    # Select relevant variables and rename them
-    df_schools = df_schools_raw[
-        ["c_cainsee", "l_ep_min", "c_niv2", "c_niv3", "lib_qn2", "val_qn2", "geometry"]
-    ]
-    df_schools = df_schools.rename(
-        columns={
-            "c_cainsee": "insee_code",
-            "l_ep_min": "school_name",
-            "c_niv2": "school_type",
-            "c_niv3": "school_subtype",
-            "val_qn2": "school_capacity",
-        }
-    )
-
-    # Filter only IRIS in Paris
-    df_schools = df_schools[df_schools["insee_code"].between(75000, 75999)]
-
-    # Filter only primary and secondary education institutions (other
-    # institutions have no info on capacity)
-    df_schools = df_schools[
-        (df_schools["school_type"] == 101) | (df_schools["school_type"] == 102)
-    ]
-
-    # Impute missing values of school capacity with mean capacity of similar
-    # type
-    df_schools["school_capacity"] = df_schools["school_capacity"].fillna(
-        df_schools.groupby("school_subtype")["school_capacity"].transform("mean")
-    )
-
-    # Identify the IRIS of each school
-    df_schools = df_schools.sjoin(df_iris.loc[:, ["geometry"]], how="inner")
-
-    # Get the total school capacity per IRIS
-    df_schools = df_schools.groupby("index_right")[["school_capacity"]].sum()
-    df_schools.index.rename("iris", inplace=True)
-
-    # Convert school_capacity to integer
-    df_schools.loc[:, "school_capacity"] = (
-        df_schools.loc[:, "school_capacity"].round(0).astype("int")
-    )
-
-    return df_schools
+    return aggregate_layer("schools", df_schools_raw, df_iris)
 
 
 def get_shops_per_iris(
-    df_shopping_raw: gpd.GeoDataFrame, df_iris: gpd.GeoDataFrame
+    df_shopping_raw: gpd.GeoDataFrame, df_iris: Union[gpd.GeoDataFrame, IrisLocator]
 ) -> pd.DataFrame:
     """Compute number of businesses per IRIS (weighed by shop size).
 
     Args:
         df_shopping_raw (gpd.GeoDataFrame): Raw data with location, size and
-        type of Paris shops.
+            type of Paris shops.
+        df_iris (Union[gpd.GeoDataFrame, IrisLocator]): Raw data with location
+            of all IRIS within the city, or an IrisLocator built from it.
 
     Returns:
-        pd.DataFrame: School capacity per IRIS.
+        pd.DataFrame: Number of businesses per IRIS (weighed by shop size).
     """
-
-    # Select relevant variables
-    df_shopping = df_shopping_raw.loc[
-        :, ("IRIS", "LIBELLE_REGROUPEMENT_8_POSTES", "SURFACE", "geometry")
-    ]
-
-    # Map quantifiable values to different surfaces
-    surface_dict = {"moins de 300 m²": 1, "de 300 à 1.000 m²": 2, "1.000 m² ou plus": 3}
-    df_shopping["surface_code"] = df_shopping["SURFACE"].map(surface_dict)
-
-    # Filter out vacant shops
-    df_shopping = df_shopping[
-        df_shopping["LIBELLE_REGROUPEMENT_8_POSTES"] != "Local vacant"
-    ]
-
-    # Identify the IRIS of each shop
-    df_shopping = df_shopping.sjoin(df_iris.loc[:, ["geometry"]], how="inner")
-
-    # Group by IRIS (weighted by shop size categories)
-    df_shopping = df_shopping.groupby("index_right")[["surface_code"]].sum()
-    df_shopping.index.rename("iris", inplace=True)
-    df_shopping.rename(columns={"surface_code": "shops_weighted"}, inplace=True)
-
-    return df_shopping
+    return aggregate_layer("shops", df_shopping_raw, df_iris)
 
 
 def strip(sep, name):
@@ -182,52 +121,87 @@ def strip(sep, name):
         return None
 
 
-def my_geocoder(row, column, geolocator):
-    """Return geocode for a string.
+def geocode_from_location_name(
+    df_in: pd.DataFrame,
+    location_name_column,
+    offline=GEOCODING_OFFLINE,
+    backend=None,
+):
+    """Geocode locations based on a column with names of the locations.
+
+    Locations are cached in a persistent geocoding cache, so that they are
+    only requested once.
 
     Args:
-        row (row of pd.DataFrame): Row of dataframe.
-        column (string): Label of the column that contains the string to
-            geocode.
-        geolocator (Nominatim): Tool to geocode OpenStreetMap data.
+        df_in (pd.DataFrame): Dataframe with location names to be geocoded
+        location_name_column (string): Name of column with the location names
+            to be geocoded
+        offline (bool, optional): If True, geocode only from the cache.
+            Defaults to the PARIS_BIKES_GEOCODING_OFFLINE environment variable.
+        backend (GeocodingBackend, optional): Service used to geocode the
+            locations. Defaults to Nominatim, or to the fixture file set in the
+            PARIS_BIKES_GEOCODING_FIXTURE environment variable.
 
     Returns:
-        geopy.location.Location.point: Geolocation point for the input string.
+        gpd.GeoDataFrame: Dataframe with geocoded locations (locations that
+            could not be geocoded have no geometry)
     """
-    try:
-        location = geolocator.geocode(row[column])
-        row["longitude"] = location.longitude
-        row["latitude"] = location.latitude
-        return row
-    except:
-        return None
+    if backend is None and not offline:
+        backend = get_default_backend()
+    cache = GeocodingCache()
+    results = batch_geocode(df_in[location_name_column], backend, cache)
+    cache.close()
+
+    # Report the rows that could not be geocoded
+    row_results = df_in[location_name_column].map(
+        lambda name: results.get(name, GeocodingResult(None, "failed", "no name"))
+    )
+    failed = row_results.map(lambda result: result.location is None)
+    print(f"{(1 - failed.mean()) * 100}% of rows were geocoded!")
+    for name, result in zip(
+        df_in.loc[failed, location_name_column], row_results[failed]
+    ):
+        print(f"Could not geocode {name!r}: {result.status} {result.error or ''}")
+
+    # transform to GeoDataFrame
+    geometry = gpd.points_from_xy(
+        row_results.map(lambda result: (result.location or (None, None))[0]),
+        row_results.map(lambda result: (result.location or (None, None))[1]),
+    )
+    geometry[failed.to_numpy()] = None
+    gdf = gpd.GeoDataFrame(df_in, geometry=geometry, crs="EPSG:4326")
 
+    return gdf
 
-def geocode_from_location_name(df_in: pd.DataFrame, location_name_column):
-    """Geocode locations based on a column with names of the locations.
+
+def locate_station_names(
+    df_in: pd.DataFrame, station_column, location_name_column, resolver=None
+):
+    """Locate stations from their names, without network calls if possible.
+
+    Stations are first resolved with the local station resolver, and only the
+    ones it could not resolve are geocoded.
 
     Args:
-        df_in (pd.DataFrame): Dataframe with location names to be geocoded
+        df_in (pd.DataFrame): Dataframe with station names to be located
+        station_column (string): Name of column with the station names
         location_name_column (string): Name of column with the location names
             to be geocoded
+        resolver (StationResolver, optional): Resolver of station names. If
+            None, all stations are geocoded.
 
     Returns:
-        gpd.GeoDataFrame: Dataframe with geocoded locations
+        gpd.GeoDataFrame: Dataframe with located stations
     """
-    geolocator = Nominatim(user_agent="correlaid-paris-bikes")
-    df = df_in.apply(lambda x: my_geocoder(x, location_name_column, geolocator), axis=1)
+    if resolver is None:
+        return geocode_from_location_name(df_in, location_name_column)
 
-    print(
-        "{}% of rows were geocoded!".format(
-            (1 - sum(pd.isnull(df["longitude"])) / len(df)) * 100
-        )
-    )
-
-    # transform to GeoDataFrame and drop longitude and latitude columns
-    gdf = gpd.GeoDataFrame(
-        df, geometry=gpd.points_from_xy(df.longitude, df.latitude), crs="EPSG:4326"
-    )
-    gdf = gdf.drop(["longitude", "latitude"], axis=1)
+    gdf = locate_stations(df_in, station_column, resolver)
+    unresolved = gdf.geometry.isna()
+    if unresolved.any():
+        gdf.loc[unresolved, "geometry"] = geocode_from_location_name(
+            df_in.loc[unresolved], location_name_column
+        ).geometry
 
     return gdf
 
@@ -306,169 +280,274 @@ def clean_museum_data(df_museum_raw):
 
 
 def get_museum_visitors_per_iris(
-    df_museums_clean: gpd.GeoDataFrame, df_iris: gpd.GeoDataFrame
+    df_museums_clean: gpd.GeoDataFrame, df_iris: Union[gpd.GeoDataFrame, IrisLocator]
 ) -> pd.DataFrame:
     """Compute yearly museum visitors per IRIS.
     Args:
         df_museums_clean (gpd.GeoDataFrame): Cleaned data with location and
             number of visitors in national museums per year.
-        df_iris (gpd.GeoDataFrame): Raw data with location of all IRIS within
-            the city.
+        df_iris (Union[gpd.GeoDataFrame, IrisLocator]): Raw data with location
+            of all IRIS within the city, or an IrisLocator built from it.
     Returns:
         pd.DataFrame: Number of yearly museum visitors per IRIS.
     """
-    # Identify the IRIS of each museum
-    df_museums = df_museums_clean.sjoin(df_iris.loc[:, ["geometry"]], how="inner")
-
-    # Get the total number of yearly visitors per IRIS
-    df_museums = df_museums.groupby("index_right")[["visitors"]].sum()
-    df_museums.index.rename("iris", inplace=True)
-
-    return df_museums
+    return aggregate_layer("museum", df_museums_clean, df_iris)
 
 
 def get_metro_rer_passengers_per_iris(
-    df_metro_raw: pd.DataFrame, df_iris: gpd.GeoDataFrame
+    df_metro_raw: pd.DataFrame,
+    df_iris: Union[gpd.GeoDataFrame, IrisLocator],
+    resolver=None,
 ) -> pd.DataFrame:
     """Compute number of metro and RER passengers per IRIS.
 
     Args:
         df_metro_raw (pd.DataFrame): Raw data with number of metro passengers
             per station
-        df_iris (gpd.GeoDataFrame): Raw data with location of all IRIS within
-            the city.
+        df_iris (Union[gpd.GeoDataFrame, IrisLocator]): Raw data with location
+            of all IRIS within the city, or an IrisLocator built from it.
+        resolver (StationResolver, optional): Resolver used to locate the
+            stations. If None, stations are geocoded.
 
     Returns:
         pd.DataFrame: Number of metro passengers per IRIS.
     """
-    # Clean metro data
-    # Include only stations in Paris
-    # Include only relevant columns
-    df_metro = (
-        df_metro_raw.loc[df_metro_raw["Ville"].isin(["Paris"]), ["Station", "Trafic"]]
-        .rename(columns={"Station": "station", "Trafic": "nb_metro_rer_passengers"})
-        .copy()
-    )
-
-    df_metro["station"] = df_metro["station"].str.lower()
-    df_metro["station"] = df_metro["station"].str.replace(
-        "bibliotheque", "bibliotheque francois mitterand"
-    )
-
-    # Add string ", station" to every station name, to avoid confusions with
-    # stations names that are too general
-    # E.g. "Hotel de Ville" (city hall) exists in every city
-    df_metro["station_city"] = df_metro["station"] + ", paris"
-
-    # Geocode station names
-    df_metro = geocode_from_location_name(df_metro, "station_city").drop(
-        columns="station_city"
-    )
-
-    # Identify the IRIS of each station
-    df_metro = df_metro.sjoin(df_iris.loc[:, ["geometry"]], how="inner")
-
-    # Get the total number of metro passengers per IRIS
-    df_metro = df_metro.groupby("index_right")[["nb_metro_rer_passengers"]].sum()
-    df_metro.index.rename("iris", inplace=True)
-
-    return df_metro
+    return aggregate_layer("metro", df_metro_raw, df_iris, resolver)
 
 
 def get_train_passengers_per_iris(
-    df_train_raw: pd.DataFrame, df_iris: gpd.GeoDataFrame
+    df_train_raw: pd.DataFrame,
+    df_iris: Union[gpd.GeoDataFrame, IrisLocator],
+    resolver=None,
 ) -> pd.DataFrame:
     """Compute number of train passengers per IRIS.
 
     Args:
         df_train_raw (pd.DataFrame): Raw data with number of train passengers
             per station
-        df_iris (gpd.GeoDataFrame): Raw data with location of all IRIS within
-            the city.
+        df_iris (Union[gpd.GeoDataFrame, IrisLocator]): Raw data with location
+            of all IRIS within the city, or an IrisLocator built from it.
+        resolver (StationResolver, optional): Resolver used to locate the
+            stations. If None, stations are geocoded.
 
     Returns:
         pd.DataFrame: Number of train passengers per IRIS.
     """
-    # Clean train data
-    # Get the most recent column with number of passengers
-    nb_passengers_col = sorted(
-        [col for col in df_train_raw.columns if col.startswith("Total Voyageurs 2")],
-        reverse=True,
-    )[0]
+    return aggregate_layer("train", df_train_raw, df_iris, resolver)
 
-    # Include only stations in Paris (postal code starts with 75)
-    # Include only relevant columns
-    df_train = (
-        df_train_raw.loc[
-            df_train_raw["Code postal"].astype(str).str.startswith("75"),
-            ["Nom de la gare", nb_passengers_col],
-        ]
-        .rename(
-            columns={
-                "Nom de la gare": "station",
-                nb_passengers_col: "nb_train_passengers",
-            }
-        )
-        .copy()
-    )
+
+def get_idfm_parkings_per_iris(
+    df_idfm_raw: pd.DataFrame, df_iris: Union[gpd.GeoDataFrame, IrisLocator]
+) -> pd.DataFrame:
+    """Compute Île de France Mobilité parking spots (in train stations) per IRIS.
+
+    Args:
+        df_idfm_raw (pd.DataFrame): Raw data with location and number of
+            parking spots in IDFM parking facilities.
+        df_iris (Union[gpd.GeoDataFrame, IrisLocator]): Raw data with location
+            of all IRIS within the city, or an IrisLocator built from it.
+
+    Returns:
+        pd.DataFrame: Number of IDFM parking spots per IRIS.
+    """
+    return aggregate_layer("parking_idfm", df_idfm_raw, df_iris)
+
+
+# Quantifiable values of the different shop surfaces
+SURFACE_CODES = {"moins de 300 m²": 1, "de 300 à 1.000 m²": 2, "1.000 m² ou plus": 3}
+
+
+def locate_metro_stations(df_metro: pd.DataFrame, resolver=None) -> gpd.GeoSeries:
+    """Locate metro and RER stations from the raw metro data.
+
+    Args:
+        df_metro (pd.DataFrame): Raw data with number of metro passengers per
+            station
+        resolver (StationResolver, optional): Resolver used to locate the
+            stations. If None, stations are geocoded.
+
+    Returns:
+        gpd.GeoSeries: Location of each station.
+    """
+    station = df_metro["Station"].str.lower()
+    station = station.str.replace("bibliotheque", "bibliotheque francois mitterand")
 
     # Add string ", station" to every station name, to avoid confusions with
     # stations names that are too general
     # E.g. "Hotel de Ville" (city hall) exists in every city
-    df_train["station_city"] = df_train["station"] + ", paris"
+    df_stations = pd.DataFrame(
+        {"station": station, "station_city": station + ", paris"}
+    )
+
+    return locate_station_names(
+        df_stations, "station", "station_city", resolver
+    ).geometry
+
+
+def locate_train_stations(df_train: pd.DataFrame, resolver=None) -> gpd.GeoSeries:
+    """Locate train stations from the raw train data.
 
-    # Geocode station names
-    df_train = geocode_from_location_name(df_train, "station_city").drop(
-        columns="station_city"
+    Args:
+        df_train (pd.DataFrame): Raw data with number of train passengers per
+            station
+        resolver (StationResolver, optional): Resolver used to locate the
+            stations. If None, stations are geocoded.
+
+    Returns:
+        gpd.GeoSeries: Location of each station.
+    """
+    station = df_train["Nom de la gare"]
+    df_stations = pd.DataFrame(
+        {"station": station, "station_city": station + ", paris"}
     )
 
-    # Identify the IRIS of each station
-    df_train = df_train.sjoin(df_iris.loc[:, ["geometry"]], how="inner")
+    return locate_station_names(
+        df_stations, "station", "station_city", resolver
+    ).geometry
 
-    # Get the total number of metro passengers per IRIS
-    df_train = df_train.groupby("index_right")[["nb_train_passengers"]].sum()
-    df_train.index.rename("iris", inplace=True)
 
-    return df_train
+def get_train_passengers(df_train: pd.DataFrame) -> pd.Series:
+    """Get the most recent number of passengers of each train station.
 
+    Args:
+        df_train (pd.DataFrame): Raw data with number of train passengers per
+            station
 
-def get_idfm_parkings_per_iris(
-    df_idfm_raw: pd.DataFrame, df_iris: gpd.GeoDataFrame
-) -> pd.DataFrame:
-    """Compute Île de France Mobilité parking spots (in train stations) per IRIS.
+    Returns:
+        pd.Series: Number of passengers.
+    """
+    nb_passengers_col = sorted(
+        [col for col in df_train.columns if col.startswith("Total Voyageurs 2")],
+        reverse=True,
+    )[0]
+    return df_train[nb_passengers_col]
+
+
+def impute_school_capacity(df_schools: pd.DataFrame) -> pd.Series:
+    """Impute missing values of school capacity with mean capacity of similar
+    type.
 
     Args:
-        df_idfm_raw (pd.DataFrame): Raw data with location and number of
-            parking spots in IDFM parking facilities.
-        df_iris (gpd.GeoDataFrame): Raw data with location of all IRIS within
-            the city.
+        df_schools (pd.DataFrame): Raw data with capacity of Paris schools.
 
     Returns:
-        pd.DataFrame: Number of IDFM parking spots per IRIS.
+        pd.Series: School capacity.
     """
-    # Transform IDFM parking DataFrame to GeoDataFrame
-    gdf_idfm_raw = gpd.GeoDataFrame(
-        df_idfm_raw,
-        crs="EPSG:4326",
-        geometry=gpd.points_from_xy(df_idfm_raw.x_long, df_idfm_raw.y_lat),
+    return df_schools["val_qn2"].fillna(
+        df_schools.groupby("c_niv3")["val_qn2"].transform("mean")
     )
 
-    # Select relevant variables and rename them
-    df_idfm = gdf_idfm_raw[
-        ["zdcname", "type", "num_docks_available", "insee_code", "geometry"]
+
+def get_layers(resolver=None) -> Dict[str, LayerSpec]:
+    """Get the declaration of all the datasets aggregated per IRIS.
+
+    To add a new dataset, add its declaration here and its source to
+    primary_pipeline.
+
+    Args:
+        resolver (StationResolver, optional): Resolver used to locate the
+            metro and train stations. If None, stations are geocoded.
+
+    Returns:
+        Dict[str, LayerSpec]: Declaration of each dataset, by name.
+    """
+    layers = [
+        # Bike parking spots (only bike parking spots)
+        LayerSpec(
+            name="parking",
+            source="parking",
+            values={"nb_parking_spots": "plarel"},
+            filters=(lambda df: df["regpar"].isin(["Vélos", "Box à vélos"]),),
+            columns=("plarel", "geometry"),
+            filter_columns=("regpar",),
+        ),
+        # Île de France Mobilité parking spots (only IRIS in Paris)
+        LayerSpec(
+            name="parking_idfm",
+            source="parking_idfm",
+            values={"nb_parking_spots_idfm": "num_docks_available"},
+            filters=(lambda df: df["insee_code"].between(75000, 75999),),
+            columns=("num_docks_available", "x_long", "y_lat"),
+            filter_columns=("insee_code",),
+            geometry=lambda df: gpd.GeoSeries(
+                gpd.points_from_xy(df["x_long"], df["y_lat"]),
+                index=df.index,
+                crs="EPSG:4326",
+            ),
+        ),
+        # Yearly museum visitors (from the cleaned museum data)
+        LayerSpec(
+            name="museum",
+            source="museum",
+            values={"visitors": "visitors"},
+            columns=("visitors", "geometry"),
+        ),
+        # Metro and RER passengers (only stations in Paris)
+        LayerSpec(
+            name="metro",
+            source="metro",
+            values={"nb_metro_rer_passengers": "Trafic"},
+            filters=(lambda df: df["Ville"].isin(["Paris"]),),
+            columns=("Station", "Trafic"),
+            filter_columns=("Ville",),
+            geometry=lambda df: locate_metro_stations(df, resolver),
+        ),
+        # Train passengers (only stations in Paris, i.e. postal code starts
+        # with 75)
+        LayerSpec(
+            name="train",
+            source="train",
+            values={"nb_train_passengers": get_train_passengers},
+            filters=(lambda df: df["Code postal"].astype(str).str.startswith("75"),),
+            geometry=lambda df: locate_train_stations(df, resolver),
+        ),
+        # Businesses weighted by shop size (without vacant shops), joined to
+        # the IRIS of their code
+        LayerSpec(
+            name="shops",
+            source="shops",
+            values={"shops_weighted": lambda df: df["SURFACE"].map(SURFACE_CODES)},
+            filters=(lambda df: df["LIBELLE_REGROUPEMENT_8_POSTES"] != "Local vacant",),
+            columns=("IRIS", "SURFACE", "geometry"),
+            key_column="IRIS",
+            filter_columns=("LIBELLE_REGROUPEMENT_8_POSTES",),
+        ),
+        # School capacity (only primary and secondary education institutions
+        # in Paris, other institutions have no info on capacity)
+        LayerSpec(
+            name="schools",
+            source="schools",
+            values={"school_capacity": impute_school_capacity},
+            filters=(
+                lambda df: df["c_cainsee"].between(75000, 75999),
+                lambda df: df["c_niv2"].isin([101, 102]),
+            ),
+            columns=("c_niv3", "val_qn2", "geometry"),
+            dtype="int",
+            filter_columns=("c_cainsee", "c_niv2"),
+        ),
     ]
-    df_idfm = df_idfm.rename(
-        columns={"zdcname": "name", "num_docks_available": "nb_parking_spots_idfm"}
-    )
+    return {layer.name: layer for layer in layers}
 
-    # Filter only IRIS in Paris
-    df_idfm = df_idfm[df_idfm["insee_code"].between(75000, 75999)]
 
-    # Identify the IRIS of each parking facility
-    df_idfm = df_idfm.sjoin(df_iris.loc[:, ["geometry"]], how="inner")
+def aggregate_layer(
+    name: str,
+    df_source: pd.DataFrame,
+    df_iris: Union[gpd.GeoDataFrame, IrisLocator],
+    resolver=None,
+) -> pd.DataFrame:
+    """Aggregate a single dataset per IRIS.
 
-    # Get the total number of parking spots per IRIS
-    df_idfm = df_idfm.groupby("index_right")[["nb_parking_spots_idfm"]].sum()
-    df_idfm.index.rename("iris", inplace=True)
+    Args:
+        name (str): Name of the dataset, in get_layers.
+        df_source (pd.DataFrame): Source dataset.
+        df_iris (Union[gpd.GeoDataFrame, IrisLocator]): Raw data with location
+            of all IRIS within the city, or an IrisLocator built from it.
+        resolver (StationResolver, optional): Resolver used to locate the
+            metro and train stations. If None, stations are geocoded.
 
-    return df_idfm
+    Returns:
+        pd.DataFrame: Aggregated dataset.
+    """
+    layer = get_layers(resolver)[name]
+    return aggregate_per_iris([layer], {layer.source: df_source}, df_iris)[name]
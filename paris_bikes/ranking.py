@@ -0,0 +1,233 @@
+import math
+from typing import Iterable, List, NamedTuple, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from paris_bikes.serving import METRIC_COLUMNS
+
+# Default number of IRIS returned by a top-N query
+TOP_N = 20
+
+# Share of the IRIS above which a changed column is sorted again, instead of
+# re-inserting the changed IRIS one by one
+REBUILD_SHARE = 0.1
+
+
+class TopResult(NamedTuple):
+    """IRIS with the highest (or lowest) values of a column.
+
+    Attributes:
+        top (pd.DataFrame): IRIS found, in order, with their value of the
+            column, their rank by this column ("rank", 1 for the highest value
+            of all IRIS) and their arrondissement ("arrondissement").
+        count (int): Number of IRIS matching the query, of which top lists
+            the first ones.
+    """
+
+    top: pd.DataFrame
+    count: int
+
+
+def get_keys(values: np.ndarray) -> np.ndarray:
+    """Get the sort keys of values: negated, and missing if not finite."""
+    with np.errstate(invalid="ignore"):
+        return np.where(np.isfinite(values), -values, np.nan)
+
+
+class RankIndex:
+    """IRIS sorted by each metric of the serving table.
+
+    Each column is sorted once, from the highest value to the lowest (missing
+    and infinite values last, ties in the order of the table). A query walks
+    the sorted IRIS: value ranges and percentiles are slices of them, found by
+    binary search, and the other filters only look at the IRIS of the slice.
+    When values change, the changed IRIS are removed and inserted back by
+    binary search instead of sorting the whole column again.
+
+    Updates never modify the arrays of the index in place, so a copy (e.g.
+    for a scenario) can be updated while the original is being queried.
+
+    Args:
+        df (pd.DataFrame): Serving table, indexed by IRIS, with the columns to
+            rank, and the "arrondissement" and "nb_pop" of each IRIS.
+        columns (List[str], optional): Columns to rank. Defaults to
+            METRIC_COLUMNS.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: List[str] = METRIC_COLUMNS):
+        self.iris = df.index
+        self.columns = list(columns)
+        self.arrondissement = df["arrondissement"].to_numpy(dtype=int)
+        self.population = df["nb_pop"].to_numpy(dtype=float)
+        # Values of each column, by position in the table
+        self.values = {}
+        # Positions of the IRIS, sorted by decreasing value of each column
+        self.orders = {}
+        # Keys of the values (see get_keys), in the sorted order (increasing),
+        # to binary search
+        self.keys = {}
+        for col in self.columns:
+            self._sort(col, df[col].to_numpy(dtype=float, copy=True))
+
+    def _sort(self, col: str, values: np.ndarray):
+        """Sort the IRIS by a column."""
+        keys = get_keys(values)
+        order = np.argsort(keys, kind="stable")
+        self.values[col] = values
+        self.orders[col] = order
+        self.keys[col] = keys[order]
+
+    def copy(self) -> "RankIndex":
+        """Copy the index, to update the copy independently."""
+        rank_index = RankIndex.__new__(RankIndex)
+        rank_index.__dict__.update(self.__dict__)
+        rank_index.values = dict(self.values)
+        rank_index.orders = dict(self.orders)
+        rank_index.keys = dict(self.keys)
+        return rank_index
+
+    def _find(self, col: str, keys: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Find the sorted positions of IRIS from their keys (see get_keys)."""
+        order, sorted_keys = self.orders[col], self.keys[col]
+        starts = np.searchsorted(sorted_keys, keys, side="left")
+        stops = np.searchsorted(sorted_keys, keys, side="right")
+        # Ties are sorted by position in the table
+        return np.array(
+            [
+                start + np.searchsorted(order[start:stop], row)
+                for start, stop, row in zip(starts, stops, rows)
+            ],
+            dtype=int,
+        )
+
+    def update(self, changes: pd.DataFrame):
+        """Change the values of some IRIS.
+
+        Args:
+            changes (pd.DataFrame): New values of the changed IRIS (rows) for
+                some of the columns (e.g. from Scenario.get_changes), incl.
+                their population ("nb_pop"). Other columns are ignored.
+
+        Raises:
+            ValueError: If an IRIS is unknown or listed twice.
+        """
+        rows = self.iris.get_indexer(changes.index)
+        if (rows < 0).any() or changes.index.duplicated().any():
+            raise ValueError("Changed IRIS must be unique IRIS of the index.")
+
+        if "nb_pop" in changes.columns:
+            self.population = self.population.copy()
+            self.population[rows] = changes["nb_pop"].to_numpy(dtype=float)
+
+        for col in [col for col in changes.columns if col in self.columns]:
+            values = self.values[col].copy()
+            values[rows] = changes[col].to_numpy(dtype=float)
+            if len(rows) > REBUILD_SHARE * len(values):
+                self._sort(col, values)
+                continue
+
+            # Remove the changed IRIS from the sorted ones
+            positions = self._find(col, get_keys(self.values[col][rows]), rows)
+            order = np.delete(self.orders[col], positions)
+            sorted_keys = np.delete(self.keys[col], positions)
+            self.orders[col], self.keys[col] = order, sorted_keys
+
+            # Insert them back at their new positions, in sorted order
+            new_keys = get_keys(values[rows])
+            inserted = np.lexsort((rows, new_keys))
+            new_keys, new_rows = new_keys[inserted], rows[inserted]
+            positions = self._find(col, new_keys, new_rows)
+            self.orders[col] = np.insert(order, positions, new_rows)
+            self.keys[col] = np.insert(sorted_keys, positions, new_keys)
+            self.values[col] = values
+
+    def top(
+        self,
+        col: str,
+        n: int = TOP_N,
+        arrondissement: Optional[Union[int, Iterable[int]]] = None,
+        min_population: Optional[float] = None,
+        min_value: Optional[float] = None,
+        max_value: Optional[float] = None,
+        percentile: Optional[float] = None,
+        ascending: bool = False,
+    ) -> TopResult:
+        """Find the IRIS with the highest (or lowest) values of a column.
+
+        IRIS without a finite value (e.g. a demand/supply index without parking
+        spots) are never returned.
+
+        Args:
+            col (str): Column to rank the IRIS by.
+            n (int, optional): Maximum number of IRIS returned. Defaults to
+                TOP_N.
+            arrondissement (Union[int, Iterable[int]], optional): Only IRIS of
+                these arrondissements. Defaults to None (all).
+            min_population (float, optional): Only IRIS with at least this
+                population. Defaults to None.
+            min_value (float, optional): Only IRIS with at least this value.
+                Defaults to None.
+            max_value (float, optional): Only IRIS with at most this value.
+                Defaults to None.
+            percentile (float, optional): Only IRIS in this top percentage of
+                all IRIS (bottom percentage if ascending), between 0 and 100.
+                Defaults to None.
+            ascending (bool, optional): Lowest values first. Defaults to False.
+
+        Raises:
+            ValueError: If the column is not ranked, or if n or the percentile
+                are out of range.
+
+        Returns:
+            TopResult: IRIS found and number of IRIS matching the query.
+        """
+        if col not in self.columns:
+            raise ValueError(f"Column {col} is not ranked.")
+        if n < 0:
+            raise ValueError(f"Invalid number of IRIS {n}.")
+        if percentile is not None and not 0 <= percentile <= 100:
+            raise ValueError(f"Invalid percentile {percentile}.")
+
+        order, sorted_keys = self.orders[col], self.keys[col]
+        # Missing and infinite values are sorted last
+        start, stop = 0, int(np.searchsorted(sorted_keys, np.nan, side="left"))
+        n_valid = stop
+        if percentile is not None:
+            n_percentile = math.ceil(percentile / 100 * n_valid)
+            if ascending:
+                start = n_valid - n_percentile
+            else:
+                stop = n_percentile
+        if max_value is not None:
+            start = max(start, int(np.searchsorted(sorted_keys, -max_value, "left")))
+        if min_value is not None:
+            stop = min(stop, int(np.searchsorted(sorted_keys, -min_value, "right")))
+
+        positions = np.arange(start, max(start, stop))
+        if ascending:
+            positions = positions[::-1]
+        # Without filters, only the first IRIS of the slice are looked at
+        if arrondissement is not None or min_population is not None:
+            rows = order[positions]
+            mask = np.ones(len(rows), dtype=bool)
+            if arrondissement is not None:
+                mask &= np.isin(
+                    self.arrondissement[rows], np.atleast_1d(arrondissement)
+                )
+            if min_population is not None:
+                mask &= self.population[rows] >= min_population
+            positions = positions[mask]
+        count = len(positions)
+        positions = positions[:n]
+        rows = order[positions]
+
+        top = pd.DataFrame(
+            {
+                col: self.values[col][rows],
+                "rank": positions + 1,
+                "arrondissement": self.arrondissement[rows],
+            },
+            index=self.iris[rows],
+        )
+        return TopResult(top, count)
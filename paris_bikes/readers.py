@@ -0,0 +1,181 @@
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+import fiona
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyproj
+import shapely.geometry
+
+from paris_bikes.aggregation import LayerSpec
+
+# Bounding box of Paris, including the Bois de Boulogne and the Bois de
+# Vincennes, with a small margin (longitude and latitude)
+PARIS_BBOX = (2.22, 48.81, 2.48, 48.91)
+
+# Number of features read at once
+READ_CHUNK_SIZE = 10000
+
+
+def _get_bbox(src: fiona.Collection, bbox: Tuple[float, ...]) -> Tuple[float, ...]:
+    """Convert a longitude/latitude bounding box to the CRS of a file.
+
+    Args:
+        src (fiona.Collection): Opened file.
+        bbox (Tuple[float, ...]): Bounding box (min lon, min lat, max lon,
+            max lat).
+
+    Returns:
+        Tuple[float, ...]: Bounding box in the CRS of the file.
+    """
+    if not src.crs_wkt:
+        return bbox
+    crs = pyproj.CRS.from_wkt(src.crs_wkt)
+    if crs.equals("EPSG:4326", ignore_axis_order=True):
+        return bbox
+    transformer = pyproj.Transformer.from_crs("EPSG:4326", crs, always_xy=True)
+    return transformer.transform_bounds(*bbox)
+
+
+def iter_geojson_chunks(
+    filepath: Path,
+    columns: Optional[Sequence[str]] = None,
+    bbox: Optional[Tuple[float, ...]] = PARIS_BBOX,
+    chunksize: int = READ_CHUNK_SIZE,
+) -> Iterator[gpd.GeoDataFrame]:
+    """Read a GeoJSON file (or any file readable by fiona) by chunks.
+
+    Only one chunk of features is held in memory at a time.
+
+    Args:
+        filepath (Path): Path to the file.
+        columns (Sequence[str], optional): Columns to read (the geometry is
+            always read). If None, all columns are read. Defaults to None.
+        bbox (Tuple[float, ...], optional): Only read features intersecting
+            this longitude/latitude bounding box. If None, all features are
+            read. Defaults to PARIS_BBOX.
+        chunksize (int, optional): Number of features per chunk. Defaults to
+            READ_CHUNK_SIZE.
+
+    Yields:
+        gpd.GeoDataFrame: Chunk of features.
+    """
+    with fiona.open(filepath) as src:
+        crs = src.crs_wkt or None
+        properties = src.schema["properties"]
+        if columns is not None:
+            properties = {
+                column: dtype
+                for column, dtype in properties.items()
+                if column in columns
+            }
+        numeric = [
+            column
+            for column, dtype in properties.items()
+            if dtype.startswith(("int", "float"))
+        ]
+
+        features = iter(src) if bbox is None else src.filter(bbox=_get_bbox(src, bbox))
+        while True:
+            chunk = list(islice(features, chunksize))
+            if not chunk:
+                break
+
+            # Only keep the selected columns of each feature
+            data = {
+                column: [feature["properties"][column] for feature in chunk]
+                for column in properties
+            }
+            geometry = [
+                None
+                if feature["geometry"] is None
+                else shapely.geometry.shape(feature["geometry"])
+                for feature in chunk
+            ]
+            df_chunk = gpd.GeoDataFrame(data, geometry=geometry, crs=crs)
+            if numeric:
+                df_chunk[numeric] = df_chunk[numeric].apply(pd.to_numeric)
+            yield df_chunk
+
+
+def read_geojson(
+    filepath: Path,
+    columns: Optional[Sequence[str]] = None,
+    filters: Iterable[Callable] = (),
+    bbox: Optional[Tuple[float, ...]] = PARIS_BBOX,
+    chunksize: int = READ_CHUNK_SIZE,
+) -> gpd.GeoDataFrame:
+    """Read a GeoJSON file, keeping only the features needed.
+
+    The bounding box, the filters and the column selection are applied while
+    reading, chunk by chunk, so memory usage depends on the number of features
+    kept rather than on the size of the file.
+
+    Args:
+        filepath (Path): Path to the file.
+        columns (Sequence[str], optional): Columns to read (the geometry is
+            always read). If None, all columns are read. Defaults to None.
+        filters (Iterable[Callable], optional): Functions of a chunk returning
+            the boolean mask of the rows to keep. They must only depend on each
+            row, not on the other rows of the chunk. Defaults to ().
+        bbox (Tuple[float, ...], optional): Only read features intersecting
+            this longitude/latitude bounding box. If None, all features are
+            read. Defaults to PARIS_BBOX.
+        chunksize (int, optional): Number of features per chunk. Defaults to
+            READ_CHUNK_SIZE.
+
+    Returns:
+        gpd.GeoDataFrame: Features kept.
+    """
+    filters = list(filters)
+    chunks = []
+    for df_chunk in iter_geojson_chunks(filepath, columns, bbox, chunksize):
+        mask = np.ones(len(df_chunk), dtype=bool)
+        for chunk_filter in filters:
+            mask &= np.asarray(chunk_filter(df_chunk), dtype=bool)
+        chunks.append(df_chunk.loc[mask])
+
+    if not chunks:
+        # Read the columns and the CRS of the file, without any feature
+        with fiona.open(filepath) as src:
+            crs = src.crs_wkt or None
+            names = [
+                column
+                for column in src.schema["properties"]
+                if columns is None or column in columns
+            ]
+        return gpd.GeoDataFrame(columns=names, geometry=[], crs=crs)
+
+    return gpd.GeoDataFrame(pd.concat(chunks, ignore_index=True), crs=chunks[0].crs)
+
+
+def read_layer_source(
+    filepath: Path,
+    layer: LayerSpec,
+    bbox: Optional[Tuple[float, ...]] = PARIS_BBOX,
+    chunksize: int = READ_CHUNK_SIZE,
+) -> gpd.GeoDataFrame:
+    """Read the source of a layer, keeping only the rows and columns it uses.
+
+    Args:
+        filepath (Path): Path to the source file.
+        layer (LayerSpec): Declaration of the layer.
+        bbox (Tuple[float, ...], optional): Only read features intersecting
+            this longitude/latitude bounding box. If None, all features are
+            read. Defaults to PARIS_BBOX.
+        chunksize (int, optional): Number of features per chunk. Defaults to
+            READ_CHUNK_SIZE.
+
+    Returns:
+        gpd.GeoDataFrame: Source of the layer.
+    """
+    columns = None
+    if layer.columns:
+        columns = [
+            column
+            for column in (*layer.filter_columns, *layer.columns)
+            if column != "geometry"
+        ]
+    return read_geojson(filepath, columns, layer.filters, bbox, chunksize)
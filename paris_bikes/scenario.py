@@ -0,0 +1,286 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from paris_bikes.serving import FEATURE_FILEPATH
+from paris_bikes.storage import read_dataset
+
+# shapely is only imported to locate points, so that the serving process can
+# import this module without it
+if TYPE_CHECKING:
+    from paris_bikes.spatial import IrisLocator
+
+
+class ScenarioBase:
+    """Current parking supply and demand, shared by all the scenarios.
+
+    It is never modified, so scenarios of concurrent users can share it.
+
+    Args:
+        df (pd.DataFrame): Serving table, indexed by IRIS, with the columns
+            "nb_parking_spots" and "demand_index".
+        locator (IrisLocator, optional): Locator of the IRIS of df, needed to
+            change parking spots at points. Defaults to None.
+        demand (np.ndarray, optional): Demand index of each IRIS (e.g. for
+            other weights, see DemandIndex). Defaults to the "demand_index"
+            column of df.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        locator: Optional["IrisLocator"] = None,
+        demand: Optional[np.ndarray] = None,
+    ):
+        self.iris = df.index
+        self.locator = locator
+        self.spots = df["nb_parking_spots"].to_numpy(dtype=float)
+        self.demand = (
+            df["demand_index"].to_numpy(dtype=float)
+            if demand is None
+            else np.asarray(demand, dtype=float)
+        )
+        # IRIS by increasing number of parking spots, to find the minimum and
+        # maximum of a scenario without a full pass
+        self.order = np.argsort(self.spots, kind="stable")
+        # Position of each IRIS in the serving table
+        self.rows = {iris: row for row, iris in enumerate(self.iris)}
+
+    def create_scenario(self) -> "Scenario":
+        """Create an empty scenario (the current situation)."""
+        return Scenario(self)
+
+
+class Scenario:
+    """Parking spots added or removed from the current situation.
+
+    Only the changed IRIS are stored, and the minimum and maximum number of
+    parking spots (used to scale the supply) are updated from them. Forking a
+    scenario only copies its changes.
+
+    Args:
+        base (ScenarioBase): Current situation.
+        spots (Dict[int, float], optional): Number of parking spots of the
+            changed IRIS, by position in the serving table. Defaults to None.
+    """
+
+    def __init__(self, base: ScenarioBase, spots: Optional[Dict[int, float]] = None):
+        self.base = base
+        self.spots = {} if spots is None else dict(spots)
+
+    def fork(self) -> "Scenario":
+        """Copy the scenario, to change the copy independently."""
+        return Scenario(self.base, self.spots)
+
+    def _change(
+        self,
+        x: Iterable[float],
+        y: Iterable[float],
+        spots: Union[float, Iterable[float]],
+    ) -> np.ndarray:
+        """Add parking spots (or remove them, if negative) at points.
+
+        Args:
+            x (Iterable[float]): Longitudes of the points.
+            y (Iterable[float]): Latitudes of the points.
+            spots (Union[float, Iterable[float]]): Number of parking spots
+                added at each point.
+
+        Raises:
+            ValueError: If the base of the scenario has no IRIS locator.
+
+        Returns:
+            np.ndarray: IRIS of each point, or None if not in any IRIS (the
+                point is then ignored).
+        """
+        if self.base.locator is None:
+            raise ValueError("Locating points requires a ScenarioBase with a locator.")
+        iris = self.base.locator.locate_xy(x, y)
+        located = np.array([point_iris is not None for point_iris in iris], dtype=bool)
+        spots = np.broadcast_to(np.asarray(spots, dtype=float), iris.shape)
+        self.change_rows(
+            [self.base.rows[point_iris] for point_iris in iris[located]],
+            spots[located],
+        )
+        return iris
+
+    def change_rows(self, rows: Iterable[int], spots: Iterable[float]):
+        """Add parking spots (or remove them, if negative) to IRIS.
+
+        Args:
+            rows (Iterable[int]): Positions of the IRIS in the serving table.
+            spots (Iterable[float]): Number of parking spots added to each
+                IRIS (down to 0 parking spots per IRIS).
+        """
+        for row, change in zip(rows, np.asarray(spots, dtype=float).tolist()):
+            # There cannot be less than 0 parking spots
+            self.spots[row] = max(self.get_row_spots(row) + change, 0.0)
+
+    def add_parking(
+        self,
+        x: Iterable[float],
+        y: Iterable[float],
+        spots: Union[float, Iterable[float]] = 1,
+    ) -> np.ndarray:
+        """Add parking spots at points.
+
+        Args:
+            x (Iterable[float]): Longitudes of the points.
+            y (Iterable[float]): Latitudes of the points.
+            spots (Union[float, Iterable[float]], optional): Number of parking
+                spots added at each point. Defaults to 1.
+
+        Returns:
+            np.ndarray: IRIS of each point, or None if not in any IRIS (the
+                point is then ignored).
+        """
+        return self._change(x, y, spots)
+
+    def remove_parking(
+        self,
+        x: Iterable[float],
+        y: Iterable[float],
+        spots: Union[float, Iterable[float]] = 1,
+    ) -> np.ndarray:
+        """Remove parking spots at points (down to 0 parking spots per IRIS).
+
+        Args:
+            x (Iterable[float]): Longitudes of the points.
+            y (Iterable[float]): Latitudes of the points.
+            spots (Union[float, Iterable[float]], optional): Number of parking
+                spots removed at each point. Defaults to 1.
+
+        Returns:
+            np.ndarray: IRIS of each point, or None if not in any IRIS (the
+                point is then ignored).
+        """
+        return self._change(x, y, -np.asarray(spots, dtype=float))
+
+    def get_row_spots(self, row: int) -> float:
+        """Get the number of parking spots of an IRIS, by position."""
+        return self.spots.get(row, self.base.spots[row])
+
+    def _get_unchanged_extreme(self, order: Iterable[int]) -> Optional[float]:
+        """Get the first number of parking spots of an unchanged IRIS, in order."""
+        for row in order:
+            if row not in self.spots:
+                return self.base.spots[row]
+        return None
+
+    def get_bounds(self) -> Tuple[float, float]:
+        """Get the minimum and maximum number of parking spots per IRIS.
+
+        Only the changed IRIS and as many IRIS of the current situation are
+        looked at.
+
+        Returns:
+            Tuple[float, float]: Minimum and maximum.
+        """
+        candidates_min = list(self.spots.values())
+        candidates_max = list(self.spots.values())
+        unchanged_min = self._get_unchanged_extreme(self.base.order)
+        unchanged_max = self._get_unchanged_extreme(reversed(self.base.order))
+        if unchanged_min is not None:
+            candidates_min.append(unchanged_min)
+            candidates_max.append(unchanged_max)
+        return min(candidates_min), max(candidates_max)
+
+    def get_changed_rows(self) -> np.ndarray:
+        """Get the position of the changed IRIS in the serving table."""
+        return np.fromiter(self.spots, dtype=int, count=len(self.spots))
+
+    def get_spots(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Get the number of parking spots per IRIS.
+
+        Args:
+            rows (np.ndarray, optional): Positions of the IRIS. Defaults to
+                all IRIS.
+
+        Returns:
+            np.ndarray: Number of parking spots.
+        """
+        if rows is None:
+            spots = self.base.spots.copy()
+            changed = self.get_changed_rows()
+            spots[changed] = [self.spots[row] for row in changed]
+            return spots
+        return np.array([self.get_row_spots(row) for row in rows], dtype=float)
+
+    def get_supply_index(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Get the supply index (number of parking spots scaled between 0 and 1).
+
+        Args:
+            rows (np.ndarray, optional): Positions of the IRIS. Defaults to
+                all IRIS.
+
+        Returns:
+            np.ndarray: Supply index.
+        """
+        minimum, maximum = self.get_bounds()
+        scale = maximum - minimum
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (self.get_spots(rows) - minimum) / (scale if scale else np.nan)
+
+    def get_demand_supply_index(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Get the demand/supply index.
+
+        Args:
+            rows (np.ndarray, optional): Positions of the IRIS. Defaults to
+                all IRIS.
+
+        Returns:
+            np.ndarray: Demand/supply index (inf if there is demand but no
+                supply).
+        """
+        demand = self.base.demand if rows is None else self.base.demand[rows]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return demand / self.get_supply_index(rows)
+
+    def get_changes(self) -> pd.DataFrame:
+        """Get the new values of the changed IRIS.
+
+        If the minimum or maximum number of parking spots changed, the supply
+        index of all the IRIS changed too (see get_supply_index).
+
+        Returns:
+            pd.DataFrame: Number of parking spots, supply index and
+                demand/supply index of the changed IRIS.
+        """
+        rows = self.get_changed_rows()
+        return pd.DataFrame(
+            {
+                "nb_parking_spots": self.get_spots(rows),
+                "supply_index": self.get_supply_index(rows),
+                "demand_supply_index": self.get_demand_supply_index(rows),
+            },
+            index=self.base.iris[rows],
+        )
+
+    def bounds_changed(self) -> bool:
+        """Whether the minimum or maximum number of parking spots changed."""
+        return self.get_bounds() != (
+            self.base.spots[self.base.order[0]],
+            self.base.spots[self.base.order[-1]],
+        )
+
+
+def load_scenario_base(
+    df: pd.DataFrame, feature_filepath: Path = FEATURE_FILEPATH, **kwargs
+) -> ScenarioBase:
+    """Create the base of the scenarios, locating IRIS with the feature table.
+
+    Args:
+        df (pd.DataFrame): Serving table, see ScenarioBase.
+        feature_filepath (Path, optional): Location of the feature table, whose
+            geometry is used to locate points. Defaults to FEATURE_FILEPATH.
+        **kwargs: Other arguments of ScenarioBase.
+
+    Returns:
+        ScenarioBase: Base of the scenarios.
+    """
+    from paris_bikes.spatial import IrisLocator
+
+    df_iris = read_dataset(feature_filepath, columns=["geometry"])
+    return ScenarioBase(df, IrisLocator(df_iris.loc[df.index]), **kwargs)
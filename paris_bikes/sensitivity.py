@@ -0,0 +1,229 @@
+import argparse
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from paris_bikes.index import DemandIndex, Weights
+
+# Number of weight vectors sampled
+N_SAMPLES = 10000
+
+# Number of most underserved IRIS whose inclusion probability is reported
+TOP_N = 20
+
+# Concentration of the Dirichlet distribution of the weights: 1 samples all
+# weightings uniformly, larger values sample closer to equal weights
+CONCENTRATION = 1.0
+
+# Number of weight vectors ranked together (bounds the memory used)
+BATCH_SIZE = 1000
+
+
+class SensitivityReport(NamedTuple):
+    """Stability of the ranking of the IRIS under random weightings.
+
+    Attributes:
+        summary (pd.DataFrame): For each IRIS (rows): rank with the base
+            weighting, mean, median and 5%/95% quantiles of its rank, and
+            probability of being in the top N. Sorted by base rank.
+        rank_counts (np.ndarray): Number of samples in which each IRIS (rows,
+            in the order of the demand index) has each rank (columns, rank 1
+            first).
+        n_samples (int): Number of weight vectors sampled.
+    """
+
+    summary: pd.DataFrame
+    rank_counts: np.ndarray
+    n_samples: int
+
+
+def sample_weights(
+    n_vars: int,
+    n_samples: int = N_SAMPLES,
+    concentration: float = CONCENTRATION,
+    seed: Optional[int] = None,
+) -> np.ndarray:
+    """Sample weight vectors from a symmetric Dirichlet distribution.
+
+    The weights are scaled to sum to the number of variables, like equal
+    weights of 1.
+
+    Args:
+        n_vars (int): Number of variables.
+        n_samples (int, optional): Number of weight vectors. Defaults to
+            N_SAMPLES.
+        concentration (float, optional): Concentration of the distribution.
+            Defaults to CONCENTRATION.
+        seed (int, optional): Seed of the random generator. Defaults to None.
+
+    Returns:
+        np.ndarray: One weight vector per row.
+    """
+    rng = np.random.default_rng(seed)
+    return rng.dirichlet(np.full(n_vars, concentration), n_samples) * n_vars
+
+
+def compute_scores(
+    demand_index: DemandIndex, weight_matrix: np.ndarray, per_supply: bool = True
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Compute the index for many weight vectors at once.
+
+    Args:
+        demand_index (DemandIndex): Demand index.
+        weight_matrix (np.ndarray): One weight vector per row.
+        per_supply (bool, optional): Divide the demand index by the scaled
+            supply, as in the demand/supply index. Defaults to True.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Index and demand index of each IRIS
+            (columns) for each weight vector (rows). Missing values of the
+            index are -inf, so that they rank last.
+    """
+    demand = weight_matrix @ demand_index.matrix.T
+    if not per_supply:
+        return demand, demand
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = demand / demand_index.supply
+    scores[np.isnan(scores)] = -np.inf
+    return scores, demand
+
+
+def rank_scores(scores: np.ndarray, demand: np.ndarray) -> np.ndarray:
+    """Rank the IRIS for each weight vector, rank 1 being the highest index.
+
+    Ties (e.g. IRIS without any parking spot, whose demand/supply index is
+    infinite) are ranked by demand index.
+
+    Args:
+        scores (np.ndarray): Index of each IRIS (columns) for each weight
+            vector (rows).
+        demand (np.ndarray): Demand index, in the same layout.
+
+    Returns:
+        np.ndarray: Rank (starting at 1) of each IRIS for each weight vector.
+    """
+    order = np.lexsort((-demand, -scores), axis=1)
+    ranks = np.empty(scores.shape, dtype=np.int32)
+    np.put_along_axis(
+        ranks, order, np.arange(1, scores.shape[1] + 1, dtype=np.int32), axis=1
+    )
+    return ranks
+
+
+def get_rank_quantile(rank_counts: np.ndarray, q: float) -> np.ndarray:
+    """Get a quantile of the rank of each IRIS from its rank counts.
+
+    Args:
+        rank_counts (np.ndarray): Rank counts, see SensitivityReport.
+        q (float): Quantile, between 0 and 1.
+
+    Returns:
+        np.ndarray: Quantile of the rank of each IRIS.
+    """
+    cumulative = np.cumsum(rank_counts, axis=1)
+    threshold = q * cumulative[:, -1:]
+    return (cumulative < threshold).sum(axis=1) + 1
+
+
+def run_sensitivity(
+    demand_index: DemandIndex,
+    n_samples: int = N_SAMPLES,
+    top_n: int = TOP_N,
+    concentration: float = CONCENTRATION,
+    base_weights: Weights = "equal",
+    per_supply: bool = True,
+    seed: Optional[int] = None,
+    batch_size: int = BATCH_SIZE,
+) -> SensitivityReport:
+    """Measure how the ranking of the most underserved IRIS depends on the weights.
+
+    Weight vectors are sampled from a Dirichlet distribution, and the IRIS
+    are ranked by their index for all of them, by batches of matrix products
+    and sorts.
+
+    Args:
+        demand_index (DemandIndex): Demand index.
+        n_samples (int, optional): Number of weight vectors. Defaults to
+            N_SAMPLES.
+        top_n (int, optional): Number of top ranks whose inclusion probability
+            is reported. Defaults to TOP_N.
+        concentration (float, optional): Concentration of the Dirichlet
+            distribution. Defaults to CONCENTRATION.
+        base_weights (Weights, optional): Weighting of the base ranking.
+            Defaults to "equal".
+        per_supply (bool, optional): Rank by the demand/supply index, instead
+            of by the demand index. Defaults to True.
+        seed (int, optional): Seed of the random generator. Defaults to None.
+        batch_size (int, optional): Number of weight vectors ranked together.
+            Defaults to BATCH_SIZE.
+
+    Returns:
+        SensitivityReport: Rank distributions and top N probabilities.
+    """
+    n_iris = len(demand_index.iris)
+    weights = sample_weights(
+        len(demand_index.index_vars), n_samples, concentration, seed
+    )
+
+    # Count the ranks of each IRIS, without keeping the ranks of all samples
+    rank_counts = np.zeros((n_iris, n_iris), dtype=np.int64)
+    iris_offsets = np.arange(n_iris) * n_iris
+    for start in range(0, n_samples, batch_size):
+        ranks = rank_scores(
+            *compute_scores(
+                demand_index, weights[start : start + batch_size], per_supply
+            )
+        )
+        rank_counts += np.bincount(
+            (iris_offsets + ranks - 1).ravel(), minlength=n_iris * n_iris
+        ).reshape(n_iris, n_iris)
+
+    base_ranks = rank_scores(
+        *compute_scores(
+            demand_index, demand_index.get_weights(base_weights)[None, :], per_supply
+        )
+    )
+    summary = pd.DataFrame(
+        {
+            "base_rank": base_ranks[0],
+            "mean_rank": rank_counts @ np.arange(1, n_iris + 1) / n_samples,
+            "median_rank": get_rank_quantile(rank_counts, 0.5),
+            "rank_q05": get_rank_quantile(rank_counts, 0.05),
+            "rank_q95": get_rank_quantile(rank_counts, 0.95),
+            f"top_{top_n}_probability": rank_counts[:, :top_n].sum(axis=1) / n_samples,
+        },
+        index=demand_index.iris,
+    ).sort_values("base_rank")
+    return SensitivityReport(summary, rank_counts, n_samples)
+
+
+if __name__ == "__main__":
+    from paris_bikes.serving import load_snapshot
+
+    parser = argparse.ArgumentParser(
+        description="Sensitivity of the ranking of the most underserved IRIS to the weights of the demand index."
+    )
+    parser.add_argument("--samples", type=int, default=N_SAMPLES)
+    parser.add_argument("--top", type=int, default=TOP_N)
+    parser.add_argument("--concentration", type=float, default=CONCENTRATION)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--demand-only",
+        action="store_true",
+        help="Rank by the demand index instead of the demand/supply index.",
+    )
+    parser.add_argument("--output", help="Save the summary to this CSV file.")
+    args = parser.parse_args()
+
+    report = run_sensitivity(
+        DemandIndex(load_snapshot().df),
+        n_samples=args.samples,
+        top_n=args.top,
+        concentration=args.concentration,
+        per_supply=not args.demand_only,
+        seed=args.seed,
+    )
+    print(report.summary.head(args.top).to_string())
+    if args.output:
+        report.summary.to_csv(args.output)
@@ -0,0 +1,578 @@
+import hashlib
+import json
+import math
+import os
+import struct
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from paris_bikes.districts import locate_districts
+from paris_bikes.index import DemandIndex, Weights, create_parking_index
+from paris_bikes.storage import find_dataset, read_dataset
+from paris_bikes.utils import get_data_root
+
+# Location of the feature table, of the grid table and of the serving snapshot
+# built from them
+FEATURE_FILEPATH = get_data_root() / "feature" / "feature.parquet"
+GRID_FILEPATH = get_data_root() / "feature" / "grid.parquet"
+SNAPSHOT_FILEPATH = get_data_root() / "feature" / "serving.snapshot"
+
+# Start of every snapshot file, followed by the version of the format
+SNAPSHOT_MAGIC = b"PBSNAP"
+SNAPSHOT_FORMAT_VERSION = 6
+
+# Alignment (in bytes) of the data sections of a snapshot
+SNAPSHOT_ALIGNMENT = 64
+
+# Properties of the map trace that depend on the selected column
+MAP_TRACE_PROPS = ["z", "customdata", "hovertemplate"]
+
+# Options of the RadioItems used to select the column to plot
+INDEX_OPTIONS = [
+    {"label": "Demand index", "value": "demand_index"},
+    {"label": "Supply index", "value": "supply_index"},
+    {"label": "Demand/Supply Index", "value": "demand_supply_index"},
+]
+DEMAND_OPTIONS = [
+    {"label": "Population", "value": "nb_pop"},
+    {"label": "Museum visitors", "value": "visitors"},
+    {"label": "Metro passengers", "value": "nb_metro_rer_passengers"},
+    {"label": "Train passengers", "value": "nb_train_passengers"},
+    {"label": "Number of shops", "value": "shops_weighted"},
+    {"label": "School capacity", "value": "school_capacity"},
+]
+SUPPLY_OPTIONS = [{"label": "Parking spots", "value": "nb_parking_spots"}]
+
+# Metrics of the serving table, returned by the API and ranked
+METRIC_COLUMNS = [
+    option["value"] for option in SUPPLY_OPTIONS + DEMAND_OPTIONS + INDEX_OPTIONS
+]
+
+# Columns of the serving table that depend on the weights of the demand index
+WEIGHTED_COLUMNS = ("demand_index", "demand_supply_index")
+
+
+class ServingSnapshot(NamedTuple):
+    """Everything the dash application needs to serve the maps.
+
+    Attributes:
+        df (pd.DataFrame): Serving table, indexed by IRIS and with an "iris"
+            column.
+        geometry_levels (Dict[str, dict]): Simplified geometry of the areas of
+            each level of the map (IRIS, quartiers, arrondissements and
+            hexagons), as returned by simplify_geometry.
+        map_figures (Dict[str, dict]): Maps of all the columns that can be
+            selected, as returned by build_map_figures, for each level.
+        dataset_version (str): Hash of the feature table (and grid table) the
+            snapshot was built from.
+        grid (pd.DataFrame, optional): Grid table, indexed by cell, if it was
+            built by the pipelines. Defaults to None.
+    """
+
+    df: pd.DataFrame
+    geometry_levels: Dict[str, dict]
+    map_figures: Dict[str, dict]
+    dataset_version: str
+    grid: Optional[pd.DataFrame] = None
+
+
+def select_column(demand_input_value, supply_input_value, index_input_value, normalize):
+    """Get the column to plot and its colorscale from the selected RadioItems"""
+    # Plot from supply RadioItems or demand RadioItems?
+    if demand_input_value:
+        col = demand_input_value
+        colorscale = "OrRd"
+        # Normalize or not?
+        if normalize:
+            col += "_normalized"
+    elif supply_input_value:
+        col = supply_input_value
+        colorscale = "Greens"
+    elif index_input_value:
+        col = index_input_value
+        if col == "demand_index":
+            colorscale = "OrRd"
+        elif col == "supply_index":
+            colorscale = "Greens"
+        else:
+            colorscale = "Blues"
+
+    return col, colorscale
+
+
+def get_selections():
+    """Get all the possible values of the RadioItems and normalize button"""
+    return (
+        [(option["value"], None, None, []) for option in DEMAND_OPTIONS]
+        + [(option["value"], None, None, [1]) for option in DEMAND_OPTIONS]
+        + [(None, option["value"], None, []) for option in SUPPLY_OPTIONS]
+        + [(None, None, option["value"], []) for option in INDEX_OPTIONS]
+    )
+
+
+def compute_weighted_column(
+    demand_index: DemandIndex, col: str, weights: Weights
+) -> list:
+    """Compute a column of WEIGHTED_COLUMNS for a weighting of the demand index.
+
+    Args:
+        demand_index (DemandIndex): Demand index of the serving table.
+        col (str): Column of WEIGHTED_COLUMNS.
+        weights (Weights): Weighting, see DemandIndex.get_weights.
+
+    Returns:
+        list: Values of the column, with None for non finite values (as in the
+            maps of build_map_figures).
+    """
+    values = demand_index.matrix @ demand_index.get_weights(weights)
+    if col == "demand_supply_index":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = values / demand_index.supply
+    return [value if math.isfinite(value) else None for value in values.tolist()]
+
+
+def get_dataset_version(
+    feature_filepath: Path, grid_filepath: Optional[Path] = None
+) -> str:
+    """Hash the feature table file, and the grid table file if it exists.
+
+    Args:
+        feature_filepath (Path): Location of the feature table.
+        grid_filepath (Path, optional): Location of the grid table. Defaults
+            to None.
+
+    Returns:
+        str: Hash of the files.
+    """
+    with open(feature_filepath, "rb") as file:
+        sha1 = hashlib.sha1(file.read())
+    if grid_filepath is not None and Path(grid_filepath).exists():
+        with open(grid_filepath, "rb") as file:
+            sha1.update(file.read())
+    return sha1.hexdigest()
+
+
+def derive_columns(df: pd.DataFrame, metrics: List[str]) -> pd.DataFrame:
+    """Derive the normalized metrics and the indices from the metrics.
+
+    Args:
+        df (pd.DataFrame): Supply and demand metrics of each area (IRIS or
+            coarser), without missing values.
+        metrics (List[str]): Metrics to normalize by the number of parking
+            spots.
+
+    Returns:
+        pd.DataFrame: df with the "<metric>_normalized" columns, and the
+            "demand_index", "supply_index" and "demand_supply_index".
+    """
+    # Create normalized columns
+    # Note: adding +1 to the denominator to avoid dividing by 0
+    df = df.assign(
+        **{
+            (col + "_normalized"): (df.loc[:, col] / (df["nb_parking_spots"] + 1))
+            for col in metrics
+        }
+    )
+    # Create scaled columns
+    return df.join(
+        create_parking_index(df)
+        .loc[:, ["parking_index", "parking_normalized"]]
+        .rename(
+            columns={
+                "parking_index": "demand_index",
+                "parking_normalized": "supply_index",
+            }
+        )
+        .assign(demand_supply_index=lambda x: x["demand_index"] / x["supply_index"])
+    )
+
+
+def build_serving_table(df_feature: pd.DataFrame) -> pd.DataFrame:
+    """Derive all the columns the dash application can plot.
+
+    Args:
+        df_feature (pd.DataFrame): Feature table, indexed by IRIS.
+
+    Returns:
+        pd.DataFrame: Serving table, with an "iris" column, and the
+            "quartier" and "arrondissement" of each IRIS.
+    """
+    df = df_feature.copy()
+    df.insert(0, "iris", df.index)
+    # Aggregate nb of parking spots into a single series
+    df["nb_parking_spots"] += df["nb_parking_spots_idfm"].fillna(0)
+    # Drop the parking spots columns
+    df.drop(columns=["nb_parking_spots_idfm"], inplace=True)
+    # Impute missing values with 0
+    df.fillna(0, inplace=True)
+    df = derive_columns(df, list(df.columns.drop(["geometry", "iris"])))
+    # Add the districts of the IRIS, to filter and aggregate them
+    df = df.join(locate_districts(df.geometry))
+    return df
+
+
+def build_map_figures(
+    df: pd.DataFrame, geometry: dict, location_col: str = "iris"
+) -> dict:
+    """Create the maps of all the columns that can be selected.
+
+    The maps only differ by the MAP_TRACE_PROPS of their trace and their color
+    axis, so only one whole figure is kept.
+
+    Args:
+        df (pd.DataFrame): Serving table, or a table of a coarser level.
+        geometry (dict): Simplified geometry, as returned by simplify_geometry.
+        location_col (str, optional): Column with the id of each area in the
+            geometry. Defaults to "iris".
+
+    Returns:
+        dict: Base figure (incl. geometry, JSON compatible), and the trace
+            properties and color axis of each column that can be selected.
+    """
+    from plotly.utils import PlotlyJSONEncoder
+
+    from paris_bikes.mapping import create_map
+
+    figure = None
+    columns = {}
+    for selection in get_selections():
+        col, colorscale = select_column(*selection)
+        fig = create_map(
+            df,
+            col,
+            width=None,
+            height=None,
+            colorscale=colorscale,
+            geojson=geometry,
+            location_col=location_col,
+        )
+        # Remove legend title
+        fig.update_layout(coloraxis_colorbar={"title": ""})
+        # Convert arrays to lists, and non finite values to null
+        fig = json.loads(json.dumps(fig.to_dict(), cls=PlotlyJSONEncoder))
+        if figure is None:
+            figure = fig
+        columns[col] = {prop: fig["data"][0][prop] for prop in MAP_TRACE_PROPS}
+        columns[col]["coloraxis"] = fig["layout"]["coloraxis"]
+    return {"figure": figure, "columns": columns}
+
+
+def get_map_figure(map_figures: dict, col: str) -> dict:
+    """Get the map of a column from the maps of build_map_figures.
+
+    Args:
+        map_figures (dict): Maps of all the columns, from build_map_figures.
+        col (str): Column to plot.
+
+    Returns:
+        dict: Figure of the map. Only its trace and layout are new objects,
+            the rest is shared with map_figures.
+    """
+    figure = map_figures["figure"]
+    column = map_figures["columns"][col]
+    return {
+        **figure,
+        "data": [
+            {**figure["data"][0], **{prop: column[prop] for prop in MAP_TRACE_PROPS}}
+        ],
+        "layout": {**figure["layout"], "coloraxis": column["coloraxis"]},
+    }
+
+
+def build_snapshot(
+    feature_filepath: Path = FEATURE_FILEPATH, grid_filepath: Path = GRID_FILEPATH
+) -> ServingSnapshot:
+    """Build the serving snapshot from the feature table and the grid table.
+
+    Args:
+        feature_filepath (Path, optional): Location of the feature table (in
+            GeoParquet, or in a legacy format). Defaults to FEATURE_FILEPATH.
+        grid_filepath (Path, optional): Location of the grid table. If it does
+            not exist, the snapshot has no hexagon levels. Defaults to
+            GRID_FILEPATH.
+
+    Returns:
+        ServingSnapshot: Serving snapshot.
+    """
+    from paris_bikes.geometry import simplify_geometry
+    from paris_bikes.hexgrid import build_cell_geometry, roll_up_grid
+    from paris_bikes.hierarchy import LEVELS, Hierarchy, get_area_names
+
+    feature_filepath = find_dataset(feature_filepath)
+    df = build_serving_table(read_dataset(feature_filepath))
+    tables = Hierarchy(df).roll_up(df)
+
+    geometry_levels, map_figures = {}, {}
+    for level in LEVELS:
+        if level == "iris":
+            geometry = df.geometry
+        else:
+            # Merge the IRIS of each area
+            geometry = df[["geometry", level]].dissolve(by=level).geometry
+            geometry.index = get_area_names(level, geometry.index)
+        # Simplify the geometry once, instead of sending it at full precision
+        # on every map update
+        geometry_levels[level] = simplify_geometry(geometry)
+        map_figures[level] = build_map_figures(
+            pd.DataFrame(tables[level].drop(columns="geometry", errors="ignore")),
+            geometry_levels[level],
+            location_col=level,
+        )
+
+    # Add the levels of the hexagonal grid, if the pipelines built it
+    grid = None
+    if Path(grid_filepath).exists():
+        grid = read_dataset(grid_filepath)
+        for level, table in roll_up_grid(grid).items():
+            geometry_levels[level] = build_cell_geometry(table["cell"], table.index)
+            map_figures[level] = build_map_figures(
+                table, geometry_levels[level], location_col=level
+            )
+
+    return ServingSnapshot(
+        pd.DataFrame(df.drop(columns="geometry")),
+        geometry_levels,
+        map_figures,
+        get_dataset_version(feature_filepath, grid_filepath),
+        grid,
+    )
+
+
+def _align(offset: int) -> int:
+    """Round an offset up to the alignment of the data sections."""
+    return -(-offset // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+
+
+def write_snapshot(snapshot: ServingSnapshot, filepath: Path = SNAPSHOT_FILEPATH):
+    """Save a serving snapshot to a single file.
+
+    The file starts with SNAPSHOT_MAGIC, the format version and the length of
+    a JSON header (index, columns, dtypes, location of the data sections). The
+    float64 columns follow as one matrix, which can be memory-mapped, then the
+    other columns (e.g. integer counts and districts), the geometry levels, the
+    maps and the grid table (by column), already encoded as JSON. The file is
+    written to a temporary file first, so readers never see a partial
+    snapshot.
+
+    Args:
+        snapshot (ServingSnapshot): Serving snapshot.
+        filepath (Path, optional): Location of the snapshot. Defaults to
+            SNAPSHOT_FILEPATH.
+    """
+    df = snapshot.df.drop(columns="iris")
+    float_columns = [col for col, dtype in df.dtypes.items() if dtype == "float64"]
+    matrix = np.ascontiguousarray(df[float_columns].to_numpy(dtype="<f8"))
+    sections = {
+        # Nullable columns (e.g. Int64) are stored with null for missing values
+        "other_columns": json.dumps(
+            {
+                col: values.astype(object).where(values.notna(), None).tolist()
+                for col, values in df.drop(columns=float_columns).items()
+            }
+        ).encode(),
+        "geometry_levels": json.dumps(snapshot.geometry_levels).encode(),
+        "map_figures": json.dumps(snapshot.map_figures).encode(),
+    }
+    if snapshot.grid is not None:
+        sections["grid"] = json.dumps(
+            {
+                "index": snapshot.grid.index.tolist(),
+                "columns": {
+                    col: values.tolist() for col, values in snapshot.grid.items()
+                },
+            }
+        ).encode()
+    # Location of each section, from the start of the data
+    offset = _align(matrix.nbytes)
+    section_offsets = {}
+    for name, section in sections.items():
+        section_offsets[name] = [offset, len(section)]
+        offset = _align(offset + len(section))
+
+    header = json.dumps(
+        {
+            "dataset_version": snapshot.dataset_version,
+            "index": df.index.tolist(),
+            "index_name": df.index.name,
+            "columns": df.columns.tolist(),
+            "dtypes": [str(dtype) for dtype in df.dtypes],
+            "float_columns": float_columns,
+            "matrix_shape": list(matrix.shape),
+            "sections": section_offsets,
+        }
+    ).encode()
+    prefix = SNAPSHOT_MAGIC + struct.pack("<HQ", SNAPSHOT_FORMAT_VERSION, len(header))
+    data_offset = _align(len(prefix) + len(header))
+
+    filepath = Path(filepath)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    tmp_filepath = filepath.with_name(f".{filepath.name}.{os.getpid()}.tmp")
+    with open(tmp_filepath, "wb") as file:
+        file.write(prefix + header)
+        file.write(b"\0" * (data_offset - file.tell()))
+        file.write(matrix.tobytes())
+        for name, section in sections.items():
+            file.write(b"\0" * (data_offset + section_offsets[name][0] - file.tell()))
+            file.write(section)
+    os.replace(tmp_filepath, filepath)
+
+
+def read_snapshot(
+    filepath: Path = SNAPSHOT_FILEPATH, mmap: bool = True
+) -> ServingSnapshot:
+    """Read a serving snapshot saved with write_snapshot.
+
+    Args:
+        filepath (Path, optional): Location of the snapshot. Defaults to
+            SNAPSHOT_FILEPATH.
+        mmap (bool, optional): Memory-map the float columns instead of reading
+            them, so that processes reading the same snapshot share its pages.
+            Defaults to True.
+
+    Raises:
+        ValueError: If the file is not a snapshot in the current format.
+
+    Returns:
+        ServingSnapshot: Serving snapshot.
+    """
+    with open(filepath, "rb") as file:
+        prefix_length = len(SNAPSHOT_MAGIC) + struct.calcsize("<HQ")
+        prefix = file.read(prefix_length)
+        if not prefix.startswith(SNAPSHOT_MAGIC):
+            raise ValueError(f"{filepath} is not a serving snapshot.")
+        version, header_length = struct.unpack("<HQ", prefix[len(SNAPSHOT_MAGIC) :])
+        if version != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(
+                f"Serving snapshot {filepath} has format version {version}, "
+                f"expected {SNAPSHOT_FORMAT_VERSION}."
+            )
+        header = json.loads(file.read(header_length))
+        data_offset = _align(prefix_length + header_length)
+
+        shape = tuple(header["matrix_shape"])
+        if mmap and shape[0] * shape[1] > 0:
+            matrix = np.memmap(
+                filepath, dtype="<f8", mode="r", offset=data_offset, shape=shape
+            )
+        else:
+            file.seek(data_offset)
+            matrix = np.fromfile(file, dtype="<f8", count=shape[0] * shape[1])
+            matrix = matrix.reshape(shape)
+
+        sections = {}
+        for name, (offset, length) in header["sections"].items():
+            file.seek(data_offset + offset)
+            sections[name] = json.loads(file.read(length))
+
+    index = pd.Index(header["index"], name=header["index_name"])
+    # The float columns are a view of the matrix, so that a memory-mapped
+    # matrix is never copied. The other columns are inserted one by one,
+    # which leaves the block of the float columns as is.
+    df = pd.DataFrame(matrix, index=index, columns=header["float_columns"], copy=False)
+    for loc, (col, dtype) in enumerate(zip(header["columns"], header["dtypes"])):
+        if col not in header["float_columns"]:
+            values = pd.array(sections["other_columns"][col], dtype=dtype)
+            df.insert(loc, col, values)
+    df.insert(0, "iris", df.index)
+
+    grid = None
+    if "grid" in sections:
+        grid = pd.DataFrame(
+            sections["grid"]["columns"],
+            index=pd.Index(sections["grid"]["index"], dtype="int64", name="cell"),
+        )
+
+    return ServingSnapshot(
+        df,
+        sections["geometry_levels"],
+        sections["map_figures"],
+        header["dataset_version"],
+        grid,
+    )
+
+
+def is_memory_mapped(values: np.ndarray) -> bool:
+    """Check whether an array is a view of a memory-mapped file.
+
+    Args:
+        values (np.ndarray): Array, e.g. a column of the serving table.
+
+    Returns:
+        bool: Whether the array (or an array it is a view of) is a np.memmap.
+    """
+    while values is not None:
+        if isinstance(values, np.memmap):
+            return True
+        values = getattr(values, "base", None)
+    return False
+
+
+def load_snapshot(
+    feature_filepath: Path = FEATURE_FILEPATH,
+    snapshot_filepath: Path = SNAPSHOT_FILEPATH,
+    mmap: bool = True,
+    fast_boot: bool = False,
+    grid_filepath: Path = GRID_FILEPATH,
+) -> ServingSnapshot:
+    """Load the serving snapshot, or build it if it is missing or outdated.
+
+    Building the snapshot imports the geospatial stack (geopandas, shapely,
+    plotly express). A built snapshot is saved (see write_snapshot, which
+    replaces the file atomically), so that the next processes only read it. In
+    fast-boot mode, the snapshot is read as is, without checking it against
+    the feature table, and it is never built.
+
+    Args:
+        feature_filepath (Path, optional): Location of the feature table.
+            Defaults to FEATURE_FILEPATH.
+        snapshot_filepath (Path, optional): Location of the snapshot. Defaults
+            to SNAPSHOT_FILEPATH.
+        mmap (bool, optional): Memory-map the float columns of the snapshot.
+            Defaults to True.
+        fast_boot (bool, optional): Only read the snapshot. Defaults to False.
+        grid_filepath (Path, optional): Location of the grid table. Defaults
+            to GRID_FILEPATH.
+
+    Raises:
+        FileNotFoundError: In fast-boot mode, if the snapshot is missing.
+        ValueError: In fast-boot mode, if the snapshot cannot be read.
+
+    Returns:
+        ServingSnapshot: Serving snapshot.
+    """
+    if fast_boot:
+        if not Path(snapshot_filepath).exists():
+            raise FileNotFoundError(
+                f"Serving snapshot {snapshot_filepath} not found. "
+                "Build it with `python -m paris_bikes.serving`."
+            )
+        return read_snapshot(snapshot_filepath, mmap)
+
+    feature_filepath = find_dataset(feature_filepath)
+    if Path(snapshot_filepath).exists():
+        try:
+            snapshot = read_snapshot(snapshot_filepath, mmap)
+        except ValueError as error:
+            print(f"{error} Building it from the feature table.")
+        else:
+            if snapshot.dataset_version == get_dataset_version(
+                feature_filepath, grid_filepath
+            ):
+                return snapshot
+            print("Serving snapshot is outdated. Building it from the feature table.")
+    snapshot = build_snapshot(feature_filepath, grid_filepath)
+    try:
+        write_snapshot(snapshot, snapshot_filepath)
+    except OSError as error:
+        print(f"Could not save the serving snapshot: {error}")
+        return snapshot
+    # Read the saved snapshot back, to memory-map it like the next processes
+    return read_snapshot(snapshot_filepath, mmap)
+
+
+if __name__ == "__main__":
+    write_snapshot(build_snapshot())
+    print(f"Serving snapshot saved to {SNAPSHOT_FILEPATH}.")
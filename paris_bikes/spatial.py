@@ -0,0 +1,158 @@
+from typing import Dict, Iterable, Union
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+# Column of the IRIS table with the INSEE code of each IRIS, used to assign
+# rows that already have an IRIS code without any spatial query
+IRIS_CODE_COLUMN = "iris_code"
+
+
+def normalize_iris_codes(codes: Iterable) -> pd.Series:
+    """Normalize IRIS codes, given as numbers or strings, to compare them.
+
+    Args:
+        codes (Iterable): IRIS codes (e.g. "751010101" or 751010101).
+
+    Returns:
+        pd.Series: Codes as integers (missing if not a valid code).
+    """
+    return pd.to_numeric(pd.Series(codes), errors="coerce").round().astype("Int64")
+
+
+class IrisLocator:
+    """Find the IRIS containing points, with a spatial index built only once.
+
+    Points on the border between two IRIS are assigned to only one of them.
+    If the IRIS have a code (IRIS_CODE_COLUMN), rows can also be assigned to
+    the IRIS of their code (see locate_codes).
+
+    Args:
+        df_iris (gpd.GeoDataFrame): Location of all IRIS within the city,
+            indexed by IRIS (e.g. the output of get_population_per_iris).
+    """
+
+    def __init__(self, df_iris: gpd.GeoDataFrame):
+        self.iris = df_iris.index.to_numpy()
+        self.crs = df_iris.crs
+        self.geometry = df_iris.geometry.values.data
+        self.tree = shapely.STRtree(self.geometry)
+        # Prepare the IRIS, to test many points against them faster
+        shapely.prepare(self.geometry)
+
+        # IRIS of each code (codes shared by several IRIS are ignored)
+        if IRIS_CODE_COLUMN in df_iris.columns:
+            codes = normalize_iris_codes(df_iris[IRIS_CODE_COLUMN].to_numpy())
+        else:
+            codes = pd.Series(pd.NA, index=range(len(self.iris)), dtype="Int64")
+        iris_per_code = pd.Series(self.iris, index=codes.to_numpy(), dtype=object)
+        self.iris_per_code = iris_per_code.loc[
+            iris_per_code.index.notna() & ~iris_per_code.index.duplicated(keep=False)
+        ]
+
+    def locate_codes(self, codes: Iterable) -> np.ndarray:
+        """Find the IRIS of IRIS codes.
+
+        Args:
+            codes (Iterable): IRIS codes (numbers or strings).
+
+        Returns:
+            np.ndarray: IRIS of each code, or None if the code is not the code
+                of a single IRIS.
+        """
+        iris = normalize_iris_codes(codes).map(self.iris_per_code)
+        return iris.astype(object).where(iris.notna(), None).to_numpy()
+
+    def locate_points(self, points: np.ndarray) -> np.ndarray:
+        """Find the IRIS of an array of points.
+
+        Args:
+            points (np.ndarray): Array of shapely points (missing or empty
+                points are allowed), in the CRS of the IRIS.
+
+        Returns:
+            np.ndarray: IRIS of each point, or None if the point is not in any
+                IRIS.
+        """
+        # Query the bounding boxes, then test the candidates against the
+        # prepared IRIS (faster than a query with a predicate)
+        point_idx, iris_idx = self.tree.query(points)
+        intersects = shapely.intersects(self.geometry[iris_idx], points[point_idx])
+        point_idx, iris_idx = point_idx[intersects], iris_idx[intersects]
+
+        # Keep only one IRIS per point
+        point_idx, first = np.unique(point_idx, return_index=True)
+
+        iris = np.full(len(points), None, dtype=object)
+        iris[point_idx] = self.iris[iris_idx[first]]
+        return iris
+
+    def locate_xy(self, x: Iterable[float], y: Iterable[float]) -> np.ndarray:
+        """Find the IRIS of points given by their coordinates.
+
+        Args:
+            x (Iterable[float]): Longitudes (or x in the CRS of the IRIS).
+            y (Iterable[float]): Latitudes (or y in the CRS of the IRIS).
+
+        Returns:
+            np.ndarray: IRIS of each point, or None if the point is not in any
+                IRIS.
+        """
+        return self.locate_points(shapely.points(np.asarray(x), np.asarray(y)))
+
+    def locate(self, geometry: gpd.GeoSeries) -> pd.Series:
+        """Find the IRIS of a series of points.
+
+        Args:
+            geometry (gpd.GeoSeries): Points, reprojected to the CRS of the
+                IRIS if needed.
+
+        Returns:
+            pd.Series: IRIS of each point (None if not in any IRIS), with the
+                index of geometry.
+        """
+        return self.locate_many({"": geometry})[""]
+
+    def locate_many(self, layers: Dict[str, gpd.GeoSeries]) -> Dict[str, pd.Series]:
+        """Find the IRIS of the points of several layers in one bulk query.
+
+        Args:
+            layers (Dict[str, gpd.GeoSeries]): Points of each layer.
+
+        Returns:
+            Dict[str, pd.Series]: IRIS of each point of each layer (None if
+                not in any IRIS), with the index of the layer.
+        """
+        arrays = []
+        for geometry in layers.values():
+            if self.crs is not None and geometry.crs not in (None, self.crs):
+                geometry = geometry.to_crs(self.crs)
+            arrays.append(geometry.values.data)
+
+        iris = self.locate_points(np.concatenate(arrays) if arrays else np.array([]))
+
+        located = {}
+        start = 0
+        for (name, geometry), array in zip(layers.items(), arrays):
+            located[name] = pd.Series(
+                iris[start : start + len(array)], index=geometry.index, name="iris"
+            )
+            start += len(array)
+        return located
+
+
+def as_iris_locator(df_iris: Union[gpd.GeoDataFrame, IrisLocator]) -> IrisLocator:
+    """Get an IrisLocator, building it only if needed.
+
+    Args:
+        df_iris (Union[gpd.GeoDataFrame, IrisLocator]): Location of all IRIS,
+            or an already built IrisLocator.
+
+    Returns:
+        IrisLocator: Locator of the IRIS.
+    """
+    if isinstance(df_iris, IrisLocator):
+        return df_iris
+    return IrisLocator(df_iris)
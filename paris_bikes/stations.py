@@ -0,0 +1,240 @@
+import re
+import unicodedata
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, Tuple, Union
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+# Minimum similarity (between 0 and 1) for a station name to be resolved.
+# Names sharing a long prefix (e.g. "Porte de Clichy" and "Porte de
+# Clignancourt") are about 0.6 similar, so they must not be matched.
+MIN_SCORE = 0.8
+
+# Minimum difference of similarity between the most similar station and the
+# second one for a station name to be resolved (ambiguous names are geocoded)
+MIN_MARGIN = 0.1
+
+# Abbreviations expanded before matching station names
+ABBREVIATIONS = {"st": "saint", "ste": "sainte", "pte": "porte", "pl": "place"}
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a station name for matching.
+
+    Args:
+        name (str): Station name.
+
+    Returns:
+        str: Name without accents, in lowercase, with punctuation replaced by
+            spaces and abbreviations expanded.
+    """
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    words = re.sub(r"[^a-z0-9]+", " ", name.lower()).split()
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words)
+
+
+def get_ngrams(name: str, n: int = 3) -> set:
+    """Get the set of character n-grams of a normalized name.
+
+    Args:
+        name (str): Normalized name.
+        n (int, optional): Length of the n-grams. Defaults to 3.
+
+    Returns:
+        set: n-grams of the name, padded with spaces.
+    """
+    padded = f" {name} "
+    return {padded[i : i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+class StationResolver:
+    """Resolve station names to coordinates, using a local reference table.
+
+    Names are matched without accents and case, with an n-gram index: the
+    similarity of two names is the Dice coefficient of their n-gram sets.
+
+    Args:
+        names (Iterable[str]): Names of the reference stations.
+        longitudes (Iterable[float]): Longitudes of the reference stations.
+        latitudes (Iterable[float]): Latitudes of the reference stations.
+        n (int, optional): Length of the n-grams. Defaults to 3.
+    """
+
+    def __init__(
+        self,
+        names: Iterable[str],
+        longitudes: Iterable[float],
+        latitudes: Iterable[float],
+        n: int = 3,
+    ):
+        # Stations with the same normalized name (e.g. one stop per platform)
+        # are merged at their mean location
+        df_stations = (
+            pd.DataFrame(
+                {
+                    "name": [normalize_name(name) for name in names],
+                    "longitude": longitudes,
+                    "latitude": latitudes,
+                }
+            )
+            .groupby("name")
+            .mean()
+        )
+        self.n = n
+        self.names = df_stations.index.to_numpy()
+        self.longitudes = df_stations["longitude"].to_numpy()
+        self.latitudes = df_stations["latitude"].to_numpy()
+        self._ids = {name: idx for idx, name in enumerate(self.names)}
+
+        # Index of the stations containing each n-gram
+        index = defaultdict(list)
+        self._nb_ngrams = np.zeros(len(self.names))
+        for idx, name in enumerate(self.names):
+            ngrams = get_ngrams(name, n)
+            self._nb_ngrams[idx] = len(ngrams)
+            for ngram in ngrams:
+                index[ngram].append(idx)
+        self._index = {ngram: np.array(ids) for ngram, ids in index.items()}
+
+    @classmethod
+    def from_gtfs_stops(cls, filepath: Union[str, Path]) -> "StationResolver":
+        """Create a resolver from the stops.txt file of a GTFS feed.
+
+        Args:
+            filepath (Union[str, Path]): Location of stops.txt.
+
+        Returns:
+            StationResolver: Resolver of the stops (only the stations, if the
+                feed distinguishes them from their platforms).
+        """
+        df_stops = pd.read_csv(filepath, dtype={"location_type": "Int64"})
+        if "location_type" in df_stops.columns:
+            df_stations = df_stops.loc[df_stops["location_type"] == 1]
+            if not df_stations.empty:
+                df_stops = df_stations
+        return cls(df_stops["stop_name"], df_stops["stop_lon"], df_stops["stop_lat"])
+
+    @classmethod
+    def from_idfm_parking(cls, df_idfm_raw: pd.DataFrame) -> "StationResolver":
+        """Create a resolver from the IDFM parking data, which includes the
+        name and location of the stations with a parking facility.
+
+        Args:
+            df_idfm_raw (pd.DataFrame): Raw IDFM parking data.
+
+        Returns:
+            StationResolver: Resolver of the stations.
+        """
+        return cls(df_idfm_raw["zdcname"], df_idfm_raw["x_long"], df_idfm_raw["y_lat"])
+
+    def resolve(self, name: str) -> Tuple[int, float, float]:
+        """Find the reference station most similar to a name.
+
+        Args:
+            name (str): Station name.
+
+        Returns:
+            Tuple[int, float, float]: Position of the most similar station in
+                the reference table (-1 if none shares an n-gram), its
+                similarity, and the similarity of the second most similar
+                station (0 for an exact match), between 0 and 1.
+        """
+        normalized = normalize_name(name)
+        if normalized in self._ids:
+            return self._ids[normalized], 1.0, 0.0
+
+        ngrams = get_ngrams(normalized, self.n)
+        hits = [self._index[ngram] for ngram in ngrams if ngram in self._index]
+        if not hits:
+            return -1, 0.0, 0.0
+
+        # Only score the stations sharing at least one n-gram
+        candidates, nb_shared = np.unique(np.concatenate(hits), return_counts=True)
+        scores = 2 * nb_shared / (len(ngrams) + self._nb_ngrams[candidates])
+        best = int(scores.argmax())
+        second = float(np.delete(scores, best).max()) if len(scores) > 1 else 0.0
+        return int(candidates[best]), float(scores[best]), second
+
+    def resolve_many(
+        self,
+        names: Iterable[str],
+        min_score: float = MIN_SCORE,
+        min_margin: float = MIN_MARGIN,
+    ) -> pd.DataFrame:
+        """Find the reference stations most similar to many names.
+
+        Args:
+            names (Iterable[str]): Station names.
+            min_score (float, optional): Minimum similarity for a name to be
+                resolved. Defaults to MIN_SCORE.
+            min_margin (float, optional): Minimum difference of similarity
+                with the second most similar station for a name to be
+                resolved. Defaults to MIN_MARGIN.
+
+        Returns:
+            pd.DataFrame: For each name, the matched reference station (None if
+                not resolved), the similarity, and the longitude and latitude
+                (NaN if not resolved).
+        """
+        names = list(names)
+        ids, scores, seconds = zip(*map(self.resolve, names)) if names else [()] * 3
+        ids = np.array(ids, dtype=int)
+        scores = np.array(scores, dtype=float)
+        seconds = np.array(seconds, dtype=float)
+        resolved = (ids >= 0) & (scores >= min_score) & (scores - seconds >= min_margin)
+
+        # Only index the reference table with the resolved stations (ids may be
+        # -1, and the table may be empty)
+        match = np.full(len(names), None, dtype=object)
+        longitude = np.full(len(names), np.nan)
+        latitude = np.full(len(names), np.nan)
+        match[resolved] = self.names[ids[resolved]]
+        longitude[resolved] = self.longitudes[ids[resolved]]
+        latitude[resolved] = self.latitudes[ids[resolved]]
+
+        return pd.DataFrame(
+            {
+                "name": names,
+                "match": match,
+                "score": scores,
+                "longitude": longitude,
+                "latitude": latitude,
+            }
+        )
+
+
+def locate_stations(
+    df_in: pd.DataFrame,
+    station_column: str,
+    resolver: StationResolver,
+    min_score: float = MIN_SCORE,
+    min_margin: float = MIN_MARGIN,
+) -> gpd.GeoDataFrame:
+    """Locate stations based on a column with their names.
+
+    Args:
+        df_in (pd.DataFrame): Dataframe with station names to be located.
+        station_column (str): Name of the column with the station names.
+        resolver (StationResolver): Resolver of the station names.
+        min_score (float, optional): Minimum similarity for a name to be
+            resolved. Defaults to MIN_SCORE.
+        min_margin (float, optional): Minimum difference of similarity with the
+            second most similar station for a name to be resolved. Defaults to
+            MIN_MARGIN.
+
+    Returns:
+        gpd.GeoDataFrame: Dataframe with located stations (stations that could
+            not be resolved have no geometry).
+    """
+    df_resolved = resolver.resolve_many(df_in[station_column], min_score, min_margin)
+    unresolved = df_resolved["match"].isna().to_numpy()
+    print(f"{(1 - unresolved.mean()) * 100}% of stations were resolved!")
+
+    geometry = gpd.points_from_xy(df_resolved["longitude"], df_resolved["latitude"])
+    geometry[unresolved] = None
+
+    return gpd.GeoDataFrame(df_in, geometry=geometry, crs="EPSG:4326")
@@ -0,0 +1,114 @@
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Sequence, Union
+
+import pandas as pd
+
+# geopandas and pyarrow are imported when they are needed, so that the serving
+# process can import this module without them
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+# Extensions of the formats datasets were saved in before GeoParquet, looked
+# for when a GeoParquet file is missing
+LEGACY_SUFFIXES = (".geojson", ".csv")
+
+
+def find_dataset(filepath: Path) -> Path:
+    """Find the file of a dataset, in GeoParquet or in a legacy format.
+
+    Args:
+        filepath (Path): Location of the GeoParquet file of the dataset.
+
+    Raises:
+        FileNotFoundError: If the dataset is not saved in any format.
+
+    Returns:
+        Path: Location of the file of the dataset.
+    """
+    filepath = Path(filepath)
+    for candidate in [
+        filepath,
+        *(filepath.with_suffix(suffix) for suffix in LEGACY_SUFFIXES),
+    ]:
+        if candidate.exists():
+            return candidate
+    raise FileNotFoundError(f"Dataset {filepath} not found.")
+
+
+def write_dataset(df: Union[pd.DataFrame, "gpd.GeoDataFrame"], filepath: Path):
+    """Save a dataset to GeoParquet (or Parquet if it has no geometry).
+
+    The index and the dtypes of the columns are saved with the data, and
+    geometries are encoded as WKB.
+
+    Args:
+        df (Union[pd.DataFrame, gpd.GeoDataFrame]): Dataset.
+        filepath (Path): Location of the GeoParquet file.
+
+    Raises:
+        ValueError: If the dataset is not a DataFrame.
+    """
+    if not isinstance(df, pd.DataFrame):
+        raise ValueError(f"Datatype {type(df)} of {filepath} is not recognized.")
+    Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(filepath)
+
+
+def read_dataset(
+    filepath: Path, columns: Optional[Sequence[str]] = None
+) -> Union[pd.DataFrame, "gpd.GeoDataFrame"]:
+    """Read a dataset saved with write_dataset.
+
+    If there is no GeoParquet file, the dataset is read from a GeoJSON or CSV
+    file with the same name, indexed by its "iris" column if it has one.
+
+    Args:
+        filepath (Path): Location of the GeoParquet file.
+        columns (Sequence[str], optional): Columns to read. If None, all
+            columns are read. Defaults to None.
+
+    Returns:
+        Union[pd.DataFrame, gpd.GeoDataFrame]: Dataset, as a GeoDataFrame if
+            it has a geometry column among the columns read.
+    """
+    filepath = find_dataset(filepath)
+    columns = None if columns is None else list(columns)
+
+    if filepath.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        # Only read a GeoDataFrame if the geometry column is read
+        metadata = pq.read_schema(filepath).metadata or {}
+        geometry_column = None
+        if b"geo" in metadata:
+            geometry_column = json.loads(metadata[b"geo"])["primary_column"]
+        if geometry_column is not None and (
+            columns is None or geometry_column in columns
+        ):
+            import geopandas as gpd
+
+            return gpd.read_parquet(filepath, columns=columns)
+        return pd.read_parquet(filepath, columns=columns)
+
+    if filepath.suffix == ".geojson":
+        import geopandas as gpd
+
+        df = gpd.read_file(filepath)
+    else:
+        df = pd.read_csv(filepath)
+    if "iris" in df.columns:
+        df = df.set_index("iris")
+    if columns is not None:
+        df = df[columns]
+    return df
+
+
+def export_geojson(df: "gpd.GeoDataFrame", filepath: Path):
+    """Export a dataset to GeoJSON, e.g. to share it outside the pipelines.
+
+    Args:
+        df (gpd.GeoDataFrame): Dataset, its index is saved as a column.
+        filepath (Path): Location of the GeoJSON file.
+    """
+    df.to_file(filepath, driver="GeoJSON")
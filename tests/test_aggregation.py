@@ -0,0 +1,62 @@
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+from paris_bikes.aggregation import LayerSpec, aggregate_per_iris
+from paris_bikes.spatial import IRIS_CODE_COLUMN, IrisLocator
+
+
+def get_iris(codes=True):
+    df_iris = gpd.GeoDataFrame(
+        {"nb_pop": [10, 20]},
+        index=pd.Index(["a", "b"], name="iris"),
+        geometry=[shapely.box(0, 0, 1, 1), shapely.box(1, 0, 2, 1)],
+    )
+    if codes:
+        df_iris[IRIS_CODE_COLUMN] = ["751010101", "751010102"]
+    return df_iris
+
+
+# Shops whose code disagrees with their location, or that have no code
+SHOPS = gpd.GeoDataFrame(
+    {
+        "IRIS": ["751010102", 751010101, None, "999999999"],
+        "size": [1, 2, 4, 8],
+    },
+    geometry=[
+        shapely.Point(0.5, 0.5),
+        shapely.Point(0.5, 0.5),
+        shapely.Point(1.5, 0.5),
+        shapely.Point(0.5, 0.5),
+    ],
+)
+
+LAYER = LayerSpec(
+    name="shops",
+    source="shops",
+    values={"size": "size"},
+    columns=("IRIS", "size", "geometry"),
+    key_column="IRIS",
+)
+
+
+def test_rows_are_joined_on_their_code_or_else_located():
+    aggregated = aggregate_per_iris([LAYER], {"shops": SHOPS}, get_iris())["shops"]
+
+    # The first shop has the code of b, the last ones are located
+    assert aggregated["size"].to_dict() == {"a": 2 + 8, "b": 1 + 4}
+
+
+def test_rows_are_located_without_iris_codes():
+    df_iris = get_iris(codes=False)
+
+    aggregated = aggregate_per_iris([LAYER], {"shops": SHOPS}, df_iris)["shops"]
+
+    assert aggregated["size"].to_dict() == {"a": 1 + 2 + 8, "b": 4}
+
+
+def test_codes_shared_by_several_iris_are_ignored():
+    df_iris = get_iris()
+    df_iris[IRIS_CODE_COLUMN] = "751010101"
+
+    assert IrisLocator(df_iris).locate_codes(["751010101"]).tolist() == [None]
@@ -0,0 +1,65 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from paris_bikes.aggregation import get_population_per_cell
+from paris_bikes.hexgrid import (
+    GRID_ORIGIN,
+    HEX_LEVELS,
+    HEX_SIZES,
+    get_area_weights,
+    get_parents,
+    roll_up_grid,
+)
+from paris_bikes.hierarchy import ROLL_UP_COLUMNS
+
+# IRIS of a few hundred meters to a few kilometers around the grid origin
+LON, LAT = GRID_ORIGIN
+IRIS = gpd.GeoDataFrame(
+    {"nb_pop": [1000.0, 2500.0, 40.0, 0.0]},
+    index=pd.Index(["a", "b", "c", "d"], name="iris"),
+    geometry=[
+        shapely.box(LON - 0.03, LAT - 0.02, LON, LAT),
+        shapely.box(LON, LAT - 0.02, LON + 0.01, LAT + 0.01),
+        shapely.box(LON - 0.001, LAT + 0.011, LON + 0.001, LAT + 0.012),
+        shapely.box(LON + 0.02, LAT, LON + 0.03, LAT + 0.01),
+    ],
+    crs="EPSG:4326",
+)
+
+
+@pytest.mark.parametrize("resolution", range(len(HEX_SIZES)))
+def test_area_weights_of_each_iris_sum_to_one(resolution):
+    weights = get_area_weights(IRIS.geometry, resolution)
+
+    sums = weights.groupby("iris")["weight"].sum()
+    assert sums.to_dict() == pytest.approx({iris: 1 for iris in IRIS.index})
+
+
+@pytest.mark.parametrize("resolution", range(len(HEX_SIZES)))
+def test_redistribution_conserves_the_population(resolution):
+    df_population = get_population_per_cell(IRIS, resolution)
+
+    assert df_population["nb_pop"].sum() == pytest.approx(IRIS["nb_pop"].sum())
+    assert df_population.index.is_unique
+
+
+def test_roll_up_conserves_the_population():
+    df_population = get_population_per_cell(IRIS)
+    grid = pd.DataFrame(0.0, index=df_population.index, columns=ROLL_UP_COLUMNS)
+    grid["nb_pop"] = df_population["nb_pop"]
+    grid["nb_parking_spots"] = 1.0
+    grid["nb_parking_spots_idfm"] = 2.0
+
+    tables = roll_up_grid(grid)
+
+    assert list(tables) == HEX_LEVELS
+    for level in HEX_LEVELS:
+        table = tables[level]
+        assert table["nb_pop"].sum() == pytest.approx(IRIS["nb_pop"].sum())
+        assert table["nb_parking_spots"].sum() == 3 * len(grid)
+    # Each coarser cell is the parent of the cells of the finer level
+    parents = get_parents(tables[HEX_LEVELS[0]]["cell"].to_numpy(), 1)
+    assert set(parents) == set(tables[HEX_LEVELS[1]]["cell"])
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from paris_bikes.hierarchy import LEVELS, ROLL_UP_COLUMNS, Hierarchy, Membership
+
+
+def get_serving(n_iris=300, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        rng.integers(0, 1000, (n_iris, len(ROLL_UP_COLUMNS))).astype(float),
+        index=pd.Index([f"iris {row}" for row in range(n_iris)], name="iris"),
+        columns=ROLL_UP_COLUMNS,
+    )
+    # Not every quartier has IRIS, and the IRIS are not sorted by quartier
+    df["quartier"] = rng.choice(np.arange(1, 81, 3), n_iris)
+    return df
+
+
+def test_membership_sums_match_a_groupby():
+    rng = np.random.default_rng(0)
+    codes = rng.choice([3, 7, 42], 50)
+    values = rng.random((50, 2))
+
+    sums = Membership(codes).aggregate(values)
+
+    expected = pd.DataFrame(values).groupby(codes).sum()
+    np.testing.assert_allclose(sums, expected.to_numpy())
+
+
+@pytest.mark.parametrize("column", ["nb_pop", "nb_parking_spots"])
+def test_roll_up_conserves_the_totals(column):
+    df = get_serving()
+
+    tables = Hierarchy(df).roll_up(df)
+
+    assert list(tables) == LEVELS
+    for level in LEVELS:
+        assert tables[level][column].sum() == pytest.approx(df[column].sum())
+    assert len(tables["quartier"]) == df["quartier"].nunique()
+    assert tables["arrondissement"].index.is_unique
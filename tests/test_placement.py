@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from paris_bikes.placement import place_parking
+from paris_bikes.scenario import ScenarioBase
+
+# Small serving table, with an IRIS without demand and one with a missing one
+SERVING = pd.DataFrame(
+    {
+        "nb_parking_spots": [10, 0, 5, 20, 8],
+        "demand_index": [2.0, 1.5, 0.0, 3.0, np.nan],
+    },
+    index=pd.Index(["a", "b", "c", "d", "e"], name="iris"),
+)
+
+
+@pytest.fixture
+def scenario():
+    return ScenarioBase(SERVING).create_scenario()
+
+
+@pytest.mark.parametrize(
+    "budget, capacity, step",
+    [(0, None, 1), (7, None, 1), (103, 7, 5), (50, 3.5, 1), (12, None, 2.5)],
+)
+def test_placement_stays_within_budget_and_steps(scenario, budget, capacity, step):
+    placement = place_parking(scenario, budget, capacity=capacity, step=step)
+    added = placement.spots["added_spots"]
+
+    assert added.sum() <= budget
+    assert np.allclose(added / step, np.round(added / step))
+    if capacity is not None:
+        assert (added <= capacity).all()
+    # Only the IRIS with some demand get spots
+    assert set(added.index) <= {"a", "b", "d"}
+    assert placement.coverage_gain >= 0
+
+
+def test_whole_budget_is_placed_without_capacity(scenario):
+    placement = place_parking(scenario, 12, step=2.5)
+
+    assert placement.spots["added_spots"].sum() == 10
+    assert (
+        placement.scenario.get_spots().sum() == SERVING["nb_parking_spots"].sum() + 10
+    )
+
+
+def test_negative_budget_is_rejected(scenario):
+    with pytest.raises(ValueError):
+        place_parking(scenario, -1)
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from paris_bikes.ranking import RankIndex
+
+COLUMNS = ["demand_index", "demand_supply_index"]
+
+
+def get_serving(seed=0, n_iris=200):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {
+            # Few distinct values, so that there are many ties
+            col: rng.integers(0, 20, n_iris).astype(float)
+            for col in COLUMNS
+        },
+        index=pd.Index([f"iris {row}" for row in range(n_iris)], name="iris"),
+    )
+    df.iloc[:5, 0] = np.nan
+    df.iloc[5:8, 1] = np.inf
+    df["arrondissement"] = rng.integers(1, 21, n_iris)
+    df["nb_pop"] = rng.integers(0, 3000, n_iris).astype(float)
+    return df
+
+
+def assert_same_ranking(rank_index, expected):
+    for col in COLUMNS:
+        np.testing.assert_array_equal(rank_index.orders[col], expected.orders[col])
+        np.testing.assert_array_equal(rank_index.keys[col], expected.keys[col])
+        np.testing.assert_array_equal(rank_index.values[col], expected.values[col])
+
+
+@pytest.mark.parametrize("n_changes", [1, 5, 50])
+def test_update_matches_a_full_sort(n_changes):
+    df = get_serving()
+    rank_index = RankIndex(df, COLUMNS)
+    rng = np.random.default_rng(1)
+
+    for _ in range(10):
+        iris = rng.choice(df.index, n_changes, replace=False)
+        changes = pd.DataFrame(
+            {
+                col: rng.choice([np.nan, np.inf, 0, 5, 10, 19.5], n_changes)
+                for col in COLUMNS
+            },
+            index=iris,
+        )
+        changes["nb_pop"] = 100.0
+        rank_index.update(changes)
+        df.loc[iris, changes.columns] = changes
+
+        assert_same_ranking(rank_index, RankIndex(df, COLUMNS))
+        top = rank_index.top(COLUMNS[0], n=30, min_population=50)
+        expected = RankIndex(df, COLUMNS).top(COLUMNS[0], n=30, min_population=50)
+        pd.testing.assert_frame_equal(top.top, expected.top)
+        assert top.count == expected.count
+
+
+def test_update_of_a_copy_leaves_the_original_unchanged():
+    df = get_serving()
+    rank_index = RankIndex(df, COLUMNS)
+
+    rank_index.copy().update(
+        pd.DataFrame({COLUMNS[0]: [100.0], "nb_pop": [0.0]}, index=[df.index[10]])
+    )
+
+    assert_same_ranking(rank_index, RankIndex(df, COLUMNS))
+    np.testing.assert_array_equal(rank_index.population, df["nb_pop"])
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from paris_bikes.index import DemandIndex
+from paris_bikes.sensitivity import run_sensitivity
+
+# Small feature table, with an IRIS without parking and a missing value
+FEATURES = pd.DataFrame(
+    {
+        "iris": ["a", "b", "c", "d", "e"],
+        "nb_pop": [100, 200, np.nan, 400, 50],
+        "nb_shops": [5, 1, 3, 0, 2],
+        "nb_parking_spots": [10, 0, 5, 20, 8],
+    }
+)
+
+
+@pytest.fixture
+def demand_index():
+    return DemandIndex(FEATURES, ["nb_pop", "nb_shops"])
+
+
+@pytest.mark.parametrize("n_samples, batch_size", [(100, 1000), (250, 60)])
+def test_rank_counts_sum_to_the_number_of_samples(demand_index, n_samples, batch_size):
+    report = run_sensitivity(
+        demand_index,
+        n_samples=n_samples,
+        top_n=2,
+        base_weights=[1, 1],
+        seed=0,
+        batch_size=batch_size,
+    )
+
+    # Every IRIS has one rank per sample, and every rank one IRIS per sample
+    assert report.n_samples == n_samples
+    assert (report.rank_counts.sum(axis=1) == n_samples).all()
+    assert (report.rank_counts.sum(axis=0) == n_samples).all()
+    assert report.summary["top_2_probability"].sum() == pytest.approx(2)
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from paris_bikes.stations import StationResolver, locate_stations
+
+# Small reference table, without some stations that are looked up
+REFERENCE = pd.DataFrame(
+    {
+        "name": [
+            "Gare de Lyon",
+            "Porte de Clignancourt",
+            "Gare Saint-Lazare",
+            "Châtelet",
+            "Gare du Nord",
+        ],
+        "longitude": [2.3733, 2.3445, 2.3254, 2.3470, 2.3553],
+        "latitude": [48.8443, 48.8975, 48.8765, 48.8584, 48.8809],
+    }
+)
+
+
+@pytest.fixture
+def resolver():
+    return StationResolver(
+        REFERENCE["name"], REFERENCE["longitude"], REFERENCE["latitude"]
+    )
+
+
+@pytest.mark.parametrize(
+    "name", ["Gare de l'Est", "Porte de Clichy", "gare de l'est", "porte de clichy"]
+)
+def test_similar_names_of_other_stations_are_not_resolved(resolver, name):
+    df_resolved = resolver.resolve_many([name])
+
+    assert df_resolved["match"].isna().all()
+    assert df_resolved[["longitude", "latitude"]].isna().all(axis=None)
+
+
+@pytest.mark.parametrize(
+    "name, match",
+    [
+        ("GARE DE LYON", "gare de lyon"),
+        ("Chatelet", "chatelet"),
+        ("Saint-Lazare", "gare saint lazare"),
+        ("Gare du Nord RER", "gare du nord"),
+    ],
+)
+def test_variants_of_reference_names_are_resolved(resolver, name, match):
+    df_resolved = resolver.resolve_many([name])
+
+    assert df_resolved["match"].tolist() == [match]
+
+
+def test_ambiguous_names_are_not_resolved():
+    resolver = StationResolver(["Gare du Nord A", "Gare du Nord B"], [0, 1], [0, 1])
+
+    assert resolver.resolve_many(["Gare du Nord"])["match"].isna().all()
+
+
+def test_unresolved_stations_have_no_geometry(resolver):
+    df_in = pd.DataFrame({"station": ["Gare de Lyon", "Gare de l'Est", "Xyz"]})
+
+    gdf = locate_stations(df_in, "station", resolver)
+
+    assert gdf.geometry.isna().tolist() == [False, True, True]
+    assert np.isclose(gdf.geometry.iloc[0].x, 2.3733)
+
+
+def test_empty_reference_resolves_nothing():
+    resolver = StationResolver([], [], [])
+
+    assert resolver.resolve_many(["Gare de Lyon"])["match"].isna().all()